@@ -2,6 +2,8 @@
 ASGI config for alx_backend_graphql project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Under it, /graphql/async/ executes queries on the event loop
+(AsyncCRMGraphQLView); /graphql/ keeps the sync view.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -0,0 +1,64 @@
+"""
+JSON encoders for GraphQL responses, selected by GRAPHQL_JSON_ENCODER.
+
+An encoder is a callable encoder(data, pretty=False) returning the response
+body as UTF-8 bytes. 'orjson' serializes straight to bytes in C and is used
+when the package is installed; 'json' is the standard library encoder
+GraphQLView uses by default. Any other value is the dotted path of an
+encoder. Both built-in encoders accept Decimal (as its exact string),
+datetime/date/time (ISO 8601) and UUID values, so values that reach the
+response without going through a GraphQL scalar still encode.
+"""
+import datetime
+import decimal
+import json
+import uuid
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def default(value):
+    """Encode the values json.dumps and orjson leave out."""
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_json(data, pretty=False):
+    if pretty:
+        text = json.dumps(data, sort_keys=True, indent=2, separators=(",", ": "), default=default)
+    else:
+        text = json.dumps(data, separators=(",", ":"), default=default)
+    return text.encode('utf-8')
+
+
+def encode_orjson(data, pretty=False):
+    option = orjson.OPT_NON_STR_KEYS
+    if pretty:
+        option |= orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+    return orjson.dumps(data, default=default, option=option)
+
+
+ENCODERS = {
+    'json': encode_json,
+    'orjson': encode_orjson if orjson is not None else encode_json,
+}
+
+
+def get_encoder(name=None):
+    """The encoder named by name, or by GRAPHQL_JSON_ENCODER."""
+    if name is None:
+        name = getattr(settings, 'GRAPHQL_JSON_ENCODER', 'orjson')
+    if name in ENCODERS:
+        return ENCODERS[name]
+    return import_string(name)
@@ -1,12 +1,19 @@
 import graphene
-from crm.schema import Query as CRMQuery, Mutation as CRMMutation
+from crm.incremental import DIRECTIVES
+from crm.schema import Query as CRMQuery, AsyncQuery as CRMAsyncQuery, Mutation as CRMMutation
 
 class Query(CRMQuery, graphene.ObjectType):
     # This class inherits all queries from CRMQuery
     hello = graphene.String(default_value="Hello, GraphQL!")
 
+class AsyncQuery(CRMAsyncQuery, Query):
+    # The same fields as Query, with the async CRM resolvers
+    class Meta:
+        name = 'Query'
+
 class Mutation(CRMMutation, graphene.ObjectType):
     # This class inherits all mutations from CRMMutation
     pass
 
-schema = graphene.Schema(query=Query, mutation=Mutation) 
\ No newline at end of file
+schema = graphene.Schema(query=Query, mutation=Mutation, directives=DIRECTIVES)
+async_schema = graphene.Schema(query=AsyncQuery, mutation=Mutation, directives=DIRECTIVES)
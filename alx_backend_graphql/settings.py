@@ -81,6 +81,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # File-backed test database so threaded tests (e.g. the stock
+        # reservation stress test) get real SQLite locking and busy waits
+        # instead of shared-cache "table is locked" errors.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -131,6 +135,54 @@ GRAPHENE = {
     'SCHEMA': 'alx_backend_graphql.schema.schema'
 }
 
+# Parsed/validated query documents kept in memory per process
+GRAPHQL_DOCUMENT_CACHE_SIZE = 256
+# Automatic Persisted Queries: cache alias holding query text by sha256 hash
+GRAPHQL_APQ_CACHE = 'default'
+GRAPHQL_APQ_TIMEOUT = 60 * 60 * 24
+# Identical queries (same normalized document, variables and auth) that
+# arrive while one is executing share its execution and result
+GRAPHQL_COALESCE_QUERIES = True
+# Response body encoder (alx_backend_graphql.encoders): 'orjson', 'json' or
+# the dotted path of an encoder(data, pretty=False) returning bytes
+GRAPHQL_JSON_ENCODER = 'orjson'
+# JSON responses of at least this many bytes are gzip/deflate compressed when
+# the client accepts it (None disables compression)
+GRAPHQL_COMPRESS_MIN_SIZE = 1024
+GRAPHQL_COMPRESS_LEVEL = 6
+
+# Rows per INSERT / IN (...) chunk for the bulk mutations
+CRM_BULK_BATCH_SIZE = 1000
+
+# generate_crm_report: 'inprocess' runs schema.execute in the worker,
+# 'http' posts to CRM_REPORT_GRAPHQL_URL using the bundled crm/schema.graphql
+CRM_REPORT_TRANSPORT = 'inprocess'
+CRM_REPORT_GRAPHQL_URL = 'http://localhost:8000/graphql/'
+# Report snapshots stop this many seconds before now so rows from
+# still-open transactions land in the next period instead of being skipped
+CRM_REPORT_WATERMARK_LAG = 60
+# Name/email substring filters and the search query: 'fts5' uses the SQLite
+# trigram index (crm.search), 'like' always runs icontains
+CRM_SEARCH_BACKEND = 'fts5'
+# customer(id), product(id) and order(id) lookups (crm.entity_cache): a
+# per-process LRU of LOCAL_SIZE entries kept LOCAL_TTL seconds, in front of
+# the Django cache named by ALIAS; missing ids are cached NEGATIVE_TIMEOUT seconds,
+# and invalidated rows are not cached again for TOMBSTONE_TIMEOUT seconds
+CRM_ENTITY_CACHE_ENABLED = True
+CRM_ENTITY_CACHE_ALIAS = 'default'
+CRM_ENTITY_CACHE_TIMEOUT = 300
+CRM_ENTITY_CACHE_NEGATIVE_TIMEOUT = 30
+CRM_ENTITY_CACHE_LOCAL_SIZE = 1024
+CRM_ENTITY_CACHE_LOCAL_TTL = 5
+CRM_ENTITY_CACHE_TOMBSTONE_TIMEOUT = 2
+# crm.singleflight: cache alias holding the cross-process locks, how long
+# other processes wait for a lock holder, and how often they poll
+CRM_SINGLE_FLIGHT_CACHE = 'default'
+CRM_SINGLE_FLIGHT_TIMEOUT = 30
+CRM_SINGLE_FLIGHT_POLL = 0.05
+# Rows fetched and encoded per chunk by the streaming exports (crm.export)
+CRM_EXPORT_CHUNK_SIZE = 2000
+
 # Cron Jobs Configuration
 CRONJOBS = [
     ('*/5 * * * *', 'crm.cron.log_crm_heartbeat'),
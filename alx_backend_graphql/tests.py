@@ -1,10 +1,17 @@
-from django.test import TestCase
-from graphene.test import Client
+import json
+import threading
+import time
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase
+from graphene.test import Client as GrapheneClient
+from . import views
 from .schema import schema
+from .views import document_cache, query_hash
 
 class HelloQueryTests(TestCase):
     def setUp(self):
-        self.client = Client(schema)
+        self.client = GrapheneClient(schema)
 
     def test_hello_query(self):
         """Test that the hello query returns the expected response"""
@@ -26,4 +33,134 @@ class HelloQueryTests(TestCase):
         '''
         result = self.client.execute(query, operation_name='TestQuery')
         self.assertIn('data', result)
-        self.assertEqual(result['data']['hello'], "Hello, GraphQL!") 
\ No newline at end of file
+        self.assertEqual(result['data']['hello'], "Hello, GraphQL!")
+
+class DocumentCacheAndPersistedQueryTests(TestCase):
+    query = 'query Hello { hello }'
+
+    def setUp(self):
+        document_cache.clear()
+        cache.clear()
+
+    def post(self, payload):
+        response = self.client.post('/graphql/', data=json.dumps(payload), content_type='application/json')
+        return response.status_code, json.loads(response.content)
+
+    def apq(self, sha256_hash):
+        return {'persistedQuery': {'version': 1, 'sha256Hash': sha256_hash}}
+
+    def test_repeated_query_is_parsed_and_validated_once(self):
+        """The second identical request reuses the cached document"""
+        with patch('alx_backend_graphql.views.parse', wraps=views.parse) as parse_spy, \
+                patch('alx_backend_graphql.views.validate', wraps=views.validate) as validate_spy:
+            for _ in range(3):
+                status, body = self.post({'query': self.query})
+                self.assertEqual(status, 200)
+                self.assertEqual(body['data']['hello'], "Hello, GraphQL!")
+        self.assertEqual(parse_spy.call_count, 1)
+        self.assertEqual(validate_spy.call_count, 1)
+        self.assertEqual(document_cache.hits, 2)
+
+    def test_validation_errors_are_cached(self):
+        """Invalid documents keep returning their validation errors"""
+        for _ in range(2):
+            status, body = self.post({'query': '{ noSuchField }'})
+            self.assertEqual(status, 400)
+            self.assertIn('noSuchField', body['errors'][0]['message'])
+        self.assertEqual(document_cache.hits, 1)
+
+    def test_persisted_query_round_trip(self):
+        """Hash-only miss, register with full text, then hash-only hit"""
+        sha256_hash = query_hash(self.query)
+
+        status, body = self.post({'extensions': self.apq(sha256_hash)})
+        self.assertEqual(status, 200)
+        self.assertEqual(body['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_FOUND')
+
+        status, body = self.post({'query': self.query, 'extensions': self.apq(sha256_hash)})
+        self.assertEqual(body['data']['hello'], "Hello, GraphQL!")
+
+        status, body = self.post({'extensions': self.apq(sha256_hash)})
+        self.assertEqual(status, 200)
+        self.assertEqual(body['data']['hello'], "Hello, GraphQL!")
+
+    def test_persisted_query_over_get(self):
+        """GET requests may carry the extensions as a JSON query parameter"""
+        sha256_hash = query_hash(self.query)
+        self.post({'query': self.query, 'extensions': self.apq(sha256_hash)})
+        response = self.client.get('/graphql/', {'extensions': json.dumps(self.apq(sha256_hash))},
+                                   HTTP_ACCEPT='application/json')
+        self.assertEqual(json.loads(response.content)['data']['hello'], "Hello, GraphQL!")
+
+    def test_persisted_query_hash_mismatch(self):
+        """A query whose sha256 does not match the supplied hash is rejected"""
+        status, body = self.post({'query': self.query, 'extensions': self.apq('0' * 64)})
+        self.assertEqual(status, 400)
+        self.assertEqual(body['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_HASH_MISMATCH')
+
+class QueryCoalescingTests(TestCase):
+    def setUp(self):
+        document_cache.clear()
+        views.query_flights.clear()
+        self.release = threading.Event()
+        self.calls = []
+        execute = views.execute
+
+        def slow_execute(*args, **kwargs):
+            self.calls.append(kwargs['variable_values'])
+            self.release.wait(5)
+            return execute(*args, **kwargs)
+
+        patcher = patch('alx_backend_graphql.views.execute', side_effect=slow_execute)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_concurrently(self, payloads, shared):
+        """Post payloads from separate threads and release execution once they all arrived"""
+        bodies = [None] * len(payloads)
+
+        def post(index, payload):
+            response = Client().post('/graphql/', data=json.dumps(payload), content_type='application/json')
+            bodies[index] = json.loads(response.content)
+
+        threads = [threading.Thread(target=post, args=item) for item in enumerate(payloads)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while (len(self.calls), views.query_flights.shared) != (len(payloads) - shared, shared):
+            self.assertLess(time.monotonic(), deadline, "requests never overlapped")
+            time.sleep(0.01)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return bodies
+
+    def test_identical_queries_share_one_execution(self):
+        """A query differing only in whitespace waits for the running one"""
+        bodies = self.post_concurrently([
+            {'query': 'query Hello { hello }'},
+            {'query': 'query Hello {\n  hello\n}\n# refresh'},
+        ], shared=1)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(bodies, [{'data': {'hello': "Hello, GraphQL!"}}] * 2)
+
+    def test_different_variables_execute_separately(self):
+        """Operations with different variables are not coalesced"""
+        query = 'query Hello($show: Boolean!) { hello @include(if: $show) }'
+        bodies = self.post_concurrently([
+            {'query': query, 'variables': {'show': True}},
+            {'query': query, 'variables': {'show': False}},
+        ], shared=0)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(bodies, [{'data': {'hello': "Hello, GraphQL!"}}, {'data': {}}])
+
+    def test_auth_context_is_part_of_the_key(self):
+        """The same operation for different credentials gets its own key"""
+        view = views.CRMGraphQLView(schema=schema)
+        anonymous = RequestFactory().post('/graphql/')
+        token = RequestFactory().post('/graphql/', HTTP_AUTHORIZATION='Bearer abc')
+        signature = query_hash('{ hello }')
+        self.assertNotEqual(
+            view.operation_key(signature, None, None, view.auth_context(anonymous)),
+            view.operation_key(signature, None, None, view.auth_context(token)),
+        )
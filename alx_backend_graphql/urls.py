@@ -16,11 +16,16 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
-from .schema import schema
+from crm.views import export
+from .schema import async_schema, schema
+from .views import AsyncCRMGraphQLView, CRMGraphQLView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('graphql/', csrf_exempt(GraphQLView.as_view(graphiql=True, schema=schema))),
+    path('graphql/', csrf_exempt(CRMGraphQLView.as_view(graphiql=True, schema=schema))),
+    # Async execution for the ASGI application (alx_backend_graphql.asgi)
+    path('graphql/async/', csrf_exempt(AsyncCRMGraphQLView.as_view(graphiql=True, schema=async_schema))),
+    # Streaming NDJSON/CSV exports, e.g. /export/orders.ndjson?customerName=Ada
+    path('export/<str:kind>.<str:fmt>', export, name='crm-export'),
 ]
@@ -0,0 +1,546 @@
+import gzip
+import hashlib
+import json
+import threading
+import zlib
+from collections import OrderedDict, namedtuple
+from inspect import isawaitable
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql import (
+    ExecutionResult, OperationType, execute, get_operation_ast, parse, print_ast, validate,
+)
+from graphql.execution.middleware import MiddlewareManager
+from graphql.type import validate_schema
+
+from alx_backend_graphql.encoders import get_encoder
+from crm.incremental import execute_incremental, uses_incremental_delivery
+from crm.loaders import CRMLoaders
+from crm.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def query_hash(query):
+    """sha256 hex digest of a query document, as used by Automatic Persisted Queries."""
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+class DocumentCache:
+    """
+    Thread-safe LRU of parsed and validated query documents, keyed by the
+    schema, the validation rules and the sha256 of the query text.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+document_cache = DocumentCache(getattr(settings, 'GRAPHQL_DOCUMENT_CACHE_SIZE', 256))
+
+
+def get_document(schema, query, validation_rules=None):
+    """
+    Return (document, errors, signature) for query, parsing and validating it
+    only the first time it is seen. Syntax and validation errors are cached
+    as well. signature is the sha256 of the printed document, so texts that
+    differ only in whitespace, commas or comments share it.
+    """
+    rules = tuple(validation_rules) if validation_rules else None
+    key = (id(schema), rules, query_hash(query))
+    entry = document_cache.get(key)
+    if entry is not None:
+        return entry
+
+    try:
+        document = parse(query)
+    except Exception as e:
+        entry = (None, [e], None)
+    else:
+        errors = validate(schema, document, validation_rules, graphene_settings.MAX_VALIDATION_ERRORS)
+        entry = (None, errors, None) if errors else (document, None, query_hash(print_ast(document)))
+    document_cache.set(key, entry)
+    return entry
+
+
+query_flights = SingleFlight()
+async_query_flights = AsyncSingleFlight()
+
+# A parsed and validated operation, ready to execute
+PreparedOperation = namedtuple('PreparedOperation', 'document signature operation_ast')
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    The content coding ('gzip' or 'deflate') to use for a response to a
+    request with this Accept-Encoding header, or None. The coding with the
+    highest q-value wins, gzip on a tie; q=0 refuses a coding.
+    """
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip().lower()] = q
+    wildcard = weights.get('*', 0.0)
+    q, coding = max(
+        (weights.get('gzip', wildcard), 'gzip'), (weights.get('deflate', wildcard), 'deflate'),
+        key=lambda choice: choice[0],
+    )
+    return coding if q > 0 else None
+
+
+def compress_response(request, response):
+    """
+    Compress a JSON response body with the coding negotiated from the
+    request's Accept-Encoding, once it reaches GRAPHQL_COMPRESS_MIN_SIZE
+    bytes. Other responses (e.g. GraphiQL, which embeds the CSRF token) are
+    left alone.
+    """
+    min_size = getattr(settings, 'GRAPHQL_COMPRESS_MIN_SIZE', None)
+    if (
+        min_size is None
+        or response.streaming
+        or response.has_header('Content-Encoding')
+        or not response.get('Content-Type', '').startswith('application/json')
+    ):
+        return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if len(response.content) < min_size:
+        return response
+    coding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if coding is None:
+        return response
+
+    level = getattr(settings, 'GRAPHQL_COMPRESS_LEVEL', 6)
+    if coding == 'gzip':
+        content = gzip.compress(response.content, compresslevel=level, mtime=0)
+    else:
+        content = zlib.compress(response.content, level)
+    response.content = content
+    response['Content-Length'] = str(len(content))
+    response['Content-Encoding'] = coding
+    return response
+
+
+# Incremental delivery (@defer/@stream) responses, as Apollo Client and
+# graphql-js expect them
+MULTIPART_CONTENT_TYPE = 'multipart/mixed; boundary="-"; deferSpec=20220824'
+MULTIPART_PART_HEADER = b'\r\n---\r\nContent-Type: application/json; charset=utf-8\r\n\r\n'
+MULTIPART_END = b'\r\n-----\r\n'
+
+
+def accepts_incremental_delivery(request):
+    return 'multipart/mixed' in request.META.get('HTTP_ACCEPT', '')
+
+
+class PersistedQueryError(Exception):
+    def __init__(self, message, code, status=200):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+
+
+class CRMGraphQLView(GraphQLView):
+    """
+    GraphQLView that reuses parsed and validated documents across requests and
+    implements Automatic Persisted Queries: a client may send only
+    extensions.persistedQuery.sha256Hash, and on PERSISTED_QUERY_NOT_FOUND
+    retries once with the full query text so the server can store it.
+
+    With GRAPHQL_COALESCE_QUERIES, a query operation that arrives while an
+    identical one (see operation_key) is executing in this process waits for
+    it and returns the same result instead of executing again.
+
+    Responses are encoded by the GRAPHQL_JSON_ENCODER encoder and compressed
+    as negotiated by compress_response().
+
+    A client that accepts multipart/mixed gets @defer and @stream delivered
+    incrementally: the initial result is sent as soon as it is ready and
+    the deferred parts follow as they are resolved. Such queries are not
+    coalesced. Other clients get the complete result as usual.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if accepts_incremental_delivery(request) and not self.batch:
+            response = self.get_incremental_response(request)
+            if response is not None:
+                return response
+        return compress_response(request, super().dispatch(request, *args, **kwargs))
+
+    def json_encode(self, request, d, pretty=False):
+        pretty = self.pretty or pretty or bool(request.GET.get("pretty"))
+        content = get_encoder()(d, pretty=pretty)
+        # GraphQLView.dispatch joins batch responses as text
+        return content.decode('utf-8') if self.batch else content
+
+    @staticmethod
+    def auth_context(request, user=None):
+        """What a result may depend on besides the operation: who is asking."""
+        if user is None:
+            user = getattr(request, 'user', None)
+        user_id = user.pk if user is not None and user.is_authenticated else None
+        return [user_id, request.META.get('HTTP_AUTHORIZATION')]
+
+    @staticmethod
+    def operation_key(signature, variables, operation_name, auth_context):
+        return query_hash(json.dumps(
+            [signature, operation_name, variables, auth_context], sort_keys=True, default=str,
+        ))
+
+    @staticmethod
+    def get_persisted_query_extension(request, data):
+        extensions = request.GET.get('extensions') or data.get('extensions')
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise PersistedQueryError("Extensions are invalid JSON.", 'BAD_REQUEST', status=400)
+        if not isinstance(extensions, dict):
+            return None
+        return extensions.get('persistedQuery')
+
+    def resolve_persisted_query(self, request, data):
+        """Fill in data['query'] from the persisted query store, or store a new one."""
+        persisted = self.get_persisted_query_extension(request, data)
+        if not persisted:
+            return data
+        if persisted.get('version') != 1:
+            raise PersistedQueryError("Unsupported persisted query version", 'BAD_REQUEST', status=400)
+        sha256_hash = persisted.get('sha256Hash')
+        if not isinstance(sha256_hash, str):
+            raise PersistedQueryError("Persisted query is missing sha256Hash", 'BAD_REQUEST', status=400)
+
+        store = caches[getattr(settings, 'GRAPHQL_APQ_CACHE', 'default')]
+        cache_key = f'graphql:apq:{sha256_hash}'
+        query = request.GET.get('query') or data.get('query')
+        if query:
+            if query_hash(query) != sha256_hash:
+                raise PersistedQueryError(
+                    "provided sha does not match query", 'PERSISTED_QUERY_HASH_MISMATCH', status=400
+                )
+            store.set(cache_key, query, getattr(settings, 'GRAPHQL_APQ_TIMEOUT', None))
+            return data
+
+        query = store.get(cache_key)
+        if query is None:
+            raise PersistedQueryError("PersistedQueryNotFound", 'PERSISTED_QUERY_NOT_FOUND')
+        return dict(data, query=query)
+
+    def persisted_query_error(self, request, error, show_graphiql=False):
+        response = {'errors': [{'message': str(error), 'extensions': {'code': error.code}}]}
+        return self.json_encode(request, response, pretty=show_graphiql), error.status
+
+    def get_response(self, request, data, show_graphiql=False):
+        try:
+            data = self.resolve_persisted_query(request, data)
+        except PersistedQueryError as e:
+            return self.persisted_query_error(request, e, show_graphiql)
+        return super().get_response(request, data, show_graphiql)
+
+    def format_result(self, request, execution_result, id=None):
+        """The JSON body and status code of an ExecutionResult, as get_response() builds them."""
+        response = {}
+        status_code = 200
+        if execution_result.errors:
+            response["errors"] = [self.format_error(e) for e in execution_result.errors]
+        if execution_result.errors and any(not getattr(e, "path", None) for e in execution_result.errors):
+            status_code = 400
+        else:
+            response["data"] = execution_result.data
+        if self.batch:
+            response["id"] = id
+            response["status"] = status_code
+        return self.json_encode(request, response), status_code
+
+    def get_incremental_response(self, request):
+        """
+        Execute a query operation that uses @defer or @stream. Returns a
+        multipart/mixed StreamingHttpResponse whose later parts are resolved
+        while it is sent, or None when the request is answered the usual way
+        (no such directives, not a query, or an error the usual path reports).
+        """
+        if request.method.lower() not in ("get", "post"):
+            return None
+        try:
+            data = self.parse_body(request)
+            if self.graphiql and self.can_display_graphiql(request, data):
+                return None
+            data = self.resolve_persisted_query(request, data)
+            query, variables, operation_name, _ = self.get_graphql_params(request, data)
+            prepared = self.prepare_operation(request, query, operation_name) if query else None
+        except (HttpError, PersistedQueryError):
+            return None
+        if (
+            not isinstance(prepared, PreparedOperation)
+            or prepared.operation_ast is None
+            or prepared.operation_ast.operation != OperationType.QUERY
+            or not uses_incremental_delivery(prepared.document)
+        ):
+            return None
+
+        execute_options = self.execute_options(request, variables, operation_name)
+        execute_options.pop("execution_context_class", None)
+        try:
+            result, payloads = execute_incremental(self.schema.graphql_schema, prepared.document, **execute_options)
+        except Exception as e:
+            result, payloads = ExecutionResult(errors=[e]), None
+        if payloads is None:
+            content, status_code = self.format_result(request, result)
+            return compress_response(
+                request, HttpResponse(status=status_code, content=content, content_type="application/json")
+            )
+
+        initial = {"data": result.data, "hasNext": True}
+        if result.errors:
+            initial["errors"] = [self.format_error(e) for e in result.errors]
+        return StreamingHttpResponse(
+            self.multipart_parts(request, initial, payloads), content_type=MULTIPART_CONTENT_TYPE
+        )
+
+    def multipart_parts(self, request, initial, payloads):
+        yield MULTIPART_PART_HEADER + self.json_encode(request, initial)
+        for payload in payloads:
+            for incremental in payload["incremental"]:
+                if "errors" in incremental:
+                    incremental["errors"] = [self.format_error(e) for e in incremental["errors"]]
+            yield MULTIPART_PART_HEADER + self.json_encode(request, payload)
+        yield MULTIPART_END
+
+    def prepare_operation(self, request, query, operation_name, show_graphiql=False):
+        """
+        Parse and validate query (through the document cache) and check the
+        operation may run over this request method. Returns an
+        ExecutionResult (or None, to show GraphiQL) that ends the request, or
+        the PreparedOperation to execute.
+        """
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        document, errors, signature = get_document(schema, query, self.validation_rules)
+        if errors:
+            return ExecutionResult(data=None, errors=errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    "Can only perform a {} operation from a POST request.".format(
+                        operation_ast.operation.value
+                    ),
+                )
+            )
+        return PreparedOperation(document, signature, operation_ast)
+
+    def execute_options(self, request, variables, operation_name):
+        execute_options = {
+            "root_value": self.get_root_value(request),
+            "context_value": self.get_context(request),
+            "variable_values": variables,
+            "operation_name": operation_name,
+            "middleware": self.get_middleware(request),
+        }
+        if self.execution_context_class:
+            execute_options["execution_context_class"] = self.execution_context_class
+        return execute_options
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        if not query:
+            return super().execute_graphql_request(
+                request, data, query, variables, operation_name, show_graphiql
+            )
+
+        prepared = self.prepare_operation(request, query, operation_name, show_graphiql)
+        if not isinstance(prepared, PreparedOperation):
+            return prepared
+        schema = self.schema.graphql_schema
+        document, signature, operation_ast = prepared
+
+        try:
+            execute_options = self.execute_options(request, variables, operation_name)
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            if (
+                getattr(settings, 'GRAPHQL_COALESCE_QUERIES', False)
+                and operation_ast is not None
+                and operation_ast.operation == OperationType.QUERY
+            ):
+                key = self.operation_key(signature, variables, operation_name, self.auth_context(request))
+                return query_flights.do(key, lambda: execute(schema, document, **execute_options))
+
+            return execute(schema, document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+
+class AsyncQuerySetMiddleware:
+    """
+    Evaluates querysets returned by resolvers that have no async form (e.g.
+    reverse relations graphene-django resolves with .all()) in the request's
+    sync thread, since the event loop may not run queries itself.
+    """
+
+    def resolve(self, next, root, info, **args):
+        result = next(root, info, **args)
+        if isinstance(result, QuerySet) and result._result_cache is None:
+            return sync_to_async(list)(result)
+        return result
+
+
+class AsyncCRMGraphQLView(CRMGraphQLView):
+    """
+    CRMGraphQLView as an async view, for the ASGI application. Query
+    operations execute on the event loop against a schema with async
+    resolvers (e.g. async_schema), with async relation loaders; identical
+    concurrent queries are coalesced per event loop. Mutations and GraphiQL
+    take the sync path in the request's sync thread, and subscriptions are
+    not supported. @defer and @stream are accepted but not delivered
+    incrementally: responses always carry the complete result.
+    """
+    view_is_async = True
+
+    def get_middleware(self, request):
+        middleware = super().get_middleware(request)
+        if isinstance(middleware, MiddlewareManager):
+            middleware = middleware.middlewares
+        return [*(middleware or ()), AsyncQuerySetMiddleware()]
+
+    async def dispatch(self, request, *args, **kwargs):
+        return compress_response(request, await self.adispatch(request, *args, **kwargs))
+
+    async def adispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                    )
+                )
+
+            data = self.parse_body(request)
+            if self.graphiql and self.can_display_graphiql(request, data):
+                return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+            if self.batch:
+                responses = [await self.aget_response(request, entry) for entry in data]
+                result = "[{}]".format(",".join([response[0] for response in responses]))
+                status_code = responses and max(response[1] for response in responses) or 200
+            else:
+                result, status_code = await self.aget_response(request, data)
+
+            return HttpResponse(status=status_code, content=result, content_type="application/json")
+
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(request, {"errors": [self.format_error(e)]})
+            return response
+
+    async def aget_response(self, request, data):
+        """get_response() with async execution: the JSON body and status of one operation."""
+        try:
+            if self.get_persisted_query_extension(request, data):
+                data = await sync_to_async(self.resolve_persisted_query)(request, data)
+        except PersistedQueryError as e:
+            return self.persisted_query_error(request, e)
+
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+        prepared = self.prepare_operation(request, query, operation_name) if query else None
+        if not isinstance(prepared, PreparedOperation) or prepared.operation_ast is None \
+                or prepared.operation_ast.operation != OperationType.QUERY:
+            # Errors, mutations and missing queries: the sync view formats them
+            return await sync_to_async(super(CRMGraphQLView, self).get_response)(request, data)
+
+        execution_result = await self.aexecute_operation(request, prepared, variables, operation_name)
+        return self.format_result(request, execution_result, id)
+
+    async def aexecute_operation(self, request, prepared, variables, operation_name):
+        request.crm_loaders = CRMLoaders(asynchronous=True)
+        try:
+            execute_options = self.execute_options(request, variables, operation_name)
+
+            async def run():
+                result = execute(self.schema.graphql_schema, prepared.document, **execute_options)
+                if isawaitable(result):
+                    result = await result
+                return result
+
+            if getattr(settings, 'GRAPHQL_COALESCE_QUERIES', False):
+                user = await request.auser() if hasattr(request, 'auser') else None
+                key = self.operation_key(
+                    prepared.signature, variables, operation_name, self.auth_context(request, user)
+                )
+                return await async_query_flights.do(key, run)
+            return await run()
+        except Exception as e:
+            return ExecutionResult(errors=[e])
@@ -0,0 +1,169 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from .bulk import batch_size as default_batch_size, id_batches
+from .entity_cache import entity_cache
+from .models import (
+    ArchivedCustomer, ArchivedOrder, ArchivedOrderItem, Customer, Order, OrderItem,
+)
+
+
+def inactive_filter(cutoff):
+    """
+    Customers whose latest order is older than cutoff, or who never ordered.
+    Served by the (last_order_date, id) index on the customer counter cache.
+    """
+    return Q(last_order_date__lt=cutoff) | Q(last_order_date__isnull=True)
+
+
+def _copy_orders(orders):
+    """Insert archive copies of orders (with customer selected) and their items."""
+    ArchivedOrder.objects.bulk_create([
+        ArchivedOrder(
+            id=order.id,
+            customer_id=order.customer_id,
+            customer_name=order.customer.name,
+            total_amount=order.total_amount,
+            order_date=order.order_date,
+            created_at=order.created_at,
+        )
+        for order in orders
+    ])
+    items = OrderItem.objects.filter(order_id__in=[order.id for order in orders]).order_by('pk')
+    ArchivedOrderItem.objects.bulk_create([
+        ArchivedOrderItem(order_id=item.order_id, product_id=item.product_id, quantity=item.quantity)
+        for item in items
+    ])
+
+
+def _delete_moved(model, ids):
+    """
+    Delete rows that were copied to the archive without the model signals,
+    which would subtract them from CrmStatistics, the customer counters and
+    the daily rollups; archived history still counts towards all three.
+    """
+    if model is Order:
+        items = OrderItem.objects.filter(order_id__in=ids)
+        items._raw_delete(items.db)
+    rows = model._default_manager.filter(id__in=ids)
+    rows._raw_delete(rows.db)
+    entity_cache.invalidate_many(model, ids)
+
+
+def archive_orders(queryset, size=None, progress=None):
+    """
+    Move the orders in queryset to the archive tables, one transaction per
+    batch of ids. The statistics, customer counters and daily rollups are
+    left as they were. progress, if given, is called with the running total
+    after each batch. Returns the number of orders moved.
+    """
+    moved = 0
+    for ids in id_batches(queryset, size or default_batch_size()):
+        with transaction.atomic():
+            # Re-check the criteria inside the transaction
+            orders = list(queryset.filter(id__in=ids).select_related('customer').order_by('id'))
+            _copy_orders(orders)
+            _delete_moved(Order, [order.id for order in orders])
+        moved += len(orders)
+        if progress:
+            progress(moved)
+    return moved
+
+
+def archive_customers(queryset, size=None, progress=None):
+    """
+    Move the customers in queryset, and all of their orders, to the archive
+    tables in batches. Returns the number of customers moved.
+    """
+    moved = 0
+    for ids in id_batches(queryset, size or default_batch_size()):
+        with transaction.atomic():
+            customers = list(queryset.filter(id__in=ids).order_by('id'))
+            ids = [customer.id for customer in customers]
+            ArchivedCustomer.objects.bulk_create([
+                ArchivedCustomer(
+                    id=customer.id,
+                    name=customer.name,
+                    email=customer.email,
+                    phone=customer.phone,
+                    created_at=customer.created_at,
+                    order_count=customer.order_count,
+                    last_order_date=customer.last_order_date,
+                    lifetime_value=customer.lifetime_value,
+                )
+                for customer in customers
+            ])
+            orders = list(Order.objects.filter(customer_id__in=ids).select_related('customer').order_by('id'))
+            _copy_orders(orders)
+            _delete_moved(Order, [order.id for order in orders])
+            _delete_moved(Customer, ids)
+        moved += len(customers)
+        if progress:
+            progress(moved)
+    return moved
+
+
+def as_orders(archived_orders):
+    """
+    Turn ArchivedOrder rows into read-only Order instances with their
+    customer (live or archived) and products attached, so OrderType and the
+    request loaders serve them like live orders. Costs at most three queries.
+
+    A customer that is in neither table (e.g. hard-deleted by
+    cleanup_inactive_customers after their old orders were archived) is
+    stood in for by an unsaved Customer carrying the archived customer_name.
+    """
+    archived_orders = list(archived_orders)
+    if not archived_orders:
+        return []
+    customer_ids = {order.customer_id for order in archived_orders}
+    customers = Customer.objects.in_bulk(customer_ids)
+    missing = customer_ids - customers.keys()
+    if missing:
+        for customer in ArchivedCustomer.objects.filter(id__in=missing):
+            customers[customer.id] = customer.as_customer()
+
+    products = defaultdict(list)
+    items = (
+        ArchivedOrderItem.objects
+        .filter(order_id__in=[order.id for order in archived_orders])
+        .select_related('product')
+        .order_by('pk')
+    )
+    for item in items:
+        products[item.order_id].append(item.product)
+
+    orders = []
+    for archived in archived_orders:
+        order = Order(
+            id=archived.id,
+            customer_id=archived.customer_id,
+            total_amount=archived.total_amount,
+            order_date=archived.order_date,
+            created_at=archived.created_at,
+        )
+        order._state.adding = False
+        order.archived = True
+        customer = customers.get(archived.customer_id)
+        if customer is None:
+            customer = Customer(id=archived.customer_id, name=archived.customer_name, email='')
+        order.customer = customer
+        order._prefetched_objects_cache = {'products': products[archived.id]}
+        orders.append(order)
+    return orders
+
+
+def get_order(pk, include_archived=False):
+    """Order pk through the entity cache, falling back to the archive when asked to."""
+    try:
+        return entity_cache.get(Order, pk)
+    except Order.DoesNotExist:
+        if not include_archived:
+            raise
+    try:
+        archived = ArchivedOrder.objects.get(pk=pk)
+    except ArchivedOrder.DoesNotExist:
+        raise Order.DoesNotExist("Order matching query does not exist.")
+    return as_orders([archived])[0]
@@ -0,0 +1,54 @@
+import statistics
+import time
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+
+class Rollback(Exception):
+    pass
+
+
+def run_in_rollback(fn):
+    """Run fn() in a transaction that is always rolled back; return its result."""
+    result = None
+    try:
+        with transaction.atomic():
+            result = fn()
+            raise Rollback
+    except Rollback:
+        pass
+    return result
+
+
+def measure(fn, iterations, warmup=3):
+    """
+    Call fn(i) iterations times and return (latencies in ms, statements per
+    call), after warmup calls that are not recorded.
+    """
+    for i in range(warmup):
+        fn(i)
+    latencies = []
+    statements = []
+    for i in range(iterations):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            fn(warmup + i)
+            latencies.append((time.perf_counter() - start) * 1000)
+        statements.append(len(ctx.captured_queries))
+    return latencies, statements
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(label, latencies, statements):
+    return (
+        f"{label}: {statistics.mean(statements):.1f} statements/call, "
+        f"p50 {percentile(latencies, 50):.2f} ms, p99 {percentile(latencies, 99):.2f} ms"
+    )
@@ -0,0 +1,247 @@
+import re
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .inventory import reserve_stock
+from .models import Customer, Order, OrderItem, Product
+from .statistics import stats_batch
+
+PHONE_PATTERN = re.compile(r'^\+?1?\d{9,15}$|^\d{3}-\d{3}-\d{4}$')
+
+
+def valid_phone(phone):
+    return not phone or bool(PHONE_PATTERN.match(phone))
+
+
+def batch_size():
+    return getattr(settings, 'CRM_BULK_BATCH_SIZE', 1000)
+
+
+def chunked(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def id_batches(queryset, size):
+    """Yield lists of up to size primary keys of queryset, seeking on id."""
+    last_id = 0
+    while True:
+        ids = list(
+            queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def existing_values(queryset, field, values, size=None):
+    """Return which of values are already stored in field, one IN query per chunk."""
+    found = set()
+    for chunk in chunked(set(values), size or batch_size()):
+        found.update(queryset.filter(**{f'{field}__in': chunk}).values_list(field, flat=True))
+    return found
+
+
+def in_bulk(queryset, ids, size=None):
+    """queryset.in_bulk(ids) with one IN query per chunk."""
+    found = {}
+    for chunk in chunked(set(ids), size or batch_size()):
+        found.update(queryset.in_bulk(chunk))
+    return found
+
+
+def parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def build_order(customer, raw_product_ids, products, order_date=None):
+    """
+    Return an unsaved Order with its total already computed, plus
+    {product id: quantity}. products maps product id to a Product with at
+    least its price loaded; a product listed n times gets quantity n.
+    Raises ValidationError for an empty or unknown product list.
+    """
+    if not raw_product_ids:
+        raise ValidationError("At least one product is required")
+    quantities = Counter()
+    missing = []
+    for raw in raw_product_ids:
+        product_id = parse_id(raw)
+        if product_id in products:
+            quantities[product_id] += 1
+        else:
+            missing.append(str(raw))
+    if missing:
+        raise ValidationError(f"Products not found: {', '.join(missing)}")
+
+    order = Order(
+        customer=customer,
+        total_amount=sum(products[product_id].price * n for product_id, n in quantities.items()),
+    )
+    if order_date:
+        order.order_date = order_date
+    return order, quantities
+
+
+def order_items(order, quantities):
+    return [
+        OrderItem(order_id=order.pk, product_id=product_id, quantity=quantity)
+        for product_id, quantity in quantities.items()
+    ]
+
+
+def create_order(customer_id, product_ids, order_date=None):
+    """
+    Create one order with its total computed before the INSERT: two lookups,
+    one conditional stock UPDATE per product, one order INSERT and one
+    OrderItem INSERT. Raises OutOfStockError (rolling everything back) when
+    a product cannot cover its quantity.
+    """
+    try:
+        customer = Customer.objects.get(pk=customer_id)
+    except (Customer.DoesNotExist, ValueError):
+        raise ValidationError("Customer not found")
+
+    products = Product.objects.only('id', 'name', 'price').in_bulk(
+        {product_id for product_id in map(parse_id, product_ids or []) if product_id is not None}
+    )
+    order, quantities = build_order(customer, product_ids, products, order_date)
+    with transaction.atomic():
+        reserve_stock(quantities, {product_id: products[product_id].name for product_id in quantities})
+        order.save(force_insert=True)
+        OrderItem.objects.bulk_create(order_items(order, quantities))
+    return order
+
+
+def bulk_create_customers(rows, size=None):
+    """
+    Validate and insert customer rows (objects with name, email and phone).
+
+    Returns (customers, errors) where errors is a list of (row index, message).
+    Rows are checked up front, so a bad row never aborts the others: phones
+    are validated, emails already stored are found with one query per chunk,
+    and repeated emails within rows keep only their first occurrence.
+    """
+    size = size or batch_size()
+    errors = []
+    candidates = []
+    seen = {}
+    for index, row in enumerate(rows):
+        if not valid_phone(row.phone):
+            errors.append((index, f"Invalid phone number for {row.name}"))
+            continue
+        if row.email in seen:
+            errors.append((index, f"Duplicate email {row.email} (same as row {seen[row.email]})"))
+            continue
+        seen[row.email] = index
+        candidates.append((index, Customer(name=row.name, email=row.email, phone=row.phone)))
+
+    taken = existing_values(Customer.objects, 'email', seen, size)
+    pending = []
+    for index, customer in candidates:
+        if customer.email in taken:
+            errors.append((index, f"Email already exists: {customer.email}"))
+        else:
+            pending.append((index, customer))
+
+    created = []
+    with stats_batch():
+        for chunk in chunked(pending, size):
+            created.extend(_insert_customers(chunk, errors))
+    errors.sort()
+    return created, errors
+
+
+def _insert_customers(chunk, errors):
+    while chunk:
+        try:
+            with transaction.atomic():
+                return Customer.objects.bulk_create([customer for _, customer in chunk])
+        except IntegrityError:
+            # Another writer may have stored some of these emails since the
+            # pre-check; drop those rows and retry the rest.
+            taken = existing_values(Customer.objects, 'email', [customer.email for _, customer in chunk])
+            if not taken:
+                raise
+        remaining = []
+        for index, customer in chunk:
+            if customer.email in taken:
+                errors.append((index, f"Email already exists: {customer.email}"))
+            else:
+                remaining.append((index, customer))
+        chunk = remaining
+    return []
+
+
+def bulk_create_products(rows, size=None):
+    """
+    Validate and insert product rows (objects with name, price and stock).
+    Returns (products, errors) with errors as (row index, message).
+    """
+    size = size or batch_size()
+    errors = []
+    products = []
+    for index, row in enumerate(rows):
+        if row.price is None or row.price <= 0:
+            errors.append((index, f"Price must be positive for {row.name}"))
+            continue
+        stock = row.stock or 0
+        if stock < 0:
+            errors.append((index, f"Stock cannot be negative for {row.name}"))
+            continue
+        products.append(Product(name=row.name, price=Decimal(str(row.price)), stock=stock))
+
+    created = []
+    with transaction.atomic():
+        for chunk in chunked(products, size):
+            created.extend(Product.objects.bulk_create(chunk))
+    return created, errors
+
+
+def bulk_create_orders(rows, size=None):
+    """
+    Validate and insert order rows (objects with customer_id, product_ids and
+    an optional order_date). Returns (orders, errors) with errors as
+    (row index, message).
+
+    Customers and products are each resolved with one IN query per chunk,
+    totals are summed in memory, and the orders and their OrderItem rows
+    are written with chunked bulk_create calls in one transaction.
+    """
+    size = size or batch_size()
+    customers = in_bulk(Customer.objects, filter(None, (parse_id(row.customer_id) for row in rows)), size)
+    products = in_bulk(
+        Product.objects.only('id', 'price'),
+        filter(None, (parse_id(p) for row in rows for p in row.product_ids or [])),
+        size,
+    )
+
+    errors = []
+    orders = []
+    for index, row in enumerate(rows):
+        customer = customers.get(parse_id(row.customer_id))
+        if customer is None:
+            errors.append((index, f"Customer not found: {row.customer_id}"))
+            continue
+        try:
+            orders.append(build_order(customer, row.product_ids, products, row.order_date))
+        except ValidationError as e:
+            errors.append((index, '; '.join(e.messages)))
+
+    # One statistics and counter UPDATE for the whole import, not per chunk.
+    with transaction.atomic(), stats_batch():
+        for chunk in chunked([order for order, _ in orders], size):
+            Order.objects.bulk_create(chunk)
+        items = [item for order, quantities in orders for item in order_items(order, quantities)]
+        for chunk in chunked(items, size):
+            OrderItem.objects.bulk_create(chunk)
+    return [order for order, _ in orders], errors
@@ -1,21 +1,39 @@
 #!/usr/bin/env python3
+"""
+Send one reminder per customer with an order in the last week.
+
+The pipeline streams: orders are fetched one cursor page at a time, grouped
+into reminder batches (skipping customers already reminded in this run) and
+handed to a pool of sender threads with a bounded number of batches in
+flight, so memory stays flat however many orders match.
+"""
+import argparse
 import os
+import smtplib
 import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from email.message import EmailMessage
+from pathlib import Path
 from gql import gql, Client
 from gql.transport.requests import RequestsHTTPTransport
 
 # Default log file path
 DEFAULT_LOG_FILE = '/tmp/order_reminders_log.txt'
+DEFAULT_URL = 'http://localhost:8000/graphql'
+# Bundled SDL of the CRM schema, so the client never needs an introspection query
+SCHEMA_SNAPSHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'schema.graphql')
 
-# Set up the GraphQL client
-transport = RequestsHTTPTransport(url='http://localhost:8000/graphql')
-client = Client(transport=transport, fetch_schema_from_transport=True)
+PAGE_SIZE = 100
+BATCH_SIZE = 200
+WORKERS = 4
 
-# GraphQL query to get recent orders
-query = gql("""
-    query GetRecentOrders($lastWeek: DateTime!) {
-        orders(orderDate_Gte: $lastWeek) {
+RECENT_ORDERS_QUERY = """
+    query GetRecentOrders($lastWeek: DateTime!, $first: Int!, $after: String) {
+        allOrders(orderDateGte: $lastWeek, first: $first, after: $after) {
             edges {
                 node {
                     id
@@ -25,45 +43,249 @@ query = gql("""
                     }
                 }
             }
+            pageInfo {
+                hasNextPage
+                endCursor
+            }
         }
     }
-""")
+"""
 
-def process_orders(log_file=DEFAULT_LOG_FILE):
-    """Process orders and log reminders to the specified file."""
-    # Calculate date 7 days ago
-    last_week = datetime.now() - timedelta(days=7)
-    
-    try:
-        # Execute the query
+Reminder = namedtuple('Reminder', ['order_id', 'order_date', 'email'])
+
+
+class Metrics:
+    """Thread-safe counters and per-stage wall time in seconds."""
+
+    def __init__(self):
+        self.counts = {'pages': 0, 'orders': 0, 'duplicates': 0, 'reminders': 0, 'batches': 0}
+        self.seconds = {'fetch': 0.0, 'batch': 0.0, 'send': 0.0, 'total': 0.0}
+        self._lock = threading.Lock()
+
+    def add(self, stage=None, seconds=0.0, **counts):
+        with self._lock:
+            if stage:
+                self.seconds[stage] += seconds
+            for name, value in counts.items():
+                self.counts[name] += value
+
+    def summary(self):
+        counts = ', '.join(f"{name}={value}" for name, value in self.counts.items())
+        seconds = ', '.join(f"{stage}={value:.3f}s" for stage, value in self.seconds.items())
+        return f"{counts}; {seconds}"
+
+
+def make_client(url=DEFAULT_URL):
+    """Build the GraphQL client, validating against the bundled schema snapshot."""
+    transport = RequestsHTTPTransport(url=url)
+    return Client(transport=transport, schema=Path(SCHEMA_SNAPSHOT).read_text())
+
+
+def fetch_orders(client, since, metrics, page_size=PAGE_SIZE):
+    """Yield order nodes created since `since`, one keyset page at a time."""
+    query = gql(RECENT_ORDERS_QUERY)
+    after = None
+    while True:
+        started = time.perf_counter()
         result = client.execute(query, variable_values={
-            'lastWeek': last_week.isoformat()
+            'lastWeek': since.isoformat(),
+            'first': page_size,
+            'after': after,
         })
-        
-        # Get current timestamp for logging
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Process orders and log reminders
-        with open(log_file, 'a') as f:
-            f.write(f"\n=== Order Reminders {timestamp} ===\n")
-            
-            for edge in result['orders']['edges']:
-                order = edge['node']
-                log_entry = f"{timestamp}: Order {order['id']} - Customer: {order['customer']['email']}\n"
-                f.write(log_entry)
-        
+        connection = result['allOrders']
+        metrics.add('fetch', time.perf_counter() - started, pages=1, orders=len(connection['edges']))
+        for edge in connection['edges']:
+            yield edge['node']
+        page_info = connection.get('pageInfo') or {}
+        if not page_info.get('hasNextPage'):
+            return
+        after = page_info['endCursor']
+
+
+def reminder_batches(orders, metrics, batch_size=BATCH_SIZE):
+    """
+    Group orders into lists of Reminders, one per customer email: later
+    orders from an already reminded customer are dropped. Memory grows with
+    distinct customers, not with orders.
+    """
+    seen = set()
+    batch = []
+    for order in orders:
+        started = time.perf_counter()
+        email = order['customer']['email']
+        if email in seen:
+            metrics.add('batch', time.perf_counter() - started, duplicates=1)
+            continue
+        seen.add(email)
+        batch.append(Reminder(order['id'], order['orderDate'], email))
+        metrics.add('batch', time.perf_counter() - started)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class LogFileSender:
+    """Appends one line per reminder to a log file (the original behaviour)."""
+
+    def __init__(self, log_file=DEFAULT_LOG_FILE, timestamp=None):
+        self.log_file = log_file
+        self.timestamp = timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._lock = threading.Lock()
+
+    def open(self):
+        with self._lock, open(self.log_file, 'a') as f:
+            f.write(f"\n=== Order Reminders {self.timestamp} ===\n")
+
+    def send(self, reminders):
+        lines = ''.join(
+            f"{self.timestamp}: Order {reminder.order_id} - Customer: {reminder.email}\n"
+            for reminder in reminders
+        )
+        with self._lock, open(self.log_file, 'a') as f:
+            f.write(lines)
+
+    def close(self, metrics):
+        with self._lock, open(self.log_file, 'a') as f:
+            f.write(f"{self.timestamp}: {metrics.summary()}\n")
+
+
+class SmtpSender:
+    """Emails each reminder through an SMTP server, one connection per batch."""
+
+    def __init__(self, host='localhost', port=25, sender='crm@localhost'):
+        self.host = host
+        self.port = port
+        self.sender = sender
+
+    def open(self):
+        pass
+
+    def send(self, reminders):
+        with smtplib.SMTP(self.host, self.port) as smtp:
+            for reminder in reminders:
+                message = EmailMessage()
+                message['From'] = self.sender
+                message['To'] = reminder.email
+                message['Subject'] = f"Reminder about your order {reminder.order_id}"
+                message.set_content(f"Your order {reminder.order_id} from {reminder.order_date} is on its way.")
+                smtp.send_message(message)
+
+    def close(self, metrics):
+        pass
+
+
+class DjangoMailSender:
+    """
+    Sends reminders through Django's configured EMAIL_BACKEND (e.g. locmem in
+    tests, or an SMTP relay), reusing one connection per batch.
+    """
+
+    def __init__(self, sender='crm@localhost'):
+        self.sender = sender
+
+    def open(self):
+        import django
+        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+        if project_root not in sys.path:
+            sys.path.insert(0, project_root)
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_backend_graphql.settings')
+        django.setup()
+
+    def send(self, reminders):
+        from django.core.mail import EmailMessage as DjangoEmailMessage, get_connection
+
+        messages = [
+            DjangoEmailMessage(
+                subject=f"Reminder about your order {reminder.order_id}",
+                body=f"Your order {reminder.order_id} from {reminder.order_date} is on its way.",
+                from_email=self.sender,
+                to=[reminder.email],
+            )
+            for reminder in reminders
+        ]
+        get_connection().send_messages(messages)
+
+    def close(self, metrics):
+        pass
+
+
+def dispatch(batches, sender, metrics, workers=WORKERS):
+    """
+    Send batches on a thread pool, keeping at most 2 * workers batches in
+    flight so a fast producer cannot buffer the whole result set.
+    """
+    def send(batch):
+        started = time.perf_counter()
+        sender.send(batch)
+        metrics.add('send', time.perf_counter() - started, reminders=len(batch), batches=1)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        for batch in batches:
+            if len(in_flight) >= 2 * workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            in_flight.add(pool.submit(send, batch))
+        for future in in_flight:
+            future.result()
+
+
+def process_orders(log_file=DEFAULT_LOG_FILE, client=None, sender=None, since=None,
+                   page_size=PAGE_SIZE, batch_size=BATCH_SIZE, workers=WORKERS, url=DEFAULT_URL):
+    """Run the reminder pipeline; returns True on success."""
+    metrics = Metrics()
+    started = time.perf_counter()
+    since = since or datetime.now() - timedelta(days=7)
+    sender = sender or LogFileSender(log_file)
+
+    try:
+        client = client or make_client(url)
+        sender.open()
+        orders = fetch_orders(client, since, metrics, page_size)
+        dispatch(reminder_batches(orders, metrics, batch_size), sender, metrics, workers)
+        metrics.add('total', time.perf_counter() - started)
+        sender.close(metrics)
+
         print("Order reminders processed!")
+        print(metrics.summary())
         return True
-        
+
     except Exception as e:
         print(f"Error processing order reminders: {str(e)}", file=sys.stderr)
         return False
 
 def main():
     """Main entry point for the script."""
-    success = process_orders()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--log-file', default=DEFAULT_LOG_FILE)
+    parser.add_argument('--sender', choices=['log', 'smtp', 'django'], default='log')
+    parser.add_argument('--smtp-host', default='localhost')
+    parser.add_argument('--smtp-port', type=int, default=25)
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    if args.sender == 'smtp':
+        sender = SmtpSender(args.smtp_host, args.smtp_port)
+    elif args.sender == 'django':
+        sender = DjangoMailSender()
+    else:
+        sender = LogFileSender(args.log_file)
+    success = process_orders(
+        args.log_file,
+        url=args.url,
+        sender=sender,
+        page_size=args.page_size,
+        batch_size=args.batch_size,
+        workers=args.workers,
+    )
     if not success:
         sys.exit(1)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
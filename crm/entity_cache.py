@@ -0,0 +1,253 @@
+"""
+Read-through cache for single-row lookups (customer(id), product(id),
+order(id)) in two tiers: a small per-process LRU with a short TTL in front
+of the Django cache named by CRM_ENTITY_CACHE_ALIAS.
+
+Keys are versioned twice: FORMAT changes whenever the cached model shape
+does, and each model has a generation counter in the shared cache, so
+invalidate_all() retires every entry of a model without scanning. Missing
+ids are cached too (for CRM_ENTITY_CACHE_NEGATIVE_TIMEOUT) so repeated
+lookups of deleted rows do not reach the database.
+
+Writes invalidate through the model signals (crm.signals) and explicitly
+where rows change with queryset.update(). Inside a transaction the row is
+also marked dirty for this thread, so it bypasses the cache until the
+commit, when it is invalidated again; uncommitted values are never cached.
+Invalidation leaves a tombstone for CRM_ENTITY_CACHE_TOMBSTONE_TIMEOUT
+seconds and misses fill with add(), so a lookup that loaded the row before
+a write committed cannot cache it over the invalidation; until the
+tombstone expires, lookups of that row read the database.
+Other processes may serve an entry from their local tier for up to
+CRM_ENTITY_CACHE_LOCAL_TTL seconds after it changed.
+"""
+import copy
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+
+from .models import Customer, Order, Product
+
+CACHED_MODELS = (Customer, Product, Order)
+
+# Bump when a cached model gains or loses fields
+FORMAT = 1
+
+_MISSING = 'crm:entity:missing'
+_TOMBSTONE = 'crm:entity:invalidated'
+
+
+def _setting(name, default):
+    return getattr(settings, f'CRM_ENTITY_CACHE_{name}', default)
+
+
+class LocalLRU:
+    """Thread-safe LRU whose entries also expire ttl seconds after being set."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, maxsize):
+        if ttl <= 0 or maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self, label=None):
+        with self._lock:
+            if label is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == label]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class EntityCache:
+    COUNTERS = ('local_hits', 'shared_hits', 'misses', 'negative_hits', 'bypasses', 'invalidations')
+
+    def __init__(self):
+        self.local = LocalLRU()
+        self._counters = defaultdict(Counter)
+        self._counters_lock = threading.Lock()
+        self._thread = threading.local()
+
+    @property
+    def store(self):
+        return caches[_setting('ALIAS', 'default')]
+
+    def _count(self, label, counter):
+        with self._counters_lock:
+            self._counters[label][counter] += 1
+
+    def _dirty(self):
+        if not hasattr(self._thread, 'dirty'):
+            self._thread.dirty = set()
+        elif self._thread.dirty and not connection.in_atomic_block:
+            # The transaction that dirtied these rows has ended; on a rollback
+            # no on_commit hook ran to clear them.
+            self._thread.dirty.clear()
+        return self._thread.dirty
+
+    def _generation_key(self, label):
+        return f'crm:entity:{FORMAT}:{label}:generation'
+
+    def _generation(self, label):
+        local_key = (label, 'generation')
+        generation = self.local.get(local_key)
+        if generation is None:
+            generation = self.store.get_or_set(self._generation_key(label), 1, None)
+            self.local.set(local_key, generation, _setting('LOCAL_TTL', 5), _setting('LOCAL_SIZE', 1024))
+        return generation
+
+    def _key(self, label, pk):
+        return f'crm:entity:{FORMAT}:{label}:{pk}'
+
+    def get(self, model, pk):
+        """
+        model._default_manager.get(pk=pk) through both cache tiers. Returns a
+        private copy of the instance; raises model.DoesNotExist for missing ids.
+        """
+        pk = model._meta.pk.to_python(pk)
+        label = model._meta.label_lower
+        if not _setting('ENABLED', True):
+            return model._default_manager.get(pk=pk)
+        if (label, pk) in self._dirty():
+            self._count(label, 'bypasses')
+            return model._default_manager.get(pk=pk)
+
+        value = self.local.get((label, pk))
+        if value is not None:
+            self._count(label, 'local_hits')
+            return self._result(model, label, value)
+
+        generation = self._generation(label)
+        value = self.store.get(self._key(label, pk), version=generation)
+        if value is not None and value != _TOMBSTONE:
+            self._count(label, 'shared_hits')
+            self._remember_locally(label, pk, value)
+            return self._result(model, label, value)
+
+        self._count(label, 'misses')
+        try:
+            value = model._default_manager.get(pk=pk)
+            timeout = _setting('TIMEOUT', 300)
+        except model.DoesNotExist:
+            value = _MISSING
+            timeout = _setting('NEGATIVE_TIMEOUT', 30)
+        # Not set(): an invalidation that ran while the row was loading must win
+        if self.store.add(self._key(label, pk), value, timeout, version=generation):
+            self._remember_locally(label, pk, value)
+        return self._result(model, label, value, counted=True)
+
+    async def aget(self, model, pk):
+        """
+        get() for async code. Local tier hits are served on the event loop;
+        everything else runs get() in the request's sync thread, where the
+        async ORM keeps its connection and transactions.
+        """
+        if _setting('ENABLED', True):
+            label = model._meta.label_lower
+            value = self.local.get((label, model._meta.pk.to_python(pk)))
+            if value is not None:
+                self._count(label, 'local_hits')
+                return self._result(model, label, value)
+        return await sync_to_async(self.get)(model, pk)
+
+    def _remember_locally(self, label, pk, value):
+        self.local.set((label, pk), value, _setting('LOCAL_TTL', 5), _setting('LOCAL_SIZE', 1024))
+
+    def _result(self, model, label, value, counted=False):
+        if value == _MISSING:
+            if not counted:
+                self._count(label, 'negative_hits')
+            raise model.DoesNotExist(f"{model._meta.object_name} matching query does not exist.")
+        return copy.copy(value)
+
+    def invalidate(self, model, pk):
+        self.invalidate_many(model, [pk])
+
+    def invalidate_many(self, model, pks):
+        """Drop the entries for pks now and, inside a transaction, again on commit."""
+        pks = [model._meta.pk.to_python(pk) for pk in pks if pk is not None]
+        if not pks:
+            return
+        label = model._meta.label_lower
+        self._forget(label, pks)
+        with self._counters_lock:
+            self._counters[label]['invalidations'] += len(pks)
+        if connection.in_atomic_block:
+            dirty = self._dirty()
+            keys = {(label, pk) for pk in pks}
+            dirty.update(keys)
+
+            def committed():
+                dirty.difference_update(keys)
+                self._forget(label, pks)
+
+            transaction.on_commit(committed)
+
+    def _forget(self, label, pks):
+        for pk in pks:
+            self.local.delete((label, pk))
+        self.store.set_many(
+            {self._key(label, pk): _TOMBSTONE for pk in pks},
+            _setting('TOMBSTONE_TIMEOUT', 2), version=self._generation(label),
+        )
+
+    def invalidate_all(self, model):
+        """Retire every cached entry of model by moving to a new key generation."""
+        label = model._meta.label_lower
+        key = self._generation_key(label)
+        try:
+            self.store.incr(key)
+        except ValueError:
+            self.store.set(key, 2, None)
+        self.local.clear(label)
+        self._count(label, 'invalidations')
+
+    def stats(self):
+        """Per-model counters of this process, e.g. for monitoring."""
+        with self._counters_lock:
+            return {
+                model._meta.label_lower: {
+                    name: self._counters[model._meta.label_lower][name] for name in self.COUNTERS
+                }
+                for model in CACHED_MODELS
+            }
+
+    def clear(self):
+        """Empty the local tier, this thread's dirty set and the counters."""
+        self.local.clear()
+        self._dirty().clear()
+        with self._counters_lock:
+            self._counters.clear()
+
+
+entity_cache = EntityCache()
@@ -0,0 +1,114 @@
+"""
+Streaming exports of customers, products and orders as NDJSON or CSV.
+
+Rows are read with QuerySet.iterator(chunk_size), so memory stays flat
+however many rows match, and encoded one chunk at a time. Order products
+are fetched with one query per chunk (prefetch_related on the iterator),
+not per row. Filters are the GraphQL list arguments (e.g. customerName,
+orderBy: "-orderDate"), applied through the same FilterSets.
+"""
+import csv
+from collections import namedtuple
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Prefetch
+
+from alx_backend_graphql.encoders import get_encoder
+from .filters import CustomerFilter, OrderFilter, ProductFilter, filter_queryset
+from .models import Customer, Order, OrderItem, Product
+
+Export = namedtuple('Export', 'model filterset_class columns')
+
+EXPORTS = {
+    'customers': Export(Customer, CustomerFilter, (
+        ('id', lambda customer: customer.id),
+        ('name', lambda customer: customer.name),
+        ('email', lambda customer: customer.email),
+        ('phone', lambda customer: customer.phone),
+        ('created_at', lambda customer: customer.created_at),
+        ('order_count', lambda customer: customer.order_count),
+        ('last_order_date', lambda customer: customer.last_order_date),
+        ('lifetime_value', lambda customer: customer.lifetime_value),
+    )),
+    'products': Export(Product, ProductFilter, (
+        ('id', lambda product: product.id),
+        ('name', lambda product: product.name),
+        ('price', lambda product: product.price),
+        ('stock', lambda product: product.stock),
+        ('created_at', lambda product: product.created_at),
+    )),
+    'orders': Export(Order, OrderFilter, (
+        ('id', lambda order: order.id),
+        ('customer_id', lambda order: order.customer_id),
+        ('customer_name', lambda order: order.customer.name),
+        ('total_amount', lambda order: order.total_amount),
+        ('order_date', lambda order: order.order_date),
+        ('created_at', lambda order: order.created_at),
+        ('product_ids', lambda order: [item.product_id for item in order.items.all()]),
+    )),
+}
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def chunk_size():
+    return getattr(settings, 'CRM_EXPORT_CHUNK_SIZE', 2000)
+
+
+def export_queryset(kind, args, request=None):
+    """The filtered queryset of an export; raises ValidationError for bad filters."""
+    export = EXPORTS[kind]
+    queryset = filter_queryset(export.filterset_class, export.model.objects.all(), args, request=request)
+    if not queryset.query.order_by:
+        queryset = queryset.order_by('pk')
+    if kind == 'orders':
+        queryset = queryset.select_related('customer').prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.only('order_id', 'product_id').order_by('pk'))
+        )
+    return queryset
+
+
+def _chunks(queryset, size):
+    rows = queryset.iterator(chunk_size=size)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+class _Lines:
+    """File-like object csv.writer writes to, handing each line back."""
+
+    def write(self, line):
+        return line
+
+
+def stream_export(queryset, kind, fmt, size=None):
+    """Yield the rows of queryset encoded as fmt, one bytes chunk per size rows."""
+    columns = EXPORTS[kind].columns
+    size = size or chunk_size()
+    if fmt == 'ndjson':
+        encode = get_encoder()
+        for chunk in _chunks(queryset, size):
+            yield b''.join(
+                encode({name: value(row) for name, value in columns}) + b'\n' for row in chunk
+            )
+    else:
+        writer = csv.writer(_Lines())
+        yield writer.writerow([name for name, _ in columns]).encode('utf-8')
+        for chunk in _chunks(queryset, size):
+            yield ''.join(
+                writer.writerow([_csv_value(value(row)) for _, value in columns]) for row in chunk
+            ).encode('utf-8')
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ' '.join(str(item) for item in value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
@@ -1,34 +1,97 @@
 import django_filters
-from django.db.models import Q
-from .models import Customer, Product, Order
+from django.core.exceptions import ValidationError
+from django.db.models import BooleanField, Func, Q
+from django_filters.constants import EMPTY_VALUES
+from graphene.utils.str_converters import to_snake_case
+from .models import Customer, Product, Order, ArchivedOrder, normalize_phone
+from .search import contains
+
+class SearchFilter(django_filters.CharFilter):
+    """Case-insensitive substring match, served by the trigram search index where one exists."""
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        if self.distinct:
+            qs = qs.distinct()
+        return contains(qs, self.field_name, value)
+
+class Unlikely(Func):
+    """
+    SQLite's unlikely(condition): a no-op when the query runs, but it tells
+    the planner the condition is selective. Without statistics SQLite may
+    otherwise walk the pagination order's index and test every row against
+    a range filter, rather than seek the filtered column's index and sort
+    the matches. Other vendors get the bare condition.
+    """
+    function = 'unlikely'
+    output_field = BooleanField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return compiler.compile(self.source_expressions[0])
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, **extra_context)
+
+class SelectiveFilterMixin:
+    """A range filter whose condition is passed to the planner through Unlikely."""
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        return qs.filter(Unlikely(Q(**{f'{self.field_name}__{self.lookup_expr}': value})))
+
+class RangeNumberFilter(SelectiveFilterMixin, django_filters.NumberFilter):
+    pass
+
+class RangeDateTimeFilter(SelectiveFilterMixin, django_filters.DateTimeFilter):
+    pass
 
 class CustomerFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(lookup_expr='icontains')
-    email = django_filters.CharFilter(lookup_expr='icontains')
-    created_at_gte = django_filters.DateTimeFilter(field_name='created_at', lookup_expr='gte')
-    created_at_lte = django_filters.DateTimeFilter(field_name='created_at', lookup_expr='lte')
+    name = SearchFilter()
+    email = SearchFilter()
+    created_at_gte = RangeDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_at_lte = RangeDateTimeFilter(field_name='created_at', lookup_expr='lte')
     phone_pattern = django_filters.CharFilter(method='filter_phone_pattern')
+    order_count_gte = RangeNumberFilter(field_name='order_count', lookup_expr='gte')
+    order_count_lte = RangeNumberFilter(field_name='order_count', lookup_expr='lte')
+    lifetime_value_gte = RangeNumberFilter(field_name='lifetime_value', lookup_expr='gte')
+    lifetime_value_lte = RangeNumberFilter(field_name='lifetime_value', lookup_expr='lte')
+    last_order_date_gte = RangeDateTimeFilter(field_name='last_order_date', lookup_expr='gte')
+    last_order_date_lte = RangeDateTimeFilter(field_name='last_order_date', lookup_expr='lte')
     order_by = django_filters.OrderingFilter(
         fields=(
             ('name', 'name'),
             ('email', 'email'),
             ('created_at', 'created_at'),
+            ('order_count', 'order_count'),
+            ('last_order_date', 'last_order_date'),
+            ('lifetime_value', 'lifetime_value'),
         )
     )
 
     def filter_phone_pattern(self, queryset, name, value):
-        return queryset.filter(phone__startswith=value)
+        prefix = normalize_phone(value)
+        if prefix is None:
+            return queryset.filter(phone__startswith=value)
+        # Digits only, so every match sorts in [prefix, prefix with its last digit + 1)
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return queryset.filter(
+            Unlikely(Q(phone_normalized__gte=prefix)), Unlikely(Q(phone_normalized__lt=upper)),
+        )
 
     class Meta:
         model = Customer
-        fields = ['name', 'email', 'created_at_gte', 'created_at_lte', 'phone_pattern']
+        fields = ['name', 'email', 'created_at_gte', 'created_at_lte', 'phone_pattern',
+                  'order_count_gte', 'order_count_lte', 'lifetime_value_gte', 'lifetime_value_lte',
+                  'last_order_date_gte', 'last_order_date_lte']
 
 class ProductFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(lookup_expr='icontains')
-    price_gte = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
-    price_lte = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
-    stock_gte = django_filters.NumberFilter(field_name='stock', lookup_expr='gte')
-    stock_lte = django_filters.NumberFilter(field_name='stock', lookup_expr='lte')
+    name = SearchFilter()
+    price_gte = RangeNumberFilter(field_name='price', lookup_expr='gte')
+    price_lte = RangeNumberFilter(field_name='price', lookup_expr='lte')
+    stock_gte = RangeNumberFilter(field_name='stock', lookup_expr='gte')
+    stock_lte = RangeNumberFilter(field_name='stock', lookup_expr='lte')
     low_stock = django_filters.BooleanFilter(method='filter_low_stock')
     order_by = django_filters.OrderingFilter(
         fields=(
@@ -40,7 +103,7 @@ class ProductFilter(django_filters.FilterSet):
 
     def filter_low_stock(self, queryset, name, value):
         if value:
-            return queryset.filter(stock__lt=10)
+            return queryset.filter(Unlikely(Q(stock__lt=10)))
         return queryset
 
     class Meta:
@@ -48,13 +111,13 @@ class ProductFilter(django_filters.FilterSet):
         fields = ['name', 'price_gte', 'price_lte', 'stock_gte', 'stock_lte', 'low_stock']
 
 class OrderFilter(django_filters.FilterSet):
-    total_amount_gte = django_filters.NumberFilter(field_name='total_amount', lookup_expr='gte')
-    total_amount_lte = django_filters.NumberFilter(field_name='total_amount', lookup_expr='lte')
-    order_date_gte = django_filters.DateTimeFilter(field_name='order_date', lookup_expr='gte')
-    order_date_lte = django_filters.DateTimeFilter(field_name='order_date', lookup_expr='lte')
-    customer_name = django_filters.CharFilter(field_name='customer__name', lookup_expr='icontains')
-    product_name = django_filters.CharFilter(field_name='products__name', lookup_expr='icontains')
-    product_id = django_filters.NumberFilter(field_name='products__id')
+    total_amount_gte = RangeNumberFilter(field_name='total_amount', lookup_expr='gte')
+    total_amount_lte = RangeNumberFilter(field_name='total_amount', lookup_expr='lte')
+    order_date_gte = RangeDateTimeFilter(field_name='order_date', lookup_expr='gte')
+    order_date_lte = RangeDateTimeFilter(field_name='order_date', lookup_expr='lte')
+    customer_name = SearchFilter(field_name='customer__name')
+    product_name = SearchFilter(field_name='products__name')
+    product_id = django_filters.NumberFilter(method='filter_product_id')
     order_by = django_filters.OrderingFilter(
         fields=(
             ('order_date', 'order_date'),
@@ -63,6 +126,11 @@ class OrderFilter(django_filters.FilterSet):
         )
     )
 
+    def filter_product_id(self, queryset, name, value):
+        # Through the item table, not a join on products, so each order is returned once
+        items = queryset.model.products.through._default_manager
+        return queryset.filter(pk__in=items.filter(product_id=value).values('order_id'))
+
     class Meta:
         model = Order
         fields = [
@@ -70,4 +138,37 @@ class OrderFilter(django_filters.FilterSet):
             'order_date_gte', 'order_date_lte',
             'customer_name', 'product_name',
             'product_id'
-        ] 
\ No newline at end of file
+        ]
+
+class ArchivedOrderFilter(OrderFilter):
+    """OrderFilter for ArchivedOrder, which stores the customer name itself."""
+    customer_name = django_filters.CharFilter(field_name='customer_name', lookup_expr='icontains')
+    order_by = django_filters.OrderingFilter(
+        fields=(
+            ('order_date', 'order_date'),
+            ('total_amount', 'total_amount'),
+            ('customer_name', 'customer_name'),
+        )
+    )
+
+    class Meta(OrderFilter.Meta):
+        model = ArchivedOrder
+
+def filter_queryset(filterset_class, queryset, args, request=None):
+    """
+    Apply a FilterSet to queryset from GraphQL arguments. Argument names may
+    be camelCase (phonePattern, orderBy: "-orderDate") as sent by clients.
+    """
+    data = {}
+    for key, value in args.items():
+        if value is None:
+            continue
+        name = to_snake_case(key)
+        if name == 'order_by':
+            value = to_snake_case(value)
+        data[name] = value
+
+    filterset = filterset_class(data=data, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        raise ValidationError(filterset.form.errors.as_json())
+    return filterset.qs
@@ -0,0 +1,281 @@
+"""
+Incremental delivery (@defer and @stream) for query operations.
+
+graphql-core 3.2 neither defines nor implements these directives, so this
+module provides both. The directive definitions are in DIRECTIVES, to pass
+to graphene.Schema. IncrementalExecutionContext leaves deferred fragments
+and the items of streamed lists past initialCount out of the initial
+result, and records them instead. subsequent_payloads() then runs those
+records one at a time and yields the payloads of the @defer/@stream RFC
+(deferSpec=20220824):
+
+    {"data": {...}, "hasNext": true}
+    {"incremental": [{"data": {...}, "path": ["allOrders", "edges", 0, "node"]}], "hasNext": true}
+    {"incremental": [{"items": [{...}], "path": ["allOrders", "edges", 3]}], "hasNext": false}
+
+Deferred fields resolve through the same request loaders, so the products
+of every order on a page still load with one query. That query runs when
+the first payload that needs it is produced. Executors that don't
+implement incremental delivery, such as the plain one, treat the directives
+as no-ops and return complete results.
+"""
+from collections import deque, namedtuple
+
+from graphql import (
+    DirectiveLocation, ExecutionContext, ExecutionResult, FieldNode, GraphQLArgument,
+    GraphQLBoolean, GraphQLDirective, GraphQLError, GraphQLInt, GraphQLNonNull, GraphQLString,
+    BREAK, InlineFragmentNode, OperationType, Visitor, is_non_null_type, located_error,
+    specified_directives, visit,
+)
+from graphql.execution.collect_fields import (
+    does_fragment_condition_match, get_field_entry_key, should_include_node,
+)
+from graphql.execution.execute import CollectedErrors
+from graphql.execution.values import get_directive_values
+from graphql.pyutils import is_iterable
+
+GraphQLDeferDirective = GraphQLDirective(
+    name='defer',
+    locations=[DirectiveLocation.FRAGMENT_SPREAD, DirectiveLocation.INLINE_FRAGMENT],
+    args={
+        'if': GraphQLArgument(
+            GraphQLNonNull(GraphQLBoolean), default_value=True,
+            description='Deferred when true or undefined.',
+        ),
+        'label': GraphQLArgument(GraphQLString, description='Unique name'),
+    },
+    description='Directs the executor to defer this fragment when the `if` argument is true or undefined.',
+)
+
+GraphQLStreamDirective = GraphQLDirective(
+    name='stream',
+    locations=[DirectiveLocation.FIELD],
+    args={
+        'if': GraphQLArgument(
+            GraphQLNonNull(GraphQLBoolean), default_value=True,
+            description='Stream when true or undefined.',
+        ),
+        'label': GraphQLArgument(GraphQLString, description='Unique name'),
+        'initialCount': GraphQLArgument(
+            GraphQLInt, default_value=0, description='Number of items to return immediately',
+        ),
+    },
+    description='Directs the executor to stream plural fields when the `if` argument is true or undefined.',
+)
+
+DIRECTIVES = [*specified_directives, GraphQLDeferDirective, GraphQLStreamDirective]
+
+
+def active_directive(directive, node, variable_values):
+    """The arguments of directive on node, or None when it is absent or has if: false."""
+    values = get_directive_values(directive, node, variable_values)
+    if values is None or not values['if']:
+        return None
+    return values
+
+
+class _IncrementalDirectiveFinder(Visitor):
+    def __init__(self):
+        super().__init__()
+        self.found = False
+
+    def enter_directive(self, node, *args):
+        if node.name.value in (GraphQLDeferDirective.name, GraphQLStreamDirective.name):
+            self.found = True
+            return BREAK
+
+
+def uses_incremental_delivery(document):
+    """True if document has a @defer or @stream directive anywhere."""
+    finder = _IncrementalDirectiveFinder()
+    visit(document, finder)
+    return finder.found
+
+
+# A deferred fragment of the object at path, and a list whose items from index on are streamed
+DeferredFragment = namedtuple('DeferredFragment', 'label path parent_type source selection_set')
+StreamedList = namedtuple('StreamedList', 'label path item_type field_nodes info items index')
+
+
+class IncrementalExecutionContext(ExecutionContext):
+    """
+    ExecutionContext that defers @defer fragments and streams @stream list
+    items of query operations. The work left out of the initial result is
+    queued in pending, for subsequent_payloads() to run.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending = deque()
+        self._deferred_cache = {}
+
+    def collect_deferred(self, runtime_type, selection_sets):
+        """
+        Collect the fields of selection_sets on runtime_type like
+        collect_fields(), except for fragments under an active @defer.
+        Returns (fields, deferred), where deferred holds (label,
+        selection set) pairs of those fragments.
+        """
+        fields = {}
+        deferred = []
+        visited = set()
+        for selection_set in selection_sets:
+            self._collect(runtime_type, selection_set, fields, deferred, visited)
+        return fields, deferred
+
+    def _collect(self, runtime_type, selection_set, fields, deferred, visited):
+        for selection in selection_set.selections:
+            if not should_include_node(self.variable_values, selection):
+                continue
+            if isinstance(selection, FieldNode):
+                fields.setdefault(get_field_entry_key(selection), []).append(selection)
+                continue
+            if isinstance(selection, InlineFragmentNode):
+                fragment = selection
+            else:
+                if selection.name.value in visited:
+                    continue
+                fragment = self.fragments.get(selection.name.value)
+            if fragment is None or not does_fragment_condition_match(self.schema, fragment, runtime_type):
+                continue
+            defer = active_directive(GraphQLDeferDirective, selection, self.variable_values)
+            if defer is not None:
+                deferred.append((defer.get('label'), fragment.selection_set))
+                continue
+            if not isinstance(selection, InlineFragmentNode):
+                visited.add(selection.name.value)
+            self._collect(runtime_type, fragment.selection_set, fields, deferred, visited)
+
+    def _collect_subfields(self, return_type, field_nodes):
+        key = (return_type, *map(id, field_nodes))
+        entry = self._deferred_cache.get(key)
+        if entry is None:
+            entry = self._deferred_cache[key] = self.collect_deferred(
+                return_type, [node.selection_set for node in field_nodes if node.selection_set]
+            )
+        return entry
+
+    def collect_subfields(self, return_type, field_nodes):
+        if self.operation.operation != OperationType.QUERY:
+            return super().collect_subfields(return_type, field_nodes)
+        return self._collect_subfields(return_type, field_nodes)[0]
+
+    def defer(self, deferred, path, parent_type, source):
+        for label, selection_set in deferred:
+            self.pending.append(DeferredFragment(label, path, parent_type, source, selection_set))
+
+    def execute_operation(self, operation, root_value):
+        if operation.operation != OperationType.QUERY:
+            return super().execute_operation(operation, root_value)
+        root_type = self.schema.query_type
+        fields, deferred = self.collect_deferred(root_type, [operation.selection_set])
+        self.defer(deferred, None, root_type, root_value)
+        return self.execute_fields(root_type, root_value, None, fields)
+
+    def complete_object_value(self, return_type, field_nodes, info, path, result):
+        if self.operation.operation == OperationType.QUERY:
+            self.defer(self._collect_subfields(return_type, field_nodes)[1], path, return_type, result)
+        return super().complete_object_value(return_type, field_nodes, info, path, result)
+
+    def complete_list_value(self, return_type, field_nodes, info, path, result):
+        stream = None
+        if self.operation.operation == OperationType.QUERY and is_iterable(result):
+            stream = active_directive(GraphQLStreamDirective, field_nodes[0], self.variable_values)
+        if stream is None:
+            return super().complete_list_value(return_type, field_nodes, info, path, result)
+
+        initial_count = stream['initialCount']
+        if initial_count is None or initial_count < 0:
+            raise GraphQLError('initialCount must be a positive integer', field_nodes)
+        items = list(result)
+        completed = super().complete_list_value(return_type, field_nodes, info, path, items[:initial_count])
+        if len(items) > initial_count:
+            self.pending.append(StreamedList(
+                stream.get('label'), path, return_type.of_type, field_nodes, info, items, initial_count,
+            ))
+        return completed
+
+    def subsequent_payloads(self):
+        """
+        Run the pending records in order, yielding one payload per deferred
+        fragment or streamed item. Records queued while running one (e.g. a
+        @defer inside a streamed item) run after it.
+        """
+        while self.pending:
+            record = self.pending.popleft()
+            if isinstance(record, StreamedList):
+                for index in range(record.index, len(record.items)):
+                    incremental = self.run_stream_item(record, index)
+                    has_next = index + 1 < len(record.items) or bool(self.pending)
+                    yield {'incremental': [incremental], 'hasNext': has_next}
+            else:
+                yield {'incremental': [self.run_deferred(record)], 'hasNext': bool(self.pending)}
+
+    def _run(self, run):
+        """run() with the errors it reports kept apart, as one incremental result."""
+        self.collected_errors = CollectedErrors()
+        try:
+            value = run()
+        except GraphQLError as error:
+            # A non-null field failed and nulled everything up to the payload root
+            self.collected_errors.add(error, None)
+            value = None
+        return value, self.build_response(None, self.collected_errors.errors).errors
+
+    def run_deferred(self, record):
+        def run():
+            fields, deferred = self.collect_deferred(record.parent_type, [record.selection_set])
+            self.defer(deferred, record.path, record.parent_type, record.source)
+            return self.execute_fields(record.parent_type, record.source, record.path, fields)
+
+        data, errors = self._run(run)
+        return self._incremental({'data': data}, record.label, record.path, errors)
+
+    def run_stream_item(self, record, index):
+        path = record.path.add_key(index, None)
+
+        def run():
+            try:
+                return self.complete_value(record.item_type, record.field_nodes, record.info, path,
+                                           record.items[index])
+            except Exception as raw_error:
+                error = located_error(raw_error, record.field_nodes, path.as_list())
+                if is_non_null_type(record.item_type):
+                    raise error
+                self.handle_field_error(error, record.item_type, path)
+                return None
+
+        item, errors = self._run(run)
+        items = None if errors and item is None and is_non_null_type(record.item_type) else [item]
+        return self._incremental({'items': items}, record.label, path, errors)
+
+    @staticmethod
+    def _incremental(result, label, path, errors):
+        result['path'] = path.as_list() if path is not None else []
+        if label is not None:
+            result['label'] = label
+        if errors:
+            result['errors'] = errors
+        return result
+
+
+def execute_incremental(schema, document, root_value=None, context_value=None, variable_values=None,
+                        operation_name=None, middleware=None):
+    """
+    Execute document with @defer/@stream. Returns (result, payloads): the
+    initial ExecutionResult, and an iterator of the subsequent payloads, or
+    None when nothing was deferred or streamed.
+    """
+    context = IncrementalExecutionContext.build(
+        schema, document, root_value, context_value, variable_values, operation_name, middleware=middleware,
+    )
+    if isinstance(context, list):
+        return ExecutionResult(data=None, errors=context), None
+    try:
+        data = context.execute_operation(context.operation, root_value)
+    except GraphQLError as error:
+        context.collected_errors.add(error, None)
+        context.pending.clear()
+        data = None
+    result = context.build_response(data, context.collected_errors.errors)
+    return result, (context.subsequent_payloads() if context.pending else None)
@@ -0,0 +1,35 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+
+from .entity_cache import entity_cache
+from .models import Product
+
+
+class OutOfStockError(ValidationError):
+    def __init__(self, product_id, requested, name=None):
+        self.product_id = product_id
+        self.requested = requested
+        label = name or f"product {product_id}"
+        super().__init__(f"Insufficient stock for {label}: requested {requested}")
+
+
+def reserve_stock(quantities, names=None):
+    """
+    Decrement stock for {product id: quantity} with one conditional
+    UPDATE ... SET stock = stock - n WHERE stock >= n per product.
+
+    Products are locked in id order so concurrent reservations cannot
+    deadlock. If any product is short, OutOfStockError is raised and every
+    decrement made here is rolled back.
+    """
+    names = names or {}
+    with transaction.atomic():
+        for product_id in sorted(quantities):
+            requested = quantities[product_id]
+            reserved = Product.objects.filter(pk=product_id, stock__gte=requested).update(
+                stock=F('stock') - requested
+            )
+            if not reserved:
+                raise OutOfStockError(product_id, requested, names.get(product_id))
+        entity_cache.invalidate_many(Product, sorted(quantities))
@@ -0,0 +1,291 @@
+import asyncio
+from collections import defaultdict
+
+from .models import Order
+
+_MISSING = object()
+
+
+def _level(path):
+    """Return a response path with list indices stripped, e.g. ('allOrders', 'products')."""
+    if path is None:
+        return ()
+    return tuple(key for key in path.as_list() if not isinstance(key, int))
+
+
+class LevelRegistry:
+    """
+    Remembers which objects were resolved at each execution level of a request,
+    so a relation loader can batch the whole level when the first parent asks.
+    """
+
+    def __init__(self):
+        self._objects = defaultdict(list)
+
+    def register(self, level, objects):
+        self._objects[level].extend(objects)
+
+    def siblings(self, level):
+        return self._objects.get(level, [])
+
+
+class RelationLoader:
+    """
+    Base class for request-scoped relation loaders.
+
+    The first time a level is seen, the relation is loaded for every registered
+    sibling parent with a single IN (...) query and the results are registered
+    as the parents of the next level. Relations already fetched by
+    select_related/prefetch_related are reused instead of queried again.
+    Subclasses implement key_for, batch_load, abatch_load and from_instance.
+
+    An asynchronous loader's load() returns a coroutine instead: the first
+    sibling of a level starts the batch with the async ORM and the others
+    await that same batch.
+    """
+    many = False
+
+    def __init__(self, registry, asynchronous=False):
+        self.registry = registry
+        self.asynchronous = asynchronous
+        # Values by level, then key. The parents of one level come from a
+        # single selection, so an instance only()-projected for it is never
+        # served to a selection that reads other columns.
+        self._caches = defaultdict(dict)
+        self._seen_levels = set()
+        self._batches = {}
+
+    def key_for(self, parent):
+        raise NotImplementedError
+
+    def batch_load(self, keys):
+        """Return a dict mapping each loaded key to its value."""
+        raise NotImplementedError
+
+    async def abatch_load(self, keys):
+        """batch_load with the async ORM."""
+        raise NotImplementedError
+
+    def from_instance(self, parent):
+        """Return the relation if the parent already carries it, else _MISSING."""
+        return _MISSING
+
+    def _take_cached(self, cache, parents):
+        for parent in parents:
+            key = self.key_for(parent)
+            if key is None or key in cache:
+                continue
+            value = self.from_instance(parent)
+            if value is not _MISSING:
+                cache[key] = value
+
+    def _empty(self):
+        return [] if self.many else None
+
+    @staticmethod
+    def _missing(cache, keys):
+        return {key for key in keys if key is not None and key not in cache}
+
+    def _store(self, cache, keys, loaded):
+        for key in keys:
+            cache[key] = loaded.get(key, self._empty())
+
+    def _prime(self, cache, keys):
+        missing = self._missing(cache, keys)
+        if missing:
+            self._store(cache, missing, self.batch_load(list(missing)))
+
+    async def _aprime(self, cache, keys):
+        missing = self._missing(cache, keys)
+        if missing:
+            self._store(cache, missing, await self.abatch_load(list(missing)))
+
+    def _values(self, cache, keys):
+        values = []
+        for key in dict.fromkeys(keys):
+            value = cache.get(key)
+            if self.many:
+                values.extend(value or [])
+            elif value is not None:
+                values.append(value)
+        return values
+
+    def load(self, info, parent):
+        """Return the related value(s) for parent, batching across its siblings."""
+        if self.asynchronous:
+            return self._aload(info, parent)
+        key = self.key_for(parent)
+        if key is None:
+            return self._empty()
+
+        level = _level(info.path)
+        cache = self._caches[level]
+        if level not in self._seen_levels:
+            self._seen_levels.add(level)
+            siblings = self.registry.siblings(_level(info.path.prev)) or [parent]
+            keys = [self.key_for(sibling) for sibling in siblings]
+            self._take_cached(cache, siblings + [parent])
+            self._prime(cache, keys + [key])
+            self.registry.register(level, self._values(cache, keys + [key]))
+        else:
+            self._take_cached(cache, [parent])
+            self._prime(cache, [key])
+        return cache[key]
+
+    async def _aload(self, info, parent):
+        key = self.key_for(parent)
+        if key is None:
+            return self._empty()
+
+        level = _level(info.path)
+        cache = self._caches[level]
+        batch = self._batches.get(level)
+        if batch is None:
+            siblings = self.registry.siblings(_level(info.path.prev)) or [parent]
+            keys = [self.key_for(sibling) for sibling in siblings] + [key]
+            self._take_cached(cache, siblings + [parent])
+            batch = self._batches[level] = asyncio.ensure_future(self._aload_level(level, cache, keys))
+        await batch
+        if key not in cache:
+            self._take_cached(cache, [parent])
+            await self._aprime(cache, [key])
+        return cache[key]
+
+    async def _aload_level(self, level, cache, keys):
+        await self._aprime(cache, keys)
+        self.registry.register(level, self._values(cache, keys))
+
+
+class ForeignKeyLoader(RelationLoader):
+    """Loads the target of a forward ForeignKey, e.g. Order.customer."""
+
+    def __init__(self, registry, model, field_name, asynchronous=False):
+        super().__init__(registry, asynchronous)
+        self.field = model._meta.get_field(field_name)
+
+    def key_for(self, parent):
+        return getattr(parent, self.field.attname)
+
+    def batch_load(self, keys):
+        return self.field.related_model._default_manager.in_bulk(keys)
+
+    async def abatch_load(self, keys):
+        return await self.field.related_model._default_manager.ain_bulk(keys)
+
+    def from_instance(self, parent):
+        if self.field.is_cached(parent):
+            return getattr(parent, self.field.name)
+        return _MISSING
+
+
+def _prefetched(parent, cache_name):
+    cache = getattr(parent, '_prefetched_objects_cache', {})
+    if cache_name in cache:
+        return list(cache[cache_name])
+    return _MISSING
+
+
+class ReverseForeignKeyLoader(RelationLoader):
+    """Loads the objects pointing at a parent through a ForeignKey, e.g. Customer.orders."""
+    many = True
+
+    def __init__(self, registry, model, field_name, asynchronous=False):
+        super().__init__(registry, asynchronous)
+        self.model = model
+        self.field = model._meta.get_field(field_name)
+
+    def key_for(self, parent):
+        return parent.pk
+
+    def _queryset(self, keys):
+        return self.model._default_manager.filter(**{f'{self.field.attname}__in': keys}).order_by('pk')
+
+    def batch_load(self, keys):
+        grouped = defaultdict(list)
+        for obj in self._queryset(keys):
+            grouped[getattr(obj, self.field.attname)].append(obj)
+        return grouped
+
+    async def abatch_load(self, keys):
+        grouped = defaultdict(list)
+        async for obj in self._queryset(keys):
+            grouped[getattr(obj, self.field.attname)].append(obj)
+        return grouped
+
+    def from_instance(self, parent):
+        return _prefetched(parent, self.field.remote_field.get_cache_name())
+
+
+class ManyToManyLoader(RelationLoader):
+    """Loads a forward ManyToMany relation with one query on the through table, e.g. Order.products."""
+    many = True
+
+    def __init__(self, registry, model, field_name, asynchronous=False):
+        super().__init__(registry, asynchronous)
+        self.field = model._meta.get_field(field_name)
+        self.through = self.field.remote_field.through
+        self.source = self.field.m2m_field_name()
+        self.target = self.field.m2m_reverse_field_name()
+
+    def key_for(self, parent):
+        return parent.pk
+
+    def _rows(self, keys):
+        return (
+            self.through._default_manager
+            .filter(**{f'{self.source}_id__in': keys})
+            .select_related(self.target)
+            .order_by('pk')
+        )
+
+    def batch_load(self, keys):
+        grouped = defaultdict(list)
+        for row in self._rows(keys):
+            grouped[getattr(row, f'{self.source}_id')].append(getattr(row, self.target))
+        return grouped
+
+    async def abatch_load(self, keys):
+        grouped = defaultdict(list)
+        async for row in self._rows(keys):
+            grouped[getattr(row, f'{self.source}_id')].append(getattr(row, self.target))
+        return grouped
+
+    def from_instance(self, parent):
+        return _prefetched(parent, self.field.name)
+
+
+class CRMLoaders:
+    """
+    Per-request set of loaders. New relation fields add one loader here and
+    call get_loaders(info).<name>.load(info, self) from their resolver.
+    The async GraphQL view installs an asynchronous set on the request.
+    """
+
+    def __init__(self, asynchronous=False):
+        self.levels = LevelRegistry()
+        self.order_customer = ForeignKeyLoader(self.levels, Order, 'customer', asynchronous)
+        self.order_products = ManyToManyLoader(self.levels, Order, 'products', asynchronous)
+        self.customer_orders = ReverseForeignKeyLoader(self.levels, Order, 'customer', asynchronous)
+
+    def register(self, info, objects, path=()):
+        """
+        Record the objects returned by a list field so their children batch
+        together. path names wrapper fields below the field, e.g. ('edges', 'node').
+        """
+        objects = list(objects)
+        self.levels.register(_level(info.path) + tuple(path), objects)
+        return objects
+
+
+def get_loaders(info):
+    """Return the loaders attached to the request context, creating them on first use."""
+    context = info.context
+    if context is None:
+        # No request to hang the loaders on (e.g. a bare schema.execute call);
+        # results are still correct, only batching across siblings is lost.
+        return CRMLoaders()
+    loaders = getattr(context, 'crm_loaders', None)
+    if loaders is None:
+        loaders = CRMLoaders()
+        context.crm_loaders = loaders
+    return loaders
@@ -0,0 +1,76 @@
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from crm.archive import archive_customers, archive_orders, inactive_filter
+from crm.models import Customer, Order
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves inactive customers (with their orders) and old orders of active '
+        'customers from the live tables to the archive tables'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reference-date',
+            help='Date the cutoffs are counted back from (YYYY-MM-DD, default: now)',
+        )
+        parser.add_argument(
+            '--inactive-days',
+            type=int,
+            default=365,
+            help='Archive customers without an order in this many days (default: 365)',
+        )
+        parser.add_argument(
+            '--order-days',
+            type=int,
+            help='Archive orders older than this many days (default: --inactive-days)',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+
+    def handle(self, *args, **options):
+        if options['reference_date']:
+            try:
+                now = timezone.make_aware(datetime.strptime(options['reference_date'], '%Y-%m-%d'))
+            except ValueError as e:
+                raise CommandError(f"Invalid date: {e}")
+        else:
+            now = timezone.now()
+        order_days = options['order_days'] or options['inactive_days']
+        if order_days < options['inactive_days']:
+            # An active customer's latest order must stay live, or the counter
+            # cache would mark them as never having ordered.
+            raise CommandError('--order-days must not be shorter than --inactive-days')
+
+        customers = Customer.objects.filter(inactive_filter(now - timedelta(days=options['inactive_days'])))
+        orders = Order.objects.filter(order_date__lt=now - timedelta(days=order_days))
+        if options['dry_run']:
+            inactive = customers.count()
+            old_orders = orders.exclude(customer__in=customers).count()
+            self.stdout.write(
+                f"Would archive {inactive} inactive customers and {old_orders} old orders of active customers"
+            )
+            return
+
+        size = options['batch_size']
+        moved_customers = self.run_step('customers', archive_customers, customers, size)
+        # The inactive customers and their orders are gone, so this only
+        # picks up old orders of customers who are still active.
+        moved_orders = self.run_step('orders', archive_orders, orders, size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved_customers} customers and {moved_orders} orders"
+        ))
+
+    def run_step(self, label, mover, queryset, size):
+        started = time.perf_counter()
+
+        def progress(moved):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"Archived {moved} {label} ({moved / elapsed if elapsed else 0:.0f}/s)")
+
+        return mover(queryset, size, progress)
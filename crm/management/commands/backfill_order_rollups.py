@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.rollups import backfill
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the OrderDailyRollup rows from the orders table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end', help='Last day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+
+        days = backfill(start, end)
+        span = f" from {start or 'the first order'} to {end or 'the last order'}"
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {days} daily rollups{span}"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from crm.bulk import id_batches
+from crm.entity_cache import entity_cache
+from crm.models import Customer, normalize_phone
+
+
+class Command(BaseCommand):
+    help = 'Fills Customer.phone_normalized for rows written without save(), e.g. by queryset.update()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Customers read per transaction')
+
+    def handle(self, *args, **options):
+        checked = updated = 0
+        for ids in id_batches(Customer.objects.all(), options['batch_size']):
+            with transaction.atomic():
+                stale = [
+                    Customer(id=pk, phone_normalized=normalize_phone(phone))
+                    for pk, phone, stored in (
+                        Customer.objects.filter(id__in=ids).values_list('id', 'phone', 'phone_normalized')
+                    )
+                    if normalize_phone(phone) != stored
+                ]
+                Customer.objects.bulk_update(stale, ['phone_normalized'])
+                entity_cache.invalidate_many(Customer, [customer.pk for customer in stale])
+            checked += len(ids)
+            updated += len(stale)
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} customers, updated {updated}"))
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from asgiref.sync import ThreadSensitiveContext
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from crm.benchmark import percentile
+from crm.models import Customer, Order, OrderItem, Product
+
+EMAIL_DOMAIN = '@async-benchmark.example.com'
+
+QUERY = '''
+query {
+    allOrders(first: 20) {
+        edges { node { id totalAmount customer { name } products { name } } }
+    }
+    totalOrders
+    totalRevenue
+}
+'''
+
+
+def summarize_load(label, latencies, elapsed):
+    return (
+        f"{label}: {len(latencies) / elapsed:.0f} requests/s, "
+        f"mean {statistics.mean(latencies):.1f} ms, p50 {percentile(latencies, 50):.1f} ms, "
+        f"p99 {percentile(latencies, 99):.1f} ms"
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares requests/s and p99 latency of the sync (/graphql/) and async '
+        '(/graphql/async/) GraphQL views under concurrent clients'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per path, split across clients')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Threads serving the sync view, like a threaded WSGI server')
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--query-latency', type=float, default=0.0,
+                            help='Milliseconds added to every query, to stand in for a networked database')
+
+    def handle(self, *args, **options):
+        # Every client has its own connection, so fixtures must be committed;
+        # they are removed again afterwards.
+        self.create_fixtures(options['orders'])
+        latency = options['query_latency'] / 1000
+
+        def delay(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            connection.execute_wrappers.append(delay)
+
+        if latency:
+            # Client threads open their own connections after this point
+            connection_created.connect(add_latency, weak=False)
+        try:
+            # Measure executions, not coalesced waits; the clients send Host: testserver
+            with override_settings(GRAPHQL_COALESCE_QUERIES=False,
+                                   ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                per_client = max(1, options['requests'] // options['clients'])
+                self.stdout.write(summarize_load(
+                    f"sync  ({options['workers']} workers)",
+                    *self.run_sync(options['clients'], per_client, options['workers']),
+                ))
+                self.stdout.write(summarize_load(
+                    "async (event loop)", *asyncio.run(self.run_async(options['clients'], per_client)),
+                ))
+        finally:
+            connection_created.disconnect(add_latency)
+            self.remove_fixtures()
+
+    def create_fixtures(self, order_count):
+        products = Product.objects.bulk_create([
+            Product(name=f"Async benchmark {i}", price=Decimal('9.99'), stock=100) for i in range(10)
+        ])
+        customers = Customer.objects.bulk_create([
+            Customer(name=f"Async benchmark {i}", email=f"{i}{EMAIL_DOMAIN}") for i in range(50)
+        ])
+        orders = Order.objects.bulk_create([
+            Order(customer=customers[i % len(customers)], total_amount=Decimal('19.98'))
+            for i in range(order_count)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=products[(i + offset) % len(products)])
+            for i, order in enumerate(orders) for offset in range(2)
+        ])
+
+    def remove_fixtures(self):
+        Customer.objects.filter(email__endswith=EMAIL_DOMAIN).delete()
+        Product.objects.filter(name__startswith="Async benchmark").delete()
+
+    def request_body(self):
+        return {'data': json.dumps({'query': QUERY}), 'content_type': 'application/json'}
+
+    def run_sync(self, clients, per_client, workers):
+        """clients threads each send per_client requests to a pool of workers; returns (latencies, seconds)."""
+        server = ThreadPoolExecutor(max_workers=workers)
+        local = threading.local()
+        latencies = []
+
+        def serve():
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            return local.client.post('/graphql/', **self.request_body())
+
+        def client():
+            for _ in range(per_client):
+                start = time.perf_counter()
+                response = server.submit(serve).result()
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.content
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+        return latencies, elapsed
+
+    async def run_async(self, clients, per_client):
+        """clients tasks each send per_client requests to the ASGI handler; returns (latencies, seconds)."""
+        http = AsyncClient()
+        latencies = []
+
+        async def client():
+            for _ in range(per_client):
+                start = time.perf_counter()
+                # Like ASGIHandler: each request gets its own thread for sync work
+                async with ThreadSensitiveContext():
+                    response = await http.post('/graphql/async/', **self.request_body())
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.content
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        return latencies, time.perf_counter() - start
@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from crm.benchmark import measure, run_in_rollback, summarize
+from crm.bulk import create_order
+from crm.models import Customer, Order, Product
+
+
+def legacy_create_order(customer_id, product_ids):
+    """The original createOrder write path: INSERT, products.set(), then a second save()."""
+    customer = Customer.objects.get(pk=customer_id)
+    products = Product.objects.filter(id__in=product_ids)
+    order = Order.objects.create(customer=customer, total_amount=Decimal('0'))
+    order.products.set(products)
+    order.total_amount = sum(product.price for product in products)
+    order.save()
+    return order
+
+
+class Command(BaseCommand):
+    help = 'Compares statements and latency of the legacy and single-write createOrder paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--products', type=int, default=5, help='Products per order')
+
+    def handle(self, *args, **options):
+        run_in_rollback(lambda: self.run(options['iterations'], options['products']))
+
+    def run(self, iterations, product_count):
+        # Fixtures live only inside the rolled-back transaction
+        customer = Customer.objects.create(name="Benchmark", email="benchmark-create-order@example.com")
+        product_ids = [
+            Product.objects.create(name=f"Benchmark {i}", price=Decimal('9.99'), stock=10 ** 9).pk
+            for i in range(product_count)
+        ]
+
+        legacy = measure(lambda i: legacy_create_order(customer.pk, product_ids), iterations)
+        optimized = measure(lambda i: create_order(customer.pk, product_ids), iterations)
+
+        self.stdout.write(summarize("legacy   ", *legacy))
+        self.stdout.write(summarize("optimized", *optimized))
@@ -0,0 +1,83 @@
+import gzip
+import statistics
+import time
+import zlib
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from graphene_django.settings import graphene_settings
+
+from alx_backend_graphql.encoders import encode_json, encode_orjson
+from alx_backend_graphql.schema import schema
+from crm.benchmark import run_in_rollback
+from crm.models import Customer, Order, OrderItem, Product
+
+QUERY = '''
+query($first: Int) {
+    allOrders(first: $first) {
+        edges { node { id totalAmount orderDate customer { name email } products { name price } } }
+    }
+}
+'''
+
+
+def throughput(fn, size, iterations):
+    """Call fn() iterations times; returns (MB/s for size input bytes, mean ms)."""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    mean = statistics.mean(timings)
+    return size / mean / 1e6, mean * 1000
+
+
+class Command(BaseCommand):
+    help = 'Measures bytes/s of the JSON encoders and response compression on a large allOrders response'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000)
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--level', type=int, default=6, help='gzip/deflate compression level')
+
+    def handle(self, *args, **options):
+        run_in_rollback(lambda: self.run(options['rows'], options['iterations'], options['level']))
+
+    def run(self, rows, iterations, level):
+        # Fixtures live only inside the rolled-back transaction
+        products = Product.objects.bulk_create([
+            Product(name=f"Encoding benchmark {i}", price=Decimal('19.99'), stock=100) for i in range(20)
+        ])
+        customers = Customer.objects.bulk_create([
+            Customer(name=f"Encoding benchmark {i}", email=f"encoding-bench-{i}@example.com") for i in range(500)
+        ])
+        orders = Order.objects.bulk_create([
+            Order(customer=customers[i % len(customers)], total_amount=Decimal('39.98')) for i in range(rows)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=products[(i + offset) % len(products)])
+            for i, order in enumerate(orders) for offset in range(2)
+        ])
+
+        with mock.patch.object(graphene_settings, 'RELAY_CONNECTION_MAX_LIMIT', rows):
+            start = time.perf_counter()
+            result = schema.execute(QUERY, variable_values={'first': rows})
+            elapsed = (time.perf_counter() - start) * 1000
+        assert not result.errors, result.errors
+        response = {'data': result.data}
+        self.stdout.write(f"execute {rows} orders: {elapsed:.0f} ms")
+
+        body = encode_orjson(response)
+        assert encode_json(response) == body
+        self.stdout.write(f"response: {len(body) / 1e6:.2f} MB")
+        for label, encoder in (('json  ', encode_json), ('orjson', encode_orjson)):
+            rate, mean = throughput(lambda: encoder(response), len(body), iterations)
+            self.stdout.write(f"encode  {label}: {rate:.0f} MB/s, {mean:.1f} ms")
+        for label, compress in (
+            ('gzip   ', lambda: gzip.compress(body, compresslevel=level, mtime=0)),
+            ('deflate', lambda: zlib.compress(body, level)),
+        ):
+            rate, mean = throughput(compress, len(body), iterations)
+            ratio = len(body) / len(compress())
+            self.stdout.write(f"{label} level {level}: {rate:.0f} MB/s, {mean:.1f} ms, {ratio:.1f}x smaller")
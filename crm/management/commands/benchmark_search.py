@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from crm.benchmark import measure, run_in_rollback, summarize
+from crm.filters import CustomerFilter, filter_queryset
+from crm.models import Customer
+
+FIRST_NAMES = ['Ada', 'Grace', 'Alan', 'Edsger', 'Barbara', 'Donald', 'Margaret', 'Ken']
+LAST_NAMES = ['Lovelace', 'Hopper', 'Turing', 'Dijkstra', 'Liskov', 'Knuth', 'Hamilton', 'Thompson']
+
+
+class Command(BaseCommand):
+    help = 'Compares LIKE and trigram-index substring filters on customer names'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        run_in_rollback(lambda: self.run(options['rows'], options['iterations']))
+
+    def run(self, rows, iterations):
+        # Fixtures live only inside the rolled-back transaction
+        batch = []
+        for i in range(rows):
+            first = FIRST_NAMES[i % len(FIRST_NAMES)]
+            last = LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+            batch.append(Customer(name=f"{first} {last} {i:07d}", email=f"search-bench-{i}@example.com"))
+            if len(batch) == 10000:
+                Customer.objects.bulk_create(batch)
+                batch = []
+        Customer.objects.bulk_create(batch)
+
+        terms = {
+            'rare': f"{rows // 2:07d}",   # one row
+            'common': 'ovelac',           # one name in eight
+        }
+        for label, term in terms.items():
+            def page(i):
+                queryset = filter_queryset(CustomerFilter, Customer.objects.all(), {'name': term})
+                return list(queryset.order_by('created_at', 'id')[:20])
+
+            def total(i):
+                return filter_queryset(CustomerFilter, Customer.objects.all(), {'name': term}).count()
+
+            for kind, fn in (('first page', page), ('count', total)):
+                with override_settings(CRM_SEARCH_BACKEND='like'):
+                    like = measure(fn, iterations)
+                trigram = measure(fn, iterations)
+                self.stdout.write(summarize(f"like    {label} {kind}", *like))
+                self.stdout.write(summarize(f"trigram {label} {kind}", *trigram))
@@ -1,9 +1,13 @@
+import time
+from datetime import timedelta, datetime
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
-from datetime import timedelta, datetime
-from crm.models import Customer, Order
-from django.db.models import Q, Max
-from django.db import connection
+
+from crm.archive import inactive_filter
+from crm.models import Customer
+
 
 class Command(BaseCommand):
     help = 'Cleans up inactive customers who have not placed an order in over a year'
@@ -15,6 +19,23 @@ class Command(BaseCommand):
             help='Reference date for testing (format: YYYY-MM-DD)',
             required=False
         )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the inactive customers, do not delete them',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Customers deleted per transaction (default: 500)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between batches so other writers can get in',
+        )
 
     def handle(self, *args, **options):
         # Use reference date if provided, otherwise use current time
@@ -28,48 +49,48 @@ class Command(BaseCommand):
         self.stdout.write(f"Reference time: {current_time}")
         self.stdout.write(f"One year ago: {one_year_ago}")
 
-        # Print all customers and their latest order dates for debugging
-        self.stdout.write("\nAll customers and their latest order dates:")
-        for customer in Customer.objects.all():
-            latest_order = customer.orders.order_by('-order_date').first()
-            if latest_order:
-                self.stdout.write(f"Customer: {customer.name}, Latest order: {latest_order.order_date} (Is before one year ago? {latest_order.order_date < one_year_ago})")
-            else:
-                self.stdout.write(f"Customer: {customer.name}, No orders")
-
-        # Find customers with their latest order date using raw SQL
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT c.id, c.name, MAX(o.order_date) as latest_order
-                FROM crm_customer c
-                LEFT JOIN crm_order o ON c.id = o.customer_id
-                GROUP BY c.id, c.name
-                HAVING MAX(o.order_date) < %s OR MAX(o.order_date) IS NULL
-            """, [one_year_ago])
-            inactive_customer_ids = [row[0] for row in cursor.fetchall()]
+        inactive = Customer.objects.filter(inactive_filter(one_year_ago))
+        count = inactive.count()
+        if options['dry_run']:
+            self.stdout.write(f"Would delete {count} inactive customers")
+            return
 
-        # Get the queryset of inactive customers
-        inactive_customers = Customer.objects.filter(id__in=inactive_customer_ids)
+        self.stdout.write(f"Deleting {count} inactive customers in batches of {options['batch_size']}")
+        deleted_count = self.delete_in_batches(inactive, count, options['batch_size'], options['pause'])
 
-        # Print inactive customers for debugging
-        self.stdout.write("\nInactive customers:")
-        for customer in inactive_customers:
-            latest_order = customer.orders.order_by('-order_date').first()
-            if latest_order:
-                self.stdout.write(f"Customer: {customer.name}, Latest order: {latest_order.order_date}")
-            else:
-                self.stdout.write(f"Customer: {customer.name}, No orders")
+        # Log the results
+        with open('/tmp/customer_cleanup_log.txt', 'a') as f:
+            f.write(f'{current_time.strftime("%c")}: Deleted {deleted_count} inactive customers\n')
 
-        # Count and delete inactive customers
-        count = inactive_customers.count()
-        self.stdout.write(f"\nDeleting {count} inactive customers")
-        
-        # Delete inactive customers
-        deleted_count = inactive_customers.delete()[0]
+    def delete_in_batches(self, inactive, total, batch_size, pause):
+        """
+        Delete inactive customers in id order, one short transaction per
+        batch. Each batch re-applies the inactivity filter, so a customer who
+        orders between the scan and the delete is kept.
+        """
+        started = time.perf_counter()
+        deleted = 0
+        last_id = 0
+        while True:
+            ids = list(
+                inactive.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            with transaction.atomic():
+                _, per_model = inactive.filter(id__in=ids).delete()
+            deleted += per_model.get(Customer._meta.label, 0)
 
-        # Get current timestamp
-        timestamp = current_time.strftime('%Y-%m-%d %H:%M:%S')
+            elapsed = time.perf_counter() - started
+            rate = deleted / elapsed if elapsed else 0
+            self.stdout.write(
+                f"Deleted {deleted}/{total} customers "
+                f"({per_model.get('crm.Order', 0)} orders in this batch), {rate:.0f} customers/s"
+            )
+            if pause:
+                time.sleep(pause)
 
-        # Log the results
-        with open('/tmp/customer_cleanup_log.txt', 'a') as f:
-            f.write(f'{current_time.strftime("%c")}: Deleted {deleted_count} inactive customers\n') 
\ No newline at end of file
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} inactive customers in {elapsed:.2f}s"))
+        return deleted
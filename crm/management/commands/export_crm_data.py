@@ -0,0 +1,42 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.export import EXPORTS, FORMATS, export_queryset, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Streams customers, products or orders as NDJSON or CSV, like the /export/ endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', dest='fmt', choices=sorted(FORMATS), default='ndjson')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+        parser.add_argument(
+            '--filter',
+            action='append',
+            default=[],
+            metavar='NAME=VALUE',
+            help='Filter argument of the GraphQL list field, e.g. customerName=Ada or orderBy=-orderDate',
+        )
+        parser.add_argument('--chunk-size', type=int, help='Rows per chunk (default: CRM_EXPORT_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        filters = {}
+        for item in options['filter']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f"Filters are NAME=VALUE, got {item!r}")
+            filters[name] = value
+        try:
+            queryset = export_queryset(options['kind'], filters)
+        except ValidationError as e:
+            raise CommandError('; '.join(e.messages))
+
+        chunks = stream_export(queryset, options['kind'], options['fmt'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode('utf-8'), ending='')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from crm.search import install
+
+
+class Command(BaseCommand):
+    help = 'Recreates the trigram search tables and triggers and rebuilds them from the source tables'
+
+    def handle(self, *args, **options):
+        if install():
+            self.stdout.write(self.style.SUCCESS("Rebuilt the customer and product search indexes"))
+        else:
+            self.stdout.write("The search index needs SQLite; filters use icontains on this database")
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from crm.statistics import FIELDS, compute_statistics, rebuild_customer_counters, rebuild_statistics
+from crm.models import CrmStatistics
+
+class Command(BaseCommand):
+    help = 'Rebuilds the materialized CRM statistics from scratch and reports any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report drift, do not rewrite the statistics row',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            row = CrmStatistics.objects.filter(pk=CrmStatistics.SINGLETON_ID).first()
+            previous = None if row is None else {column: getattr(row, column) for column in FIELDS.values()}
+            current = compute_statistics()
+        else:
+            previous, row = rebuild_statistics()
+            current = {column: getattr(row, column) for column in FIELDS.values()}
+
+        if previous is None:
+            self.stdout.write("No statistics row existed; materialized from scratch")
+            drift = {}
+        else:
+            drift = {
+                column: (previous[column], current[column])
+                for column in FIELDS.values()
+                if previous[column] != current[column]
+            }
+
+        for column, (stored, actual) in drift.items():
+            self.stdout.write(f"Drift in {column}: stored {stored}, actual {actual}")
+        if not drift:
+            self.stdout.write("No drift detected")
+
+        action = "Would rebuild" if options['dry_run'] else "Rebuilt"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} statistics: {current['customer_count']} customers, "
+            f"{current['order_count']} orders, ${current['total_revenue']:.2f} revenue"
+        ))
+        if not options['dry_run']:
+            count = rebuild_customer_counters()
+            self.stdout.write(f"Rebuilt order counters for {count} customers")
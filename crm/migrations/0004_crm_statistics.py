@@ -0,0 +1,40 @@
+# Generated by Django 5.0.2 on 2026-10-18 02:18
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_statistics(apps, schema_editor):
+    Customer = apps.get_model('crm', 'Customer')
+    Order = apps.get_model('crm', 'Order')
+    CrmStatistics = apps.get_model('crm', 'CrmStatistics')
+    CrmStatistics.objects.update_or_create(pk=1, defaults={
+        'customer_count': Customer.objects.count(),
+        'order_count': Order.objects.count(),
+        'total_revenue': Order.objects.aggregate(total=Sum('total_amount'))['total'] or Decimal('0'),
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrmStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_count', models.BigIntegerField(default=0)),
+                ('order_count', models.BigIntegerField(default=0)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'CRM statistics',
+            },
+        ),
+        migrations.RunPython(populate_statistics, migrations.RunPython.noop),
+    ]
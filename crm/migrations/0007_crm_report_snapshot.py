@@ -0,0 +1,36 @@
+# Generated by Django 5.0.2 on 2026-10-18 02:28
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0006_order_item_quantity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrmReportSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField(blank=True, null=True)),
+                ('period_end', models.DateTimeField(unique=True)),
+                ('new_customers', models.PositiveIntegerField(default=0)),
+                ('new_orders', models.PositiveIntegerField(default=0)),
+                ('new_revenue', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=16)),
+                ('total_customers', models.BigIntegerField(default=0)),
+                ('total_orders', models.BigIntegerField(default=0)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=16)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['period_end'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='crm_order_created_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.2 on 2026-10-18 02:30
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_rollups(apps, schema_editor):
+    Order = apps.get_model('crm', 'Order')
+    OrderDailyRollup = apps.get_model('crm', 'OrderDailyRollup')
+    days = (
+        Order.objects.order_by()
+        .annotate(day=TruncDate('order_date'))
+        .values('day')
+        .annotate(
+            order_count=Count('pk'),
+            revenue=Sum('total_amount'),
+            distinct_customers=Count('customer_id', distinct=True),
+        )
+    )
+    OrderDailyRollup.objects.bulk_create([
+        OrderDailyRollup(
+            date=day['day'],
+            order_count=day['order_count'],
+            revenue=day['revenue'] or Decimal('0'),
+            distinct_customers=day['distinct_customers'],
+        )
+        for day in days
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0007_crm_report_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=16)),
+                ('distinct_customers', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
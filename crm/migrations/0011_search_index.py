@@ -0,0 +1,63 @@
+from django.db import migrations
+
+# Frozen copy of the DDL crm.search installed when this migration was written;
+# later changes to crm.search must not change what this migration does.
+CUSTOMER_SEARCH = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS crm_customer_search USING fts5("
+    "name, email, content='crm_customer', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS crm_customer_search_insert AFTER INSERT ON crm_customer BEGIN "
+    "INSERT INTO crm_customer_search(rowid, name, email) VALUES (new.id, new.name, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS crm_customer_search_delete AFTER DELETE ON crm_customer BEGIN "
+    "INSERT INTO crm_customer_search(crm_customer_search, rowid, name, email) "
+    "VALUES ('delete', old.id, old.name, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS crm_customer_search_update AFTER UPDATE OF name, email ON crm_customer BEGIN "
+    "INSERT INTO crm_customer_search(crm_customer_search, rowid, name, email) "
+    "VALUES ('delete', old.id, old.name, old.email); "
+    "INSERT INTO crm_customer_search(rowid, name, email) VALUES (new.id, new.name, new.email); END",
+    "INSERT INTO crm_customer_search(crm_customer_search) VALUES ('rebuild')",
+]
+
+PRODUCT_SEARCH = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS crm_product_search USING fts5("
+    "name, content='crm_product', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS crm_product_search_insert AFTER INSERT ON crm_product BEGIN "
+    "INSERT INTO crm_product_search(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS crm_product_search_delete AFTER DELETE ON crm_product BEGIN "
+    "INSERT INTO crm_product_search(crm_product_search, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS crm_product_search_update AFTER UPDATE OF name ON crm_product BEGIN "
+    "INSERT INTO crm_product_search(crm_product_search, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO crm_product_search(rowid, name) VALUES (new.id, new.name); END",
+    "INSERT INTO crm_product_search(crm_product_search) VALUES ('rebuild')",
+]
+
+DROP_SEARCH = [
+    f"DROP TRIGGER IF EXISTS {table}_{suffix}"
+    for table in ('crm_customer_search', 'crm_product_search')
+    for suffix in ('insert', 'delete', 'update')
+] + [
+    "DROP TABLE IF EXISTS crm_customer_search",
+    "DROP TABLE IF EXISTS crm_product_search",
+]
+
+
+class SQLiteRunSQL(migrations.RunSQL):
+    """RunSQL that is a no-op on other vendors, which have no FTS5."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0010_filter_indexes'),
+    ]
+
+    operations = [
+        SQLiteRunSQL(CUSTOMER_SEARCH + PRODUCT_SEARCH, DROP_SEARCH),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-18 02:46
+
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import NullIf, Replace
+
+
+def populate_phone_normalized(apps, schema_editor):
+    # The phone validator only admits digits, '+' and '-'
+    Customer = apps.get_model('crm', 'Customer')
+    digits = Replace(Replace('phone', Value('+'), Value('')), Value('-'), Value(''))
+    Customer.objects.filter(phone__isnull=False).update(phone_normalized=NullIf(digits, Value('')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0011_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='phone_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=15, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['phone_normalized'], name='crm_customer_phone_norm_idx'),
+        ),
+        migrations.RunPython(populate_phone_normalized, migrations.RunPython.noop),
+    ]
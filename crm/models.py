@@ -1,4 +1,6 @@
-from django.db import models
+import re
+from asgiref.sync import sync_to_async
+from django.db import models, transaction
 from django.core.validators import RegexValidator
 from decimal import Decimal
 from django.utils import timezone
@@ -11,6 +13,65 @@ ORDER_STATUS_CHOICES = [
     ('cancelled', 'Cancelled'),
 ]
 
+class EntityCacheQuerySet(models.QuerySet):
+    """
+    bulk_create sends no post_save, so it drops the entity cache entries
+    (typically cached "missing" ids) of the rows it inserted itself.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .entity_cache import entity_cache
+        objs = super().bulk_create(objs, *args, **kwargs)
+        entity_cache.invalidate_many(self.model, [obj.pk for obj in objs])
+        return objs
+
+
+class StatisticsQuerySet(EntityCacheQuerySet):
+    """
+    Keeps CrmStatistics and the customer counters current for bulk writes:
+    bulk_create bypasses the model signals, and delete() folds every
+    per-row signal into one UPDATE per affected row.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .statistics import record_created, rebuild_statistics
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+                # Which rows were actually inserted is unknown; recount instead.
+                rebuild_statistics()
+            else:
+                record_created(objs)
+        return objs
+
+    def delete(self):
+        from .statistics import stats_batch
+        with transaction.atomic(using=self.db), stats_batch():
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+def normalize_phone(phone):
+    """
+    The digits of a phone number, so '+1234567890' and '123-456-7890' store
+    (and prefix-match) the same way. None when there are no digits.
+    """
+    digits = re.sub(r'\D', '', phone or '')
+    return digits or None
+
+
+class CustomerQuerySet(StatisticsQuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips save(), which fills phone_normalized
+        objs = list(objs)
+        for obj in objs:
+            obj.phone_normalized = normalize_phone(obj.phone)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Customer(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
@@ -25,11 +86,55 @@ class Customer(models.Model):
         blank=True,
         null=True
     )
+    # normalize_phone(phone), for index-backed phonePattern prefix filters
+    phone_normalized = models.CharField(max_length=15, blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Counter cache maintained by crm.statistics whenever orders change
+    order_count = models.PositiveIntegerField(default=0, editable=False)
+    last_order_date = models.DateTimeField(null=True, blank=True, editable=False)
+    lifetime_value = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal('0'), editable=False
+    )
+
+    COUNTER_FIELDS = ('order_count', 'last_order_date', 'lifetime_value')
+
+    objects = CustomerQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order for allCustomers
+            models.Index(fields=['created_at', 'id'], name='crm_customer_created_id_idx'),
+            # orderBy: "name" on allCustomers and "customerName" on allOrders
+            models.Index(fields=['name', 'id'], name='crm_customer_name_id_idx'),
+            models.Index(fields=['last_order_date', 'id'], name='crm_customer_last_order_idx'),
+            models.Index(fields=['order_count', 'id'], name='crm_customer_order_count_idx'),
+            models.Index(fields=['lifetime_value', 'id'], name='crm_customer_ltv_idx'),
+            models.Index(fields=['phone_normalized'], name='crm_customer_phone_norm_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.email})"
 
+    def save(self, *args, **kwargs):
+        self.phone_normalized = normalize_phone(self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'phone_normalized'}
+        # Never write back counters from a possibly stale instance; they are
+        # only changed through F() updates.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        from .statistics import stats_batch
+        with transaction.atomic(), stats_batch():
+            return super().delete(*args, **kwargs)
+
 class Product(models.Model):
     name = models.CharField(max_length=100)
     price = models.DecimalField(
@@ -45,6 +150,16 @@ class Product(models.Model):
     stock = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = EntityCacheQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order for allProducts
+            models.Index(fields=['price', 'id'], name='crm_product_price_id_idx'),
+            models.Index(fields=['stock', 'id'], name='crm_product_stock_id_idx'),
+            models.Index(fields=['name', 'id'], name='crm_product_name_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} (${self.price})"
 
@@ -54,16 +169,194 @@ class Product(models.Model):
 
 class Order(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='orders')
-    products = models.ManyToManyField(Product, related_name='orders')
+    products = models.ManyToManyField(Product, related_name='orders', through='OrderItem')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     order_date = models.DateTimeField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = StatisticsQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order for allOrders
+            models.Index(fields=['order_date', 'id'], name='crm_order_date_id_idx'),
+            models.Index(fields=['total_amount', 'id'], name='crm_order_total_id_idx'),
+            # A customer's orders by date, and their latest order_date for the counter cache
+            models.Index(fields=['customer', 'order_date'], name='crm_order_customer_date_idx'),
+            # Report watermarks select rows created since the last snapshot
+            models.Index(fields=['created_at'], name='crm_order_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} by {self.customer.name}"
 
     def calculate_total(self):
-        total = sum(product.price for product in self.products.all())
+        total = sum(
+            item.product.price * item.quantity
+            for item in self.items.select_related('product')
+        )
         self.total_amount = total
         self.save()
         return total
+
+class OrderItem(models.Model):
+    """One product line of an order; a product listed n times has quantity n."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        # Reuses the table Django created for the original auto-created through model
+        db_table = 'crm_order_products'
+        unique_together = [('order', 'product')]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} in order {self.order_id}"
+
+class ArchivedCustomer(models.Model):
+    """
+    A customer moved out of crm_customer by archive_crm_data. The id is the
+    original primary key, which SQLite AUTOINCREMENT never hands out again.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=100)
+    email = models.EmailField()
+    phone = models.CharField(max_length=15, blank=True, null=True)
+    created_at = models.DateTimeField()
+    order_count = models.PositiveIntegerField(default=0)
+    last_order_date = models.DateTimeField(null=True, blank=True)
+    lifetime_value = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.email}, archived)"
+
+    def as_customer(self):
+        """An unsaved Customer carrying this row's values, for read-only use."""
+        return Customer(
+            id=self.id, name=self.name, email=self.email, phone=self.phone,
+            created_at=self.created_at, order_count=self.order_count,
+            last_order_date=self.last_order_date, lifetime_value=self.lifetime_value,
+        )
+
+class ArchivedOrder(models.Model):
+    """
+    An order moved out of crm_order. customer_id may point at a live or an
+    archived customer, so it is a plain column; customer_name is copied so
+    the customerName filter and ordering work without a join.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    customer_id = models.BigIntegerField()
+    customer_name = models.CharField(max_length=100)
+    products = models.ManyToManyField(Product, related_name='archived_orders', through='ArchivedOrderItem')
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    order_date = models.DateTimeField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Same keyset order as crm_order, so merged pages seek on both tables
+            models.Index(fields=['order_date', 'id'], name='crm_archorder_date_id_idx'),
+            models.Index(fields=['customer_id', 'order_date'], name='crm_archorder_customer_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.id} by {self.customer_name}"
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = [('order', 'product')]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} in archived order {self.order_id}"
+
+class CrmStatistics(models.Model):
+    """
+    Single-row table of CRM totals, maintained incrementally by crm.signals
+    so totalCustomers/totalOrders/totalRevenue never scan the big tables.
+    """
+    SINGLETON_ID = 1
+
+    customer_count = models.BigIntegerField(default=0)
+    order_count = models.BigIntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'CRM statistics'
+
+    def __str__(self):
+        return f"{self.customer_count} customers, {self.order_count} orders, ${self.total_revenue}"
+
+    @classmethod
+    def current(cls):
+        """
+        Return the statistics row, materializing it on first use. Concurrent
+        first readers wait for a single rebuild instead of each aggregating.
+        """
+        try:
+            return cls.objects.get(pk=cls.SINGLETON_ID)
+        except cls.DoesNotExist:
+            from .singleflight import guarded
+            from .statistics import rebuild_statistics
+            return guarded(
+                'crm-statistics-rebuild',
+                lambda: rebuild_statistics()[1],
+                peek=lambda: cls.objects.filter(pk=cls.SINGLETON_ID).first(),
+            )
+
+    @classmethod
+    async def acurrent(cls):
+        """current() for async code."""
+        try:
+            return await cls.objects.aget(pk=cls.SINGLETON_ID)
+        except cls.DoesNotExist:
+            return await sync_to_async(cls.current)()
+
+class CrmReportSnapshot(models.Model):
+    """
+    Activity between two report watermarks. The new_* columns count rows
+    created in (period_start, period_end]; the total_* columns are the
+    customers, orders and revenue (archived ones included) as of period_end,
+    taken from CrmStatistics when the snapshot was generated.
+    """
+    period_start = models.DateTimeField(null=True, blank=True)
+    period_end = models.DateTimeField(unique=True)
+    new_customers = models.PositiveIntegerField(default=0)
+    new_orders = models.PositiveIntegerField(default=0)
+    new_revenue = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0'))
+    total_customers = models.BigIntegerField(default=0)
+    total_orders = models.BigIntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0'))
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['period_end']
+
+    def __str__(self):
+        return (
+            f"{self.period_end:%Y-%m-%d %H:%M}: +{self.new_customers} customers, "
+            f"+{self.new_orders} orders, +${self.new_revenue}"
+        )
+
+class OrderDailyRollup(models.Model):
+    """
+    Orders and revenue per calendar day (in TIME_ZONE), maintained by
+    crm.statistics as orders are written and rebuilt by
+    backfill_order_rollups.
+    """
+    date = models.DateField(unique=True)
+    order_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0'))
+    distinct_customers = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date}: {self.order_count} orders, ${self.revenue}"
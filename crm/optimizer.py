@@ -0,0 +1,131 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+from graphql import FieldNode, FragmentSpreadNode, InlineFragmentNode
+from graphql.execution.values import get_directive_values
+from graphql.type import GraphQLIncludeDirective, GraphQLSkipDirective
+
+from .incremental import GraphQLDeferDirective, GraphQLStreamDirective, active_directive
+
+
+def _included(node, variables):
+    skip = get_directive_values(GraphQLSkipDirective, node, variables)
+    if skip and skip.get('if'):
+        return False
+    include = get_directive_values(GraphQLIncludeDirective, node, variables)
+    return not (include and not include.get('if'))
+
+
+def _merge_fields(selection_sets, info, lazy=None):
+    """
+    Flatten selection sets into {field name: [sub selection sets]}, following
+    fragment spreads and inline fragments and honouring @skip/@include.
+    Fields selected only under @defer or with @stream are added to lazy, if
+    given: they are delivered after the initial result.
+    """
+    fields = {}
+    eager = set()
+    pending = [(s, False) for s in selection_sets if s is not None]
+    while pending:
+        selection_set, deferred = pending.pop()
+        for node in selection_set.selections:
+            if not _included(node, info.variable_values):
+                continue
+            if isinstance(node, FieldNode):
+                fields.setdefault(node.name.value, []).append(node.selection_set)
+                if not deferred and not active_directive(GraphQLStreamDirective, node, info.variable_values):
+                    eager.add(node.name.value)
+                continue
+            deferred_node = deferred or active_directive(GraphQLDeferDirective, node, info.variable_values) is not None
+            if isinstance(node, InlineFragmentNode):
+                pending.append((node.selection_set, deferred_node))
+            elif isinstance(node, FragmentSpreadNode):
+                fragment = info.fragments.get(node.name.value)
+                if fragment is not None:
+                    pending.append((fragment.selection_set, deferred_node))
+    if lazy is not None:
+        lazy.update(fields.keys() - eager)
+    return fields
+
+
+def _descend(selection_sets, info, path):
+    """
+    Follow a chain of wrapper fields, e.g. ('edges', 'node') on a connection.
+    Returns (selection sets, whether a wrapper on the way is deferred or streamed).
+    """
+    lazy = False
+    for name in path:
+        names = set()
+        selection_sets = _merge_fields(selection_sets, info, names).get(name, [])
+        lazy = lazy or name in names
+    return selection_sets, lazy
+
+
+def _plan(model, selection_sets, info, prefix='', prefetch=True):
+    """
+    Work out the only()/select_related()/prefetch_related() arguments needed
+    to serve a selection on model. Returns (only, select_related, prefetches);
+    only is None when a selected field is not a model field and every column
+    must be loaded. Many-valued relations are not prefetched when prefetch
+    is false or they are deferred or streamed; the loaders fetch them when
+    that part of the response is produced.
+    """
+    only = {model._meta.pk.attname}
+    select_related = []
+    prefetches = []
+    lazy = set()
+
+    for name, sub_selections in _merge_fields(selection_sets, info, lazy).items():
+        if name == '__typename':
+            continue
+        try:
+            field = model._meta.get_field(to_snake_case(name))
+        except FieldDoesNotExist:
+            only = None
+            continue
+
+        if not field.is_relation:
+            if only is not None:
+                only.add(field.attname)
+        elif field.many_to_one or field.one_to_one:
+            related_only, related_select, related_prefetch = _plan(
+                field.related_model, sub_selections, info, prefix=f'{prefix}{field.name}__', prefetch=prefetch,
+            )
+            select_related.append(f'{prefix}{field.name}')
+            select_related.extend(related_select)
+            prefetches.extend(related_prefetch)
+            if only is not None:
+                only.add(field.name)
+                if related_only is not None:
+                    only.update(f'{field.name}__{attname}' for attname in related_only)
+        elif prefetch and name not in lazy:
+            prefetches.append(Prefetch(
+                f'{prefix}{field.name}',
+                queryset=_apply(field.related_model._default_manager.all(), sub_selections, info, field),
+            ))
+
+    return only, select_related, prefetches
+
+
+def _apply(queryset, selection_sets, info, relation=None, prefetch=True):
+    only, select_related, prefetches = _plan(queryset.model, selection_sets, info, prefetch=prefetch)
+    if only is not None:
+        if relation is not None and relation.one_to_many:
+            # Reverse ForeignKey prefetches match rows back on the FK column.
+            only.add(relation.field.attname)
+        queryset = queryset.only(*only)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
+
+
+def optimize_queryset(queryset, info, path=()):
+    """
+    Apply select_related, Prefetch and only() to queryset so that it loads
+    exactly the columns and relations selected by the field being resolved.
+    path names wrapper fields between the resolved field and the model type.
+    """
+    selection_sets, lazy = _descend([node.selection_set for node in info.field_nodes], info, path)
+    return _apply(queryset, selection_sets, info, prefetch=not lazy)
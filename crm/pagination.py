@@ -0,0 +1,268 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import cmp_to_key
+
+import graphene
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from graphene_django.settings import graphene_settings
+
+
+def _parse_ordering(ordering, default):
+    """
+    Turn queryset ordering (e.g. ['-order_date']) into [(lookup, descending)],
+    falling back to default and always ending with the primary key.
+    """
+    fields = []
+    for item in ordering or default:
+        if not isinstance(item, str):
+            continue
+        descending = item.startswith('-')
+        lookup = item.lstrip('-')
+        if lookup in ('pk', 'id'):
+            continue
+        fields.append((lookup, descending))
+    pk_descending = fields[-1][1] if fields else False
+    fields.append(('pk', pk_descending))
+    return fields
+
+
+def _model_field(model, lookup):
+    if lookup == 'pk':
+        return model._meta.pk
+    parts = lookup.split('__')
+    for part in parts[:-1]:
+        model = model._meta.get_field(part).related_model
+    return model._meta.get_field(parts[-1])
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    """Encode the keyset values of a row as an opaque cursor."""
+    payload = json.dumps([_json_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor, model, fields):
+    """Decode a cursor back into typed keyset values for fields."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError
+        return [
+            _model_field(model, lookup).to_python(value)
+            for (lookup, _), value in zip(fields, values)
+        ]
+    except (ValueError, TypeError, ValidationError):
+        raise ValidationError(f"Invalid cursor: {cursor}")
+
+
+def _compare(lookup, value, greater, nullable):
+    """lookup > value (or <), with NULL sorting before every other value."""
+    if not nullable:
+        return Q(**{f'{lookup}__{"gt" if greater else "lt"}': value})
+    if value is None:
+        return Q(**{f'{lookup}__isnull': False}) if greater else None
+    if greater:
+        return Q(**{f'{lookup}__gt': value})
+    return Q(**{f'{lookup}__lt': value}) | Q(**{f'{lookup}__isnull': True})
+
+
+def _equal(lookup, value):
+    if value is None:
+        return Q(**{f'{lookup}__isnull': True})
+    return Q(**{lookup: value})
+
+
+def _seek(fields, values, forward, nullable=()):
+    """
+    Build the row-value comparison (f1, f2, ...) > (v1, v2, ...) as nested
+    OR/AND terms, flipping each comparison for descending fields. Fields in
+    nullable treat NULL as the smallest value.
+    """
+    condition = Q()
+    for i, (lookup, descending) in enumerate(fields):
+        term = _compare(lookup, values[i], forward != descending, lookup in nullable)
+        if term is None:
+            continue
+        for j in range(i):
+            term &= _equal(fields[j][0], values[j])
+        condition |= term
+    return condition
+
+
+def _order(lookup, descending, nullable):
+    expression = F(lookup)
+    if lookup not in nullable:
+        return expression.desc() if descending else expression.asc()
+    # Match _seek: NULL sorts first ascending and last descending.
+    return expression.desc(nulls_last=True) if descending else expression.asc(nulls_first=True)
+
+
+def _check_limit(name, value, field_name, max_limit):
+    if value is None:
+        return
+    if value < 0:
+        raise ValidationError(f"Argument `{name}` on the `{field_name}` connection must be non-negative.")
+    if max_limit and value > max_limit:
+        raise ValidationError(
+            f"Requesting {value} records on the `{field_name}` connection "
+            f"exceeds the `{name}` limit of {max_limit} records."
+        )
+
+
+def _prepare(queryset, default_ordering, after, before):
+    """Apply the cursors and annotate the keyset values as _cursor_0.._cursor_n."""
+    model = queryset.model
+    fields = _parse_ordering(queryset.query.order_by, default_ordering)
+    nullable = {lookup for lookup, _ in fields if _model_field(model, lookup).null}
+    if after:
+        values = decode_cursor(after, model, fields)
+        queryset = queryset.filter(_seek(fields, values, forward=True, nullable=nullable))
+    if before:
+        values = decode_cursor(before, model, fields)
+        queryset = queryset.filter(_seek(fields, values, forward=False, nullable=nullable))
+    keys = {f'_cursor_{i}': F(lookup) for i, (lookup, _) in enumerate(fields)}
+    return queryset.annotate(**keys), fields, nullable
+
+
+def _page(queryset, fields, nullable, first, last):
+    """Up to first + 1 rows in forward order, or last + 1 rows in backward order."""
+    if first is not None:
+        order = [_order(lookup, descending, nullable) for lookup, descending in fields]
+        return queryset.order_by(*order)[:first + 1]
+    order = [_order(lookup, not descending, nullable) for lookup, descending in fields]
+    return queryset.order_by(*order)[:last + 1]
+
+
+def _fetch(queryset, fields, nullable, first, last):
+    return list(_page(queryset, fields, nullable, first, last))
+
+
+def _window(rows, first, last, after, before):
+    """Cut fetched rows down to the page; returns (rows, has_previous_page, has_next_page)."""
+    has_next_page = bool(before)
+    has_previous_page = bool(after)
+    if first is not None:
+        has_next_page = len(rows) > first
+        rows = rows[:first]
+        if last is not None and len(rows) > last:
+            rows = rows[len(rows) - last:]
+            has_previous_page = True
+    else:
+        has_previous_page = len(rows) > last
+        rows = rows[:last][::-1]
+    return rows, has_previous_page, has_next_page
+
+
+def _cursor_values(row, fields):
+    return [getattr(row, f'_cursor_{i}') for i in range(len(fields))]
+
+
+def _row_order(fields):
+    """Sort key matching _order: per-field direction, NULL smallest."""
+    def compare(a, b):
+        for i, (_, descending) in enumerate(fields):
+            x, y = getattr(a, f'_cursor_{i}'), getattr(b, f'_cursor_{i}')
+            if x == y:
+                continue
+            if x is None or (y is not None and x < y):
+                result = -1
+            else:
+                result = 1
+            return -result if descending else result
+        return 0
+    return cmp_to_key(compare)
+
+
+def _limits(info, first, last):
+    max_limit = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+    _check_limit('first', first, info.field_name, max_limit)
+    _check_limit('last', last, info.field_name, max_limit)
+    if first is None and last is None:
+        first = max_limit
+    return first, last
+
+
+def _connection(connection_type, rows, fields, has_previous_page, has_next_page):
+    edges = [
+        connection_type.Edge(node=row, cursor=encode_cursor(_cursor_values(row, fields)))
+        for row in rows
+    ]
+    page_info = graphene.relay.PageInfo(
+        start_cursor=edges[0].cursor if edges else None,
+        end_cursor=edges[-1].cursor if edges else None,
+        has_previous_page=has_previous_page,
+        has_next_page=has_next_page,
+    )
+    return connection_type(edges=edges, page_info=page_info)
+
+
+def keyset_connection(connection_type, queryset, info, default_ordering,
+                      first=None, last=None, after=None, before=None):
+    """
+    Resolve a Relay connection by seeking on (ordering fields..., pk) instead
+    of OFFSET, so every page costs the same regardless of its depth.
+
+    The ordering comes from the queryset (e.g. an OrderingFilter) or
+    default_ordering. Cursors carry the row's keyset values.
+    """
+    first, last = _limits(info, first, last)
+    queryset, fields, nullable = _prepare(queryset, default_ordering, after, before)
+    rows = _fetch(queryset, fields, nullable, first, last)
+    rows, has_previous_page, has_next_page = _window(rows, first, last, after, before)
+    return _connection(connection_type, rows, fields, has_previous_page, has_next_page)
+
+
+async def akeyset_connection(connection_type, queryset, info, default_ordering,
+                             first=None, last=None, after=None, before=None):
+    """keyset_connection that fetches the page with async iteration."""
+    first, last = _limits(info, first, last)
+    queryset, fields, nullable = _prepare(queryset, default_ordering, after, before)
+    rows = [row async for row in _page(queryset, fields, nullable, first, last)]
+    rows, has_previous_page, has_next_page = _window(rows, first, last, after, before)
+    return _connection(connection_type, rows, fields, has_previous_page, has_next_page)
+
+
+def merged_keyset_connection(connection_type, sources, info, default_ordering,
+                             first=None, last=None, after=None, before=None):
+    """
+    keyset_connection over several tables with the same keyset shape, e.g.
+    live and archived orders. sources is a list of (queryset, convert): each
+    queryset is seeked and fetched on its own index, the rows are merged in
+    keyset order, and convert (or None) maps the chosen rows of that source
+    to the node type. Primary keys must not collide across the sources.
+    """
+    first, last = _limits(info, first, last)
+    fetched = []
+    fields = None
+    for queryset, convert in sources:
+        queryset, fields, nullable = _prepare(queryset, default_ordering, after, before)
+        rows = _fetch(queryset, fields, nullable, first, last)
+        fetched.extend((row, convert) for row in rows)
+    key = _row_order(fields)
+    fetched.sort(key=lambda pair: key(pair[0]), reverse=first is None)
+
+    rows, has_previous_page, has_next_page = _window(
+        [row for row, _ in fetched], first, last, after, before
+    )
+    connection = _connection(connection_type, rows, fields, has_previous_page, has_next_page)
+    converters = {id(row): convert for row, convert in fetched if convert}
+    by_convert = {}
+    for edge in connection.edges:
+        convert = converters.get(id(edge.node))
+        if convert:
+            by_convert.setdefault(convert, []).append(edge)
+    for convert, edges in by_convert.items():
+        for edge, node in zip(edges, convert([edge.node for edge in edges])):
+            edge.node = node
+    return connection
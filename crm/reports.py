@@ -0,0 +1,74 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import CrmReportSnapshot, CrmStatistics, Customer, Order
+
+
+def watermark_lag():
+    """
+    How far behind now the next watermark is placed, so rows from
+    transactions still in flight are not skipped.
+    """
+    return timedelta(seconds=getattr(settings, 'CRM_REPORT_WATERMARK_LAG', 60))
+
+
+def _created_since(queryset, start):
+    return queryset if start is None else queryset.filter(created_at__gt=start)
+
+
+def generate_snapshot(until=None):
+    """
+    Store a CrmReportSnapshot for the rows created since the last watermark
+    and return it. Only the rows created after the previous watermark are
+    read, through the created_at indexes.
+
+    The totals are the CrmStatistics counters less the rows created after
+    the new watermark, so deleted rows drop out of them instead of being
+    carried forward from the previous snapshot.
+
+    Returns the latest existing snapshot unchanged when the new watermark
+    would not move forward.
+    """
+    end = until or timezone.now() - watermark_lag()
+    before, after = Q(created_at__lte=end), Q(created_at__gt=end)
+    with transaction.atomic():
+        previous = CrmReportSnapshot.objects.select_for_update().order_by('-period_end').first()
+        start = previous.period_end if previous else None
+        if start is not None and end <= start:
+            return previous
+
+        customers = _created_since(Customer.objects.order_by(), start).aggregate(
+            new=Count('pk', filter=before), later=Count('pk', filter=after),
+        )
+        orders = _created_since(Order.objects.order_by(), start).aggregate(
+            new=Count('pk', filter=before), later=Count('pk', filter=after),
+            revenue=Sum('total_amount', filter=before), later_revenue=Sum('total_amount', filter=after),
+        )
+        new_revenue = (orders['revenue'] or Decimal('0')).quantize(Decimal('0.01'))
+        stats = CrmStatistics.current()
+
+        return CrmReportSnapshot.objects.create(
+            period_start=start,
+            period_end=end,
+            new_customers=customers['new'],
+            new_orders=orders['new'],
+            new_revenue=new_revenue,
+            total_customers=stats.customer_count - customers['later'],
+            total_orders=stats.order_count - orders['later'],
+            total_revenue=stats.total_revenue - (orders['later_revenue'] or Decimal('0')),
+        )
+
+
+def snapshots_between(start=None, end=None):
+    """Stored snapshots whose watermark falls in [start, end], oldest first."""
+    queryset = CrmReportSnapshot.objects.order_by('period_end')
+    if start is not None:
+        queryset = queryset.filter(period_end__gte=start)
+    if end is not None:
+        queryset = queryset.filter(period_end__lte=end)
+    return queryset
@@ -0,0 +1,155 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import ArchivedOrder, Order, OrderDailyRollup
+
+# Archived orders stay in the rollups: archiving moves rows without changing them
+ORDER_MODELS = (Order, ArchivedOrder)
+
+
+def order_day(order_date):
+    """The rollup date of an order_date, in the current time zone."""
+    return timezone.localtime(order_date).date()
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def _day_orders(day, model=Order):
+    start, end = day_bounds(day)
+    return model.objects.filter(order_date__gte=start, order_date__lt=end).order_by()
+
+
+def _day_customers(day):
+    """How many customers ordered on day, counting live and archived orders."""
+    live, archived = (_day_orders(day, model).values('customer_id') for model in ORDER_MODELS)
+    return live.union(archived).count()
+
+
+def compute_day(day):
+    """Aggregate one day straight from the live and archived orders tables."""
+    totals = {'order_count': 0, 'revenue': Decimal('0')}
+    for model in ORDER_MODELS:
+        day_totals = _day_orders(day, model).aggregate(order_count=Count('pk'), revenue=Sum('total_amount'))
+        totals['order_count'] += day_totals['order_count']
+        totals['revenue'] += day_totals['revenue'] or Decimal('0')
+    totals['revenue'] = totals['revenue'].quantize(Decimal('0.01'))
+    totals['distinct_customers'] = _day_customers(day)
+    return totals
+
+
+def rebuild_day(day):
+    values = compute_day(day)
+    OrderDailyRollup.objects.update_or_create(date=day, defaults=values)
+
+
+def apply_day_delta(day, orders, revenue):
+    """
+    Add orders/revenue to one day's row with F() and refresh its distinct
+    customer count (which cannot be maintained by addition) from that day's
+    orders. Days without a row yet are built from the orders table.
+    """
+    distinct = _day_customers(day)
+    updated = OrderDailyRollup.objects.filter(date=day).update(
+        order_count=F('order_count') + orders,
+        revenue=F('revenue') + revenue,
+        distinct_customers=distinct,
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                rebuild_day(day)
+        except IntegrityError:
+            # Another writer created the row first; it already counts our orders.
+            pass
+
+
+def backfill(start=None, end=None):
+    """
+    Recompute OrderDailyRollup rows from the live and archived orders
+    tables for days in [start, end] (both optional dates) with one GROUP BY
+    query per table, plus one for the distinct customers of each day.
+    Returns the number of days written.
+    """
+    rollups = OrderDailyRollup.objects.all()
+    if start is not None:
+        rollups = rollups.filter(date__gte=start)
+    if end is not None:
+        rollups = rollups.filter(date__lte=end)
+
+    def daily(model):
+        orders = model.objects.order_by()
+        if start is not None:
+            orders = orders.filter(order_date__gte=day_bounds(start)[0])
+        if end is not None:
+            orders = orders.filter(order_date__lt=day_bounds(end)[1])
+        return orders.annotate(day=TruncDate('order_date'))
+
+    totals = {}
+    for model in ORDER_MODELS:
+        for day in daily(model).values('day').annotate(order_count=Count('pk'), revenue=Sum('total_amount')):
+            counts = totals.setdefault(day['day'], [0, Decimal('0')])
+            counts[0] += day['order_count']
+            counts[1] += day['revenue'] or Decimal('0')
+    live, archived = (daily(model).values_list('day', 'customer_id') for model in ORDER_MODELS)
+    customers = Counter(day for day, _ in live.union(archived).iterator())
+    rows = [
+        OrderDailyRollup(
+            date=day,
+            order_count=order_count,
+            revenue=revenue.quantize(Decimal('0.01')),
+            distinct_customers=customers[day],
+        )
+        for day, (order_count, revenue) in sorted(totals.items())
+    ]
+    with transaction.atomic():
+        rollups.delete()
+        OrderDailyRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+GRANULARITIES = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def time_series(granularity='day', start=None, end=None):
+    """
+    Buckets of {'period_start', 'order_count', 'revenue', 'distinct_customers'}
+    for days in [start, end], summed from OrderDailyRollup in the database.
+    distinct_customers is only exact per day, so it is None for week/month.
+    """
+    rollups = OrderDailyRollup.objects.order_by()
+    if start is not None:
+        rollups = rollups.filter(date__gte=start)
+    if end is not None:
+        rollups = rollups.filter(date__lte=end)
+
+    trunc = GRANULARITIES[granularity]
+    if trunc is None:
+        return [
+            {
+                'period_start': row.date,
+                'order_count': row.order_count,
+                'revenue': row.revenue,
+                'distinct_customers': row.distinct_customers,
+            }
+            for row in rollups.order_by('date')
+        ]
+    buckets = (
+        rollups.annotate(period_start=trunc('date'))
+        .values('period_start')
+        .annotate(order_count=Sum('order_count'), revenue=Sum('revenue'))
+        .order_by('period_start')
+    )
+    return [dict(bucket, distinct_customers=None) for bucket in buckets]
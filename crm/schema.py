@@ -1,42 +1,100 @@
 import graphene
+from asgiref.sync import sync_to_async
 from graphene_django import DjangoObjectType
 from graphene_django.filter import DjangoFilterConnectionField
-from django.db import transaction
+from graphene_django.settings import graphene_settings
 from django.core.exceptions import ValidationError
-from .models import Customer, Product, Order
-from .filters import CustomerFilter, ProductFilter, OrderFilter
-import re
+from .models import Customer, Product, Order, ArchivedOrder, CrmStatistics, CrmReportSnapshot
+from .archive import as_orders, get_order
+from .entity_cache import entity_cache
+from .bulk import (
+    bulk_create_customers, bulk_create_orders, bulk_create_products, create_order, valid_phone,
+)
+from .filters import CustomerFilter, ProductFilter, OrderFilter, ArchivedOrderFilter, filter_queryset
+from .incremental import DIRECTIVES
+from .loaders import get_loaders
+from .optimizer import optimize_queryset
+from .pagination import akeyset_connection, keyset_connection, merged_keyset_connection
+from .reports import snapshots_between
+from .search import search
+from .rollups import time_series
 from decimal import Decimal
-import django_filters
-from django.db.models import Sum
 
 class CustomerType(DjangoObjectType):
     class Meta:
         model = Customer
-        fields = ('id', 'name', 'email', 'phone', 'created_at', 'orders')
+        fields = ('id', 'name', 'email', 'phone', 'created_at', 'orders',
+                  'order_count', 'last_order_date', 'lifetime_value')
         interfaces = (graphene.relay.Node,)
 
+    orders = graphene.List(graphene.NonNull(lambda: OrderType), required=True)
+
+    def resolve_orders(self, info):
+        return get_loaders(info).customer_orders.load(info, self)
+
 class ProductType(DjangoObjectType):
     class Meta:
         model = Product
         fields = ('id', 'name', 'price', 'stock', 'created_at', 'orders')
         interfaces = (graphene.relay.Node,)
 
-    def resolve_price(self, info):
-        return str(self.price)
-
 class OrderType(DjangoObjectType):
     class Meta:
         model = Order
         fields = ('id', 'customer', 'products', 'total_amount', 'order_date', 'created_at')
 
     products = graphene.List(ProductType)
+    archived = graphene.Boolean(description="True for orders served from the archive tables")
+
+    def resolve_customer(self, info):
+        return get_loaders(info).order_customer.load(info, self)
 
     def resolve_products(self, info):
-        return self.products.all()
+        return get_loaders(info).order_products.load(info, self)
+
+    def resolve_archived(self, info):
+        return getattr(self, 'archived', False)
+
+class CrmReportType(DjangoObjectType):
+    class Meta:
+        model = CrmReportSnapshot
+        fields = ('period_start', 'period_end', 'new_customers', 'new_orders', 'new_revenue',
+                  'total_customers', 'total_orders', 'total_revenue')
+
+    new_revenue = graphene.Float()
+    total_customers = graphene.Int()
+    total_orders = graphene.Int()
+    total_revenue = graphene.Float()
 
-    def resolve_total_amount(self, info):
-        return str(self.total_amount)
+class TimeSeriesGranularity(graphene.Enum):
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+
+class TimeSeriesBucket(graphene.ObjectType):
+    period_start = graphene.Date()
+    order_count = graphene.Int()
+    revenue = graphene.Float()
+    distinct_customers = graphene.Int(description="Exact for DAY buckets only; null for WEEK and MONTH")
+
+class EntityCacheStats(graphene.ObjectType):
+    model = graphene.String()
+    local_hits = graphene.Int()
+    shared_hits = graphene.Int()
+    misses = graphene.Int()
+    negative_hits = graphene.Int()
+    bypasses = graphene.Int()
+    invalidations = graphene.Int()
+
+class SearchType(graphene.Enum):
+    CUSTOMER = 'customer'
+    PRODUCT = 'product'
+
+SEARCH_MODELS = {'customer': Customer, 'product': Product}
+
+class SearchResult(graphene.Union):
+    class Meta:
+        types = (CustomerType, ProductType)
 
 class CustomerInput(graphene.InputObjectType):
     name = graphene.String(required=True)
@@ -62,10 +120,7 @@ class CreateCustomer(graphene.Mutation):
 
     @staticmethod
     def validate_phone(phone):
-        if not phone:
-            return True
-        pattern = r'^\+?1?\d{9,15}$|^\d{3}-\d{3}-\d{4}$'
-        return bool(re.match(pattern, phone))
+        return valid_phone(phone)
 
     def mutate(root, info, input):
         if not CreateCustomer.validate_phone(input.phone):
@@ -90,34 +145,25 @@ class CreateCustomer(graphene.Mutation):
         except Exception as e:
             raise ValidationError(f"Error creating customer: {str(e)}")
 
+class BulkItemError(graphene.ObjectType):
+    index = graphene.Int()
+    message = graphene.String()
+
 class BulkCreateCustomers(graphene.Mutation):
     class Arguments:
         input = graphene.List(CustomerInput, required=True)
 
     customers = graphene.List(CustomerType)
     errors = graphene.List(graphene.String)
+    row_errors = graphene.List(BulkItemError)
 
     def mutate(root, info, input):
-        customers = []
-        errors = []
-
-        with transaction.atomic():
-            for customer_data in input:
-                try:
-                    if not CreateCustomer.validate_phone(customer_data.phone):
-                        errors.append(f"Invalid phone number for {customer_data.name}")
-                        continue
-
-                    customer = Customer.objects.create(
-                        name=customer_data.name,
-                        email=customer_data.email,
-                        phone=customer_data.phone
-                    )
-                    customers.append(customer)
-                except Exception as e:
-                    errors.append(f"Error creating customer {customer_data.name}: {str(e)}")
-
-        return BulkCreateCustomers(customers=customers, errors=errors)
+        customers, errors = bulk_create_customers(input)
+        return BulkCreateCustomers(
+            customers=customers,
+            errors=[message for _, message in errors],
+            row_errors=[BulkItemError(index=index, message=message) for index, message in errors],
+        )
 
 class CreateProduct(graphene.Mutation):
     class Arguments:
@@ -141,6 +187,22 @@ class CreateProduct(graphene.Mutation):
         except ValidationError as e:
             raise ValidationError(str(e))
 
+class BulkCreateProducts(graphene.Mutation):
+    class Arguments:
+        input = graphene.List(ProductInput, required=True)
+
+    products = graphene.List(ProductType)
+    errors = graphene.List(graphene.String)
+    row_errors = graphene.List(BulkItemError)
+
+    def mutate(root, info, input):
+        products, errors = bulk_create_products(input)
+        return BulkCreateProducts(
+            products=products,
+            errors=[message for _, message in errors],
+            row_errors=[BulkItemError(index=index, message=message) for index, message in errors],
+        )
+
 class CreateOrder(graphene.Mutation):
     class Arguments:
         input = OrderInput(required=True)
@@ -150,35 +212,7 @@ class CreateOrder(graphene.Mutation):
 
     def mutate(root, info, input):
         try:
-            # Validate customer exists
-            try:
-                customer = Customer.objects.get(pk=input.customer_id)
-            except Customer.DoesNotExist:
-                raise ValidationError("Customer not found")
-
-            # Validate products exist and are valid
-            if not input.product_ids:
-                raise ValidationError("At least one product is required")
-
-            products = Product.objects.filter(id__in=input.product_ids)
-            if len(products) != len(input.product_ids):
-                missing_products = set(input.product_ids) - set(str(p.id) for p in products)
-                raise ValidationError(f"Products not found: {', '.join(missing_products)}")
-
-            # Create order with atomic transaction
-            with transaction.atomic():
-                order = Order.objects.create(
-                    customer=customer,
-                    total_amount=Decimal('0'),
-                    order_date=input.order_date if input.order_date else None
-                )
-                order.products.set(products)
-                
-                # Calculate total amount as sum of product prices
-                total = sum(product.price for product in products)
-                order.total_amount = total
-                order.save()
-
+            order = create_order(input.customer_id, input.product_ids, input.order_date)
             return CreateOrder(
                 order=order,
                 message="Order created successfully"
@@ -188,127 +222,230 @@ class CreateOrder(graphene.Mutation):
         except Exception as e:
             raise ValidationError(f"Error creating order: {str(e)}")
 
+class BulkCreateOrders(graphene.Mutation):
+    class Arguments:
+        input = graphene.List(OrderInput, required=True)
+
+    orders = graphene.List(OrderType)
+    errors = graphene.List(graphene.String)
+    row_errors = graphene.List(BulkItemError)
+
+    def mutate(root, info, input):
+        orders, errors = bulk_create_orders(input)
+        return BulkCreateOrders(
+            orders=get_loaders(info).register(info, orders, path=('orders',)),
+            errors=[message for _, message in errors],
+            row_errors=[BulkItemError(index=index, message=message) for index, message in errors],
+        )
+
+class CustomerConnection(graphene.relay.Connection):
+    class Meta:
+        node = CustomerType
+
+class ProductConnection(graphene.relay.Connection):
+    class Meta:
+        node = ProductType
+
+class OrderConnection(graphene.relay.Connection):
+    class Meta:
+        node = OrderType
+
+def paginate(connection_type, filterset_class, queryset, info, default_ordering, args):
+    """Filter, optimize and keyset-paginate a root list field."""
+    page_args = {key: args.pop(key, None) for key in ('first', 'last', 'before', 'after')}
+    queryset = filter_queryset(filterset_class, queryset, args, request=info.context)
+    queryset = optimize_queryset(queryset, info, path=('edges', 'node'))
+    connection = keyset_connection(connection_type, queryset, info, default_ordering, **page_args)
+    get_loaders(info).register(info, [edge.node for edge in connection.edges], path=('edges', 'node'))
+    return connection
+
+async def apaginate(connection_type, filterset_class, queryset, info, default_ordering, args):
+    """paginate() for the async schema: the page is fetched with async iteration."""
+    page_args = {key: args.pop(key, None) for key in ('first', 'last', 'before', 'after')}
+    queryset = filter_queryset(filterset_class, queryset, args, request=info.context)
+    queryset = optimize_queryset(queryset, info, path=('edges', 'node'))
+    connection = await akeyset_connection(connection_type, queryset, info, default_ordering, **page_args)
+    get_loaders(info).register(info, [edge.node for edge in connection.edges], path=('edges', 'node'))
+    return connection
+
+def paginate_with_archive(info, args):
+    """allOrders over the live and archived order tables, merged in keyset order."""
+    page_args = {key: args.pop(key, None) for key in ('first', 'last', 'before', 'after')}
+    live = filter_queryset(OrderFilter, Order.objects.all(), args, request=info.context)
+    live = optimize_queryset(live, info, path=('edges', 'node'))
+    archived = filter_queryset(ArchivedOrderFilter, ArchivedOrder.objects.all(), args, request=info.context)
+    connection = merged_keyset_connection(
+        OrderConnection, [(live, None), (archived, as_orders)], info, ('order_date',), **page_args
+    )
+    get_loaders(info).register(info, [edge.node for edge in connection.edges], path=('edges', 'node'))
+    return connection
+
 class Query(graphene.ObjectType):
-    all_customers = graphene.List(CustomerType, 
+    all_customers = graphene.relay.ConnectionField(CustomerConnection,
                                 name=graphene.String(),
                                 email=graphene.String(),
-                                phonePattern=graphene.String())
+                                phonePattern=graphene.String(),
+                                createdAtGte=graphene.DateTime(),
+                                createdAtLte=graphene.DateTime(),
+                                orderCountGte=graphene.Int(),
+                                orderCountLte=graphene.Int(),
+                                lifetimeValueGte=graphene.Float(),
+                                lifetimeValueLte=graphene.Float(),
+                                lastOrderDateGte=graphene.DateTime(),
+                                lastOrderDateLte=graphene.DateTime(),
+                                orderBy=graphene.String())
     customer = graphene.Field(CustomerType, id=graphene.ID())
     
-    all_products = graphene.List(ProductType,
+    all_products = graphene.relay.ConnectionField(ProductConnection,
                                name=graphene.String(),
                                priceGte=graphene.Float(),
                                priceLte=graphene.Float(),
                                stockGte=graphene.Int(),
-                               stockLte=graphene.Int())
+                               stockLte=graphene.Int(),
+                               lowStock=graphene.Boolean(),
+                               orderBy=graphene.String())
     product = graphene.Field(ProductType, id=graphene.ID())
     
-    all_orders = graphene.List(OrderType,
+    all_orders = graphene.relay.ConnectionField(OrderConnection,
                              totalAmountGte=graphene.Float(),
                              totalAmountLte=graphene.Float(),
+                             orderDateGte=graphene.DateTime(),
+                             orderDateLte=graphene.DateTime(),
                              customerName=graphene.String(),
-                             productId=graphene.ID())
-    order = graphene.Field(OrderType, id=graphene.ID())
+                             productName=graphene.String(),
+                             productId=graphene.ID(),
+                             orderBy=graphene.String(),
+                             includeArchived=graphene.Boolean(default_value=False))
+    order = graphene.Field(OrderType, id=graphene.ID(), include_archived=graphene.Boolean(default_value=False))
     
+    search = graphene.List(SearchResult,
+                           term=graphene.String(required=True),
+                           types=graphene.List(graphene.NonNull(SearchType)),
+                           first=graphene.Int(default_value=20))
+
     # Add total statistics queries
     total_customers = graphene.Int()
     total_orders = graphene.Int()
     total_revenue = graphene.Float()
 
-    def resolve_all_customers(self, info, name=None, email=None, phonePattern=None):
-        queryset = Customer.objects.all()
-        if name:
-            queryset = queryset.filter(name__icontains=name)
-        if email:
-            queryset = queryset.filter(email__icontains=email)
-        if phonePattern:
-            queryset = queryset.filter(phone__startswith=phonePattern)
-        return queryset
+    crm_reports = graphene.List(CrmReportType,
+                                from_=graphene.DateTime(name='from'),
+                                to=graphene.DateTime())
+    orders_time_series = graphene.List(TimeSeriesBucket,
+                                       granularity=TimeSeriesGranularity(default_value=TimeSeriesGranularity.DAY),
+                                       from_=graphene.Date(name='from'),
+                                       to=graphene.Date())
+    entity_cache_stats = graphene.List(EntityCacheStats,
+                                       description="Entity cache counters of the process serving the request")
+
+    def resolve_all_customers(self, info, **kwargs):
+        return paginate(CustomerConnection, CustomerFilter, Customer.objects.all(), info,
+                        ('created_at',), kwargs)
 
     def resolve_customer(self, info, id):
-        return Customer.objects.get(pk=id)
-
-    def resolve_all_products(self, info, name=None, priceGte=None, priceLte=None, 
-                           stockGte=None, stockLte=None):
-        queryset = Product.objects.all()
-        if name:
-            queryset = queryset.filter(name__icontains=name)
-        if priceGte is not None:
-            queryset = queryset.filter(price__gte=priceGte)
-        if priceLte is not None:
-            queryset = queryset.filter(price__lte=priceLte)
-        if stockGte is not None:
-            queryset = queryset.filter(stock__gte=stockGte)
-        if stockLte is not None:
-            queryset = queryset.filter(stock__lte=stockLte)
-        return queryset
+        return entity_cache.get(Customer, id)
+
+    def resolve_all_products(self, info, **kwargs):
+        return paginate(ProductConnection, ProductFilter, Product.objects.all(), info,
+                        ('price',), kwargs)
 
     def resolve_product(self, info, id):
-        return Product.objects.get(pk=id)
-
-    def resolve_all_orders(self, info, totalAmountGte=None, totalAmountLte=None,
-                         customerName=None, productId=None):
-        queryset = Order.objects.all()
-        if totalAmountGte is not None:
-            queryset = queryset.filter(total_amount__gte=totalAmountGte)
-        if totalAmountLte is not None:
-            queryset = queryset.filter(total_amount__lte=totalAmountLte)
-        if customerName:
-            queryset = queryset.filter(customer__name__icontains=customerName)
-        if productId:
-            queryset = queryset.filter(products__id=productId)
-        return queryset
-
-    def resolve_order(self, info, id):
-        return Order.objects.get(pk=id)
+        return entity_cache.get(Product, id)
+
+    def resolve_all_orders(self, info, includeArchived=False, **kwargs):
+        if includeArchived:
+            return paginate_with_archive(info, kwargs)
+        return paginate(OrderConnection, OrderFilter, Order.objects.all(), info,
+                        ('order_date',), kwargs)
+
+    def resolve_order(self, info, id, include_archived=False):
+        return get_order(id, include_archived)
+
+    def resolve_search(self, info, term, types=None, first=20):
+        if first < 0 or first > graphene_settings.RELAY_CONNECTION_MAX_LIMIT:
+            raise ValidationError(
+                f"first must be between 0 and {graphene_settings.RELAY_CONNECTION_MAX_LIMIT}"
+            )
+        models = [SEARCH_MODELS[item.value] for item in types] if types else None
+        return search(term, models, first)
 
     def resolve_total_customers(self, info):
-        return Customer.objects.count()
+        return CrmStatistics.current().customer_count
     
     def resolve_total_orders(self, info):
-        return Order.objects.count()
+        return CrmStatistics.current().order_count
     
     def resolve_total_revenue(self, info):
-        result = Order.objects.aggregate(total=Sum('total_amount'))
-        return result['total'] or 0.0
+        return CrmStatistics.current().total_revenue
 
-class Mutation(graphene.ObjectType):
-    create_customer = CreateCustomer.Field()
-    bulk_create_customers = BulkCreateCustomers.Field()
-    create_product = CreateProduct.Field()
-    create_order = CreateOrder.Field()
+    def resolve_crm_reports(self, info, from_=None, to=None):
+        return snapshots_between(from_, to)
 
-class CustomerFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(lookup_expr='icontains')
-    email = django_filters.CharFilter(lookup_expr='icontains')
-    phonePattern = django_filters.CharFilter(method='filter_phone_pattern')
+    def resolve_orders_time_series(self, info, granularity=TimeSeriesGranularity.DAY, from_=None, to=None):
+        buckets = time_series(granularity.value, from_, to)
+        return [TimeSeriesBucket(**bucket) for bucket in buckets]
 
-    def filter_phone_pattern(self, queryset, name, value):
-        return queryset.filter(phone__startswith=value)
+    def resolve_entity_cache_stats(self, info):
+        return [EntityCacheStats(model=label, **counters) for label, counters in entity_cache.stats().items()]
 
+# Query with resolvers for async execution (AsyncCRMGraphQLView): rows are
+# read with the async ORM, and work that has no async form yet (archive
+# merges, search, reports) runs in the request's sync thread. A comment, not
+# a docstring, so the SDL of both schemas stays identical.
+class AsyncQuery(Query):
     class Meta:
-        model = Customer
-        fields = ['name', 'email', 'phonePattern']
+        name = 'Query'
 
-class ProductFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(lookup_expr='icontains')
-    priceGte = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
-    priceLte = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
-    stockGte = django_filters.NumberFilter(field_name='stock', lookup_expr='gte')
-    stockLte = django_filters.NumberFilter(field_name='stock', lookup_expr='lte')
+    async def resolve_all_customers(self, info, **kwargs):
+        return await apaginate(CustomerConnection, CustomerFilter, Customer.objects.all(), info,
+                               ('created_at',), kwargs)
 
-    class Meta:
-        model = Product
-        fields = ['name', 'priceGte', 'priceLte', 'stockGte', 'stockLte']
+    async def resolve_customer(self, info, id):
+        return await entity_cache.aget(Customer, id)
 
-class OrderFilter(django_filters.FilterSet):
-    totalAmountGte = django_filters.NumberFilter(field_name='total_amount', lookup_expr='gte')
-    totalAmountLte = django_filters.NumberFilter(field_name='total_amount', lookup_expr='lte')
-    customerName = django_filters.CharFilter(field_name='customer__name', lookup_expr='icontains')
-    productId = django_filters.NumberFilter(field_name='products__id')
+    async def resolve_all_products(self, info, **kwargs):
+        return await apaginate(ProductConnection, ProductFilter, Product.objects.all(), info,
+                               ('price',), kwargs)
 
-    class Meta:
-        model = Order
-        fields = ['totalAmountGte', 'totalAmountLte', 'customerName', 'productId']
+    async def resolve_product(self, info, id):
+        return await entity_cache.aget(Product, id)
+
+    async def resolve_all_orders(self, info, includeArchived=False, **kwargs):
+        if includeArchived:
+            return await sync_to_async(paginate_with_archive)(info, kwargs)
+        return await apaginate(OrderConnection, OrderFilter, Order.objects.all(), info,
+                               ('order_date',), kwargs)
+
+    async def resolve_order(self, info, id, include_archived=False):
+        if include_archived:
+            return await sync_to_async(get_order)(id, include_archived)
+        return await entity_cache.aget(Order, id)
+
+    async def resolve_search(self, info, term, types=None, first=20):
+        return await sync_to_async(Query.resolve_search)(self, info, term, types, first)
+
+    async def resolve_total_customers(self, info):
+        return (await CrmStatistics.acurrent()).customer_count
+
+    async def resolve_total_orders(self, info):
+        return (await CrmStatistics.acurrent()).order_count
+
+    async def resolve_total_revenue(self, info):
+        return (await CrmStatistics.acurrent()).total_revenue
+
+    async def resolve_crm_reports(self, info, from_=None, to=None):
+        return await sync_to_async(snapshots_between)(from_, to)
+
+    async def resolve_orders_time_series(self, info, granularity=TimeSeriesGranularity.DAY, from_=None, to=None):
+        return await sync_to_async(Query.resolve_orders_time_series)(self, info, granularity, from_, to)
+
+class Mutation(graphene.ObjectType):
+    create_customer = CreateCustomer.Field()
+    bulk_create_customers = BulkCreateCustomers.Field()
+    create_product = CreateProduct.Field()
+    bulk_create_products = BulkCreateProducts.Field()
+    create_order = CreateOrder.Field()
+    bulk_create_orders = BulkCreateOrders.Field()
 
-schema = graphene.Schema(query=Query, mutation=Mutation) 
\ No newline at end of file
+schema = graphene.Schema(query=Query, mutation=Mutation, directives=DIRECTIVES)
+async_schema = graphene.Schema(query=AsyncQuery, mutation=Mutation, directives=DIRECTIVES)
@@ -0,0 +1,199 @@
+"""
+Substring search over customer and product names through SQLite FTS5
+tables with the trigram tokenizer. LIKE '%term%' has to read every row; a
+trigram index finds the rows containing every three-character slice of the
+term instead.
+
+The *_search tables are external-content indexes over crm_customer and
+crm_product, kept in sync by triggers so bulk_create and queryset.update()
+are covered too. Terms shorter than three characters, other database
+vendors and CRM_SEARCH_BACKEND = 'like' fall back to icontains.
+
+Migration 0011 creates them. On SQLite a later migration that remakes
+crm_customer or crm_product drops the triggers with the old table, so a
+post_migrate handler (repair_after_migrate) reinstalls whatever is missing.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Customer, Product
+
+MIN_TERM_LENGTH = 3
+
+# The migration that creates the search tables; nothing is repaired before it is applied
+INSTALLED_BY = ('crm', '0011_search_index')
+
+# model -> (FTS5 table, indexed columns); the source table and rowid are the model's
+SEARCH_INDEXES = {
+    Customer: ('crm_customer_search', ('name', 'email')),
+    Product: ('crm_product_search', ('name',)),
+}
+
+
+def _index_sql(model):
+    table, columns = SEARCH_INDEXES[model]
+    source = model._meta.db_table
+    names = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    delete = (
+        f"INSERT INTO {table}({table}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    )
+    insert = f"INSERT INTO {table}(rowid, {names}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+        f"{names}, content='{source}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON {source} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON {source} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_update AFTER UPDATE OF {names} ON {source} "
+        f"BEGIN {delete} {insert} END",
+        f"INSERT INTO {table}({table}) VALUES ('rebuild')",
+    ]
+
+
+def install(schema_connection=None):
+    """
+    Create the search tables and triggers if missing and rebuild the indexes
+    from the source tables. Safe to rerun, e.g. after a migration remade a
+    source table (which drops its triggers).
+    """
+    schema_connection = schema_connection or connection
+    if schema_connection.vendor != 'sqlite':
+        return False
+    with schema_connection.cursor() as cursor:
+        for model in SEARCH_INDEXES:
+            for statement in _index_sql(model):
+                cursor.execute(statement)
+    return True
+
+
+def missing(schema_connection=None):
+    """The names of the search tables and triggers absent from the database."""
+    schema_connection = schema_connection or connection
+    expected = {
+        name for table, _ in SEARCH_INDEXES.values()
+        for name in (table, f'{table}_insert', f'{table}_delete', f'{table}_update')
+    }
+    with schema_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name IN (%s)"
+            % ', '.join(['%s'] * len(expected)),
+            sorted(expected),
+        )
+        return expected - {name for name, in cursor.fetchall()}
+
+
+def repair_after_migrate(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    post_migrate handler: reinstall (and so rebuild) the search index when a
+    table or trigger is missing. Does nothing while migration 0011 is not
+    applied, e.g. after migrating back past it.
+    """
+    schema_connection = connections[using]
+    if schema_connection.vendor != 'sqlite':
+        return
+    if INSTALLED_BY not in MigrationRecorder(schema_connection).applied_migrations():
+        return
+    if missing(schema_connection):
+        install(schema_connection)
+
+
+def uninstall(schema_connection=None):
+    schema_connection = schema_connection or connection
+    if schema_connection.vendor != 'sqlite':
+        return
+    with schema_connection.cursor() as cursor:
+        for table, _ in SEARCH_INDEXES.values():
+            for suffix in ('insert', 'delete', 'update'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {table}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def enabled():
+    return connection.vendor == 'sqlite' and getattr(settings, 'CRM_SEARCH_BACKEND', 'fts5') == 'fts5'
+
+
+def _usable(term):
+    return enabled() and len(term) >= MIN_TERM_LENGTH
+
+
+def match_expression(columns, term):
+    """An FTS5 query for term as a literal phrase, limited to columns."""
+    phrase = '"' + term.replace('"', '""') + '"'
+    return '{%s} : %s' % (' '.join(columns), phrase)
+
+
+def matching_ids(model, columns, term):
+    """A subquery of the primary keys of model rows whose columns contain term."""
+    table, _ = SEARCH_INDEXES[model]
+    return RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [match_expression(columns, term)])
+
+
+def contains(queryset, lookup, term):
+    """
+    queryset.filter(<lookup>__icontains=term), answered from the search index
+    when lookup ends at an indexed column, e.g. 'name' on customers or
+    'customer__name' on orders.
+
+    A lookup through a many-valued relation ('products__name' on orders)
+    filters on pk__in a subquery instead of joining, so a row with several
+    matching related rows is still returned once. A single ManyToMany hop
+    reads only the through table, e.g. OrderItem for order products.
+    """
+    *path, column = lookup.split('__')
+    model = queryset.model
+    relations = []
+    for part in path:
+        field = model._meta.get_field(part)
+        relations.append(field)
+        model = field.related_model
+    indexed = SEARCH_INDEXES.get(model, (None, ()))[1]
+    if column in indexed and _usable(term):
+        condition = {'__'.join(path + ['pk', 'in']): matching_ids(model, [column], term)}
+    else:
+        condition = {f'{lookup}__icontains': term}
+    if not any(field.many_to_many or field.one_to_many for field in relations):
+        return queryset.filter(**condition)
+
+    if len(relations) == 1 and relations[0].many_to_many:
+        field = relations[0]
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        if column in indexed and _usable(term):
+            rows = {f'{target}_id__in': matching_ids(model, [column], term)}
+        else:
+            rows = {f'{target}__{column}__icontains': term}
+        matches = field.remote_field.through._default_manager.filter(**rows).values(f'{source}_id')
+    else:
+        matches = queryset.model._default_manager.filter(**condition).values('pk')
+    return queryset.filter(pk__in=matches)
+
+
+def search(term, models=None, limit=20):
+    """
+    Customers and products whose indexed columns contain term, best bm25
+    rank first across both tables, at most limit rows.
+    """
+    models = models or list(SEARCH_INDEXES)
+    ranked = []
+    for model in models:
+        table, columns = SEARCH_INDEXES[model]
+        if _usable(term):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT rowid, rank FROM {table} WHERE {table} MATCH %s ORDER BY rank LIMIT %s",
+                    [match_expression(columns, term), limit],
+                )
+                ranks = dict(cursor.fetchall())
+            objects = model._default_manager.in_bulk(list(ranks))
+            ranked.extend((ranks[pk], obj) for pk, obj in objects.items())
+        else:
+            condition = Q()
+            for column in columns:
+                condition |= Q(**{f'{column}__icontains': term})
+            rows = model._default_manager.filter(condition).order_by('pk')[:limit]
+            ranked.extend((0, obj) for obj in rows)
+    ranked.sort(key=lambda pair: pair[0])
+    return [obj for _, obj in ranked[:limit]]
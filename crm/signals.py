@@ -0,0 +1,56 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .entity_cache import CACHED_MODELS, entity_cache
+from .models import Customer, Order
+from . import statistics
+
+
+@receiver(post_save, sender=Customer)
+def customer_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        statistics.customer_created(instance)
+
+
+@receiver(post_delete, sender=Customer)
+def customer_deleted(sender, instance, **kwargs):
+    statistics.customer_deleted(instance)
+
+
+@receiver(pre_save, sender=Order)
+def order_remember_previous(sender, instance, raw=False, **kwargs):
+    """Capture the stored row so an update can record only the difference."""
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._previous_values = (
+        Order.objects.filter(pk=instance.pk)
+        .values_list('customer_id', 'total_amount', 'order_date')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        statistics.order_created(instance)
+        return
+    previous = getattr(instance, '_previous_values', None)
+    if previous is not None:
+        statistics.order_changed(instance, previous)
+    instance._previous_values = None
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    statistics.order_deleted(instance)
+
+
+def invalidate_cached_entity(sender, instance, **kwargs):
+    entity_cache.invalidate(sender, instance.pk)
+
+
+for model in CACHED_MODELS:
+    post_save.connect(invalidate_cached_entity, sender=model, dispatch_uid=f'crm_entity_cache_save_{model.__name__}')
+    post_delete.connect(invalidate_cached_entity, sender=model, dispatch_uid=f'crm_entity_cache_delete_{model.__name__}')
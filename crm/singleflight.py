@@ -0,0 +1,137 @@
+"""
+Single-flight guards: concurrent callers asking for the same thing share
+one computation instead of each running it.
+
+SingleFlight coalesces within a process, AsyncSingleFlight within an event
+loop. guarded() adds a lock in the Django cache named by
+CRM_SINGLE_FLIGHT_CACHE, so at most one process computes a value at a time
+while the others poll for it. The cross-process lock only spans processes
+when that alias is a shared backend (e.g. Redis); with the default locmem
+cache it degrades to a per-process lock.
+"""
+import asyncio
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Concurrent do(key, fn) calls with the same key share one call of fn."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """
+        Return fn(), or the result of the call already running for key. An
+        exception raised by that call is raised in every caller sharing it.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def clear(self):
+        with self._lock:
+            self.executions = self.shared = 0
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines: concurrent do(key, fn) calls await one fn()."""
+
+    def __init__(self):
+        self._calls = {}
+        self.executions = 0
+        self.shared = 0
+
+    async def do(self, key, fn):
+        key = (id(asyncio.get_running_loop()), key)
+        task = self._calls.get(key)
+        if task is None:
+            self.executions += 1
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.shared += 1
+        # One caller going away must not cancel the call the others await
+        return await asyncio.shield(task)
+
+    def clear(self):
+        self.executions = self.shared = 0
+
+
+flights = SingleFlight()
+
+
+def _setting(name, default):
+    return getattr(settings, f'CRM_SINGLE_FLIGHT_{name}', default)
+
+
+def guarded(key, compute, peek):
+    """
+    Return peek() if it has a value (not None), otherwise compute() it in
+    at most one caller across threads and processes.
+
+    Callers in this process share the leader's call. Other processes wait
+    for the cache lock holder by polling peek() every CRM_SINGLE_FLIGHT_POLL
+    seconds; if nothing appears within CRM_SINGLE_FLIGHT_TIMEOUT seconds
+    (the holder died or is stuck) they compute the value themselves.
+    """
+    return flights.do(key, lambda: _compute_once(key, compute, peek))
+
+
+def _compute_once(key, compute, peek):
+    store = caches[_setting('CACHE', 'default')]
+    timeout = _setting('TIMEOUT', 30)
+    lock_key = f'crm:singleflight:{key}'
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + timeout
+    while True:
+        value = peek()
+        if value is not None:
+            return value
+        if store.add(lock_key, token, timeout):
+            try:
+                # The previous holder may have finished between peek() and add()
+                value = peek()
+                return value if value is not None else compute()
+            finally:
+                if store.get(lock_key) == token:
+                    store.delete(lock_key)
+        if time.monotonic() >= deadline:
+            return compute()
+        time.sleep(_setting('POLL', 0.05))
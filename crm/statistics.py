@@ -0,0 +1,291 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .entity_cache import entity_cache
+from .models import ArchivedCustomer, ArchivedOrder, CrmStatistics, Customer, Order
+from .rollups import apply_day_delta, order_day
+
+_local = threading.local()
+
+FIELDS = {
+    'customers': 'customer_count',
+    'orders': 'order_count',
+    'revenue': 'total_revenue',
+}
+
+
+def _empty_delta():
+    return {'customers': 0, 'orders': 0, 'revenue': Decimal('0')}
+
+
+def _empty_customer_delta():
+    return {'orders': 0, 'revenue': Decimal('0'), 'latest': None, 'recompute': False}
+
+
+def _empty_day_delta():
+    return {'orders': 0, 'revenue': Decimal('0')}
+
+
+class _Pending:
+    """Changes collected by an open stats_batch()."""
+
+    def __init__(self):
+        self.totals = _empty_delta()
+        self.customers = defaultdict(_empty_customer_delta)
+        self.days = defaultdict(_empty_day_delta)
+
+    def merge(self, other):
+        """Add the changes collected by a nested batch that completed."""
+        for key, value in other.totals.items():
+            self.totals[key] += value
+        for customer_id, change in other.customers.items():
+            delta = self.customers[customer_id]
+            delta['orders'] += change['orders']
+            delta['revenue'] += change['revenue']
+            delta['recompute'] = delta['recompute'] or change['recompute']
+            if change['latest'] is not None and (delta['latest'] is None or change['latest'] > delta['latest']):
+                delta['latest'] = change['latest']
+        for day, change in other.days.items():
+            delta = self.days[day]
+            delta['orders'] += change['orders']
+            delta['revenue'] += change['revenue']
+
+
+def apply_delta(delta):
+    """Add delta to the statistics row with a single UPDATE ... SET x = x + n."""
+    changes = {
+        column: F(column) + delta[key]
+        for key, column in FIELDS.items()
+        if delta.get(key)
+    }
+    if not changes:
+        return
+    updated = CrmStatistics.objects.filter(pk=CrmStatistics.SINGLETON_ID).update(**changes)
+    if not updated:
+        # First write ever: materialize from the tables, which already
+        # include the change being recorded.
+        rebuild_statistics()
+
+
+def _customer_orders(model):
+    """The orders (live or archived) of the customer at OuterRef('pk'), grouped for one aggregate."""
+    return model.objects.filter(customer_id=OuterRef('pk')).order_by().values('customer_id')
+
+
+def _latest_order_date():
+    # Archived orders keep counting towards the customer's counters
+    live, archived = (
+        Subquery(_customer_orders(model).annotate(latest=Max('order_date')).values('latest'))
+        for model in (Order, ArchivedOrder)
+    )
+    return Greatest(Coalesce(live, archived), Coalesce(archived, live))
+
+
+def apply_customer_delta(customer_id, delta):
+    """Adjust one customer's counter cache with a single UPDATE."""
+    changes = {}
+    if delta['orders']:
+        changes['order_count'] = F('order_count') + delta['orders']
+    if delta['revenue']:
+        changes['lifetime_value'] = F('lifetime_value') + delta['revenue']
+    if delta['recompute']:
+        changes['last_order_date'] = _latest_order_date()
+    elif delta['latest'] is not None:
+        latest = Value(delta['latest'], output_field=models.DateTimeField())
+        changes['last_order_date'] = Greatest(Coalesce('last_order_date', latest), latest)
+    if changes:
+        Customer.objects.filter(pk=customer_id).update(**changes)
+        entity_cache.invalidate(Customer, customer_id)
+
+
+def _flush(pending):
+    apply_delta(pending.totals)
+    for customer_id, delta in pending.customers.items():
+        apply_customer_delta(customer_id, delta)
+    for day, delta in sorted(pending.days.items()):
+        apply_day_delta(day, delta['orders'], delta['revenue'])
+
+
+@contextmanager
+def stats_batch():
+    """
+    Collect every statistics change made inside the block (including those
+    from cascaded deletes) and write them on exit: one UPDATE for the totals
+    and one per affected customer.
+
+    Nothing is recorded if the block raises: its writes are being rolled
+    back (or were never made), and flushing inside a broken atomic() block
+    would mask the original error. A nested batch hands its changes to the
+    enclosing one only when it completes, so a failure caught further out
+    drops just the changes made inside the failed block.
+    """
+    parent = getattr(_local, 'pending', None)
+    pending = _local.pending = _Pending()
+    try:
+        yield
+    finally:
+        _local.pending = parent
+    if parent is None:
+        _flush(pending)
+    else:
+        parent.merge(pending)
+
+
+@contextmanager
+def _recording():
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        yield pending
+    else:
+        pending = _Pending()
+        yield pending
+        _flush(pending)
+
+
+def record(delta, sign=1):
+    """Record a change to the totals."""
+    with _recording() as pending:
+        for key, value in delta.items():
+            pending.totals[key] += sign * value
+
+
+def record_customer(customer_id, orders=0, revenue=Decimal('0'), order_date=None, recompute=False):
+    """Record a change to one customer's order counters."""
+    with _recording() as pending:
+        delta = pending.customers[customer_id]
+        delta['orders'] += orders
+        delta['revenue'] += revenue
+        delta['recompute'] = delta['recompute'] or recompute
+        if order_date is not None and (delta['latest'] is None or order_date > delta['latest']):
+            delta['latest'] = order_date
+
+
+def record_day(order_date, orders, revenue):
+    """Record a change to the OrderDailyRollup row of order_date's day."""
+    with _recording() as pending:
+        delta = pending.days[order_day(order_date)]
+        delta['orders'] += orders
+        delta['revenue'] += revenue
+
+
+def customer_created(customer):
+    record({'customers': 1})
+
+
+def customer_deleted(customer):
+    record({'customers': 1}, sign=-1)
+
+
+def order_created(order):
+    total = order.total_amount or Decimal('0')
+    with stats_batch():
+        record({'orders': 1, 'revenue': total})
+        record_customer(order.customer_id, orders=1, revenue=total, order_date=order.order_date)
+        record_day(order.order_date, 1, total)
+
+
+def order_changed(order, previous):
+    """previous is the (customer_id, total_amount, order_date) stored before the save."""
+    old_customer_id, old_total, old_date = previous
+    total = order.total_amount or Decimal('0')
+    old_total = old_total or Decimal('0')
+    with stats_batch():
+        if total != old_total:
+            record({'revenue': total - old_total})
+        if order.customer_id != old_customer_id:
+            record_customer(old_customer_id, orders=-1, revenue=-old_total, recompute=True)
+            record_customer(order.customer_id, orders=1, revenue=total, order_date=order.order_date)
+        elif total != old_total or order.order_date != old_date:
+            record_customer(
+                order.customer_id,
+                revenue=total - old_total,
+                recompute=order.order_date != old_date,
+            )
+        if (order.customer_id, total, order.order_date) != (old_customer_id, old_total, old_date):
+            # Moved out of the old day (or customer) and into the new one
+            record_day(old_date, -1, -old_total)
+            record_day(order.order_date, 1, total)
+
+
+def order_deleted(order):
+    total = order.total_amount or Decimal('0')
+    with stats_batch():
+        record({'orders': 1, 'revenue': total}, sign=-1)
+        # The deleted order may have been the latest one.
+        record_customer(order.customer_id, orders=-1, revenue=-total, recompute=True)
+        record_day(order.order_date, -1, -total)
+
+
+def record_created(objs):
+    """Record rows inserted without model signals, e.g. by bulk_create."""
+    with stats_batch():
+        for obj in objs:
+            if isinstance(obj, Order):
+                order_created(obj)
+            elif isinstance(obj, Customer):
+                customer_created(obj)
+
+
+def compute_statistics():
+    """
+    Count everything from scratch. Archived customers and orders are
+    included: archiving moves rows without changing the statistics.
+    """
+    revenue = sum(
+        (model.objects.aggregate(total=Sum('total_amount'))['total'] or Decimal('0'))
+        for model in (Order, ArchivedOrder)
+    )
+    return {
+        'customer_count': Customer.objects.count() + ArchivedCustomer.objects.count(),
+        'order_count': Order.objects.count() + ArchivedOrder.objects.count(),
+        'total_revenue': revenue.quantize(Decimal('0.01')),
+    }
+
+
+def rebuild_statistics():
+    """
+    Recompute the statistics row from the tables. Returns (previous values
+    or None, the rebuilt row).
+    """
+    with transaction.atomic():
+        row = (
+            CrmStatistics.objects.select_for_update()
+            .filter(pk=CrmStatistics.SINGLETON_ID)
+            .first()
+        )
+        previous = None
+        if row is not None:
+            previous = {column: getattr(row, column) for column in FIELDS.values()}
+        values = compute_statistics()
+        row, _ = CrmStatistics.objects.update_or_create(pk=CrmStatistics.SINGLETON_ID, defaults=values)
+    return previous, row
+
+
+def rebuild_customer_counters(queryset=None):
+    """
+    Recompute order_count, last_order_date and lifetime_value from the live
+    and archived orders tables for every customer in queryset. Returns the
+    number of rows updated.
+    """
+    def total(aggregate, zero):
+        live, archived = (
+            Coalesce(Subquery(_customer_orders(model).annotate(value=aggregate).values('value')), zero)
+            for model in (Order, ArchivedOrder)
+        )
+        return live + archived
+
+    queryset = Customer.objects.all() if queryset is None else queryset
+    entity_cache.invalidate_all(Customer)
+    return queryset.update(
+        order_count=total(models.Count('pk'), 0),
+        last_order_date=_latest_order_date(),
+        lifetime_value=models.ExpressionWrapper(
+            total(Sum('total_amount'), Value(Decimal('0'))), output_field=models.DecimalField(),
+        ),
+    )
@@ -1,34 +1,72 @@
 import os
 from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
 from celery import shared_task
+from django.conf import settings
 from gql import gql, Client
 from gql.transport.requests import RequestsHTTPTransport
+from graphql import build_schema
+from .reports import generate_snapshot
+
+REPORT_QUERY = """
+    query {
+        totalCustomers
+        totalOrders
+        totalRevenue
+    }
+"""
+
+# SDL of alx_backend_graphql.schema.schema, regenerated with:
+#   python manage.py graphql_schema --schema alx_backend_graphql.schema.schema --out crm/schema.graphql
+SCHEMA_SNAPSHOT = Path(__file__).with_name('schema.graphql')
+
+
+@lru_cache(maxsize=1)
+def snapshot_schema():
+    """The bundled schema snapshot, so HTTP clients can validate without introspection."""
+    return build_schema(SCHEMA_SNAPSHOT.read_text())
+
+
+def execute_in_process(query):
+    """Run query against the project schema inside this worker."""
+    from alx_backend_graphql.schema import schema
+
+    result = schema.execute(query)
+    if result.errors:
+        raise Exception('; '.join(str(error) for error in result.errors))
+    return result.data
+
+
+def execute_over_http(query):
+    """Run query against the GraphQL endpoint, validated against the bundled snapshot."""
+    transport = RequestsHTTPTransport(
+        url=getattr(settings, 'CRM_REPORT_GRAPHQL_URL', 'http://localhost:8000/graphql/'),
+        verify=True,
+        retries=3,
+    )
+    client = Client(transport=transport, schema=snapshot_schema())
+    return client.execute(gql(query))
+
+
+def execute_report_query(query):
+    """Dispatch on settings.CRM_REPORT_TRANSPORT: 'inprocess' (default) or 'http'."""
+    if getattr(settings, 'CRM_REPORT_TRANSPORT', 'inprocess') == 'http':
+        return execute_over_http(query)
+    return execute_in_process(query)
 
 @shared_task
 def generate_crm_report():
     """
     Generate a weekly CRM report using GraphQL queries and log it to a file.
     """
-    # GraphQL query to fetch CRM statistics
-    query = gql("""
-        query {
-            totalCustomers
-            totalOrders
-            totalRevenue
-        }
-    """)
-    
-    # Create GraphQL client
-    transport = RequestsHTTPTransport(
-        url='http://localhost:8000/graphql/',
-        verify=True,
-        retries=3,
-    )
-    client = Client(transport=transport, fetch_schema_from_transport=True)
-    
     try:
+        # Store this period's deltas; only rows created since the last
+        # watermark are read
+        generate_snapshot()
+
         # Execute the query
-        result = client.execute(query)
+        result = execute_report_query(REPORT_QUERY)
         
         # Format the report message
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -50,4 +88,4 @@ def generate_crm_report():
         error_msg = f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Error generating report: {str(e)}\n"
         with open('/tmp/crm_report_log.txt', 'a') as f:
             f.write(error_msg)
-        raise 
\ No newline at end of file
+        raise
@@ -291,16 +291,20 @@ class GraphQLCRMTestCase(TestCase):
         query = '''
         query {
             allCustomers {
-                id
-                name
-                email
-                phone
+                edges {
+                    node {
+                        id
+                        name
+                        email
+                        phone
+                    }
+                }
             }
         }
         '''
         response = self.client.execute(query)
         self.assertIsNone(response.get('errors'))
-        self.assertTrue(len(response['data']['allCustomers']) > 0)
+        self.assertTrue(len(response['data']['allCustomers']['edges']) > 0)
 
     def test_query_single_customer(self):
         """Test querying a single customer by ID"""
@@ -323,16 +327,20 @@ class GraphQLCRMTestCase(TestCase):
         query = '''
         query {
             allProducts {
-                id
-                name
-                price
-                stock
+                edges {
+                    node {
+                        id
+                        name
+                        price
+                        stock
+                    }
+                }
             }
         }
         '''
         response = self.client.execute(query)
         self.assertIsNone(response.get('errors'))
-        self.assertTrue(len(response['data']['allProducts']) > 0)
+        self.assertTrue(len(response['data']['allProducts']['edges']) > 0)
 
     def test_query_orders(self):
         """Test querying all orders"""
@@ -346,21 +354,25 @@ class GraphQLCRMTestCase(TestCase):
         query = '''
         query {
             allOrders {
-                id
-                totalAmount
-                customer {
-                    name
-                }
-                products {
-                    id
-                    name
+                edges {
+                    node {
+                        id
+                        totalAmount
+                        customer {
+                            name
+                        }
+                        products {
+                            id
+                            name
+                        }
+                    }
                 }
             }
         }
         '''
         response = self.client.execute(query)
         self.assertIsNone(response.get('errors'))
-        self.assertTrue(len(response['data']['allOrders']) > 0)
+        self.assertTrue(len(response['data']['allOrders']['edges']) > 0)
 
 class CRMFilterTests(GraphQLTestCase):
     GRAPHQL_URL = '/graphql/'
@@ -419,17 +431,21 @@ class CRMFilterTests(GraphQLTestCase):
         query = '''
         query {
             allCustomers(name: "John Doe") {
-                id
-                name
-                email
-                phone
+                edges {
+                    node {
+                        id
+                        name
+                        email
+                        phone
+                    }
+                }
             }
         }
         '''
         response = self.query(query)
         self.assertResponseNoErrors(response)
         content = json.loads(response.content)
-        customers = content['data']['allCustomers']
+        customers = [edge['node'] for edge in content['data']['allCustomers']['edges']]
         self.assertEqual(len(customers), 1)
         self.assertEqual(customers[0]['name'], "John Doe")
 
@@ -437,16 +453,20 @@ class CRMFilterTests(GraphQLTestCase):
         query = '''
         query {
             allCustomers(email: "jane") {
-                id
-                name
-                email
+                edges {
+                    node {
+                        id
+                        name
+                        email
+                    }
+                }
             }
         }
         '''
         response = self.query(query)
         self.assertResponseNoErrors(response)
         content = json.loads(response.content)
-        customers = content['data']['allCustomers']
+        customers = [edge['node'] for edge in content['data']['allCustomers']['edges']]
         self.assertEqual(len(customers), 1)
         self.assertEqual(customers[0]['email'], "jane@example.com")
 
@@ -454,32 +474,41 @@ class CRMFilterTests(GraphQLTestCase):
         query = '''
         query {
             allCustomers(phonePattern: "+1") {
-                id
-                name
-                phone
+                edges {
+                    node {
+                        id
+                        name
+                        phone
+                    }
+                }
             }
         }
         '''
         response = self.query(query)
         self.assertResponseNoErrors(response)
         content = json.loads(response.content)
-        customers = content['data']['allCustomers']
-        self.assertEqual(len(customers), 2)  # John and Bob have +1 numbers
+        customers = [edge['node'] for edge in content['data']['allCustomers']['edges']]
+        # Matched on digits: John and Bob (+1...) and Jane (123-456-7890)
+        self.assertEqual(len(customers), 3)
 
     def test_filter_products_by_price_range(self):
         query = '''
         query {
             allProducts(priceGte: 400, priceLte: 600) {
-                id
-                name
-                price
+                edges {
+                    node {
+                        id
+                        name
+                        price
+                    }
+                }
             }
         }
         '''
         response = self.query(query)
         self.assertResponseNoErrors(response)
         content = json.loads(response.content)
-        products = content['data']['allProducts']
+        products = [edge['node'] for edge in content['data']['allProducts']['edges']]
         self.assertEqual(len(products), 1)
         self.assertEqual(products[0]['name'], "Smartphone")
 
@@ -487,26 +516,34 @@ class CRMFilterTests(GraphQLTestCase):
         query = '''
         query {
             allProducts(stockGte: 10) {
-                id
-                name
-                stock
+                edges {
+                    node {
+                        id
+                        name
+                        stock
+                    }
+                }
             }
         }
         '''
         response = self.query(query)
         self.assertResponseNoErrors(response)
         content = json.loads(response.content)
-        products = content['data']['allProducts']
+        products = [edge['node'] for edge in content['data']['allProducts']['edges']]
         self.assertEqual(len(products), 2)  # Laptop and Smartphone
 
     def test_filter_orders_by_total_amount(self):
         query = '''
         query {
             allOrders(totalAmountGte: 1000) {
-                id
-                totalAmount
-                customer {
-                    name
+                edges {
+                    node {
+                        id
+                        totalAmount
+                        customer {
+                            name
+                        }
+                    }
                 }
             }
         }
@@ -514,16 +551,20 @@ class CRMFilterTests(GraphQLTestCase):
         response = self.query(query)
         self.assertResponseNoErrors(response)
         content = json.loads(response.content)
-        orders = content['data']['allOrders']
+        orders = [edge['node'] for edge in content['data']['allOrders']['edges']]
         self.assertEqual(len(orders), 1)  # Only order1 has total_amount >= 1000
 
     def test_filter_orders_by_customer_name(self):
         query = '''
         query {
             allOrders(customerName: "Jane") {
-                id
-                customer {
-                    name
+                edges {
+                    node {
+                        id
+                        customer {
+                            name
+                        }
+                    }
                 }
             }
         }
@@ -531,7 +572,7 @@ class CRMFilterTests(GraphQLTestCase):
         response = self.query(query)
         self.assertResponseNoErrors(response)
         content = json.loads(response.content)
-        orders = content['data']['allOrders']
+        orders = [edge['node'] for edge in content['data']['allOrders']['edges']]
         self.assertEqual(len(orders), 1)
         self.assertEqual(orders[0]['customer']['name'], "Jane Smith")
 
@@ -539,10 +580,14 @@ class CRMFilterTests(GraphQLTestCase):
         query = f'''
         query {{
             allOrders(productId: "{self.product2.id}") {{
-                id
-                products {{
-                    id
-                    name
+                edges {{
+                    node {{
+                        id
+                        products {{
+                            id
+                            name
+                        }}
+                    }}
                 }}
             }}
         }}
@@ -550,7 +595,7 @@ class CRMFilterTests(GraphQLTestCase):
         response = self.query(query)
         self.assertResponseNoErrors(response)
         content = json.loads(response.content)
-        orders = content['data']['allOrders']
+        orders = [edge['node'] for edge in content['data']['allOrders']['edges']]
         self.assertEqual(len(orders), 2)  # Both orders contain product2
 
     def test_query_customers(self):
@@ -558,17 +603,21 @@ class CRMFilterTests(GraphQLTestCase):
         query = '''
         query {
             allCustomers {
-                id
-                name
-                email
-                phone
+                edges {
+                    node {
+                        id
+                        name
+                        email
+                        phone
+                    }
+                }
             }
         }
         '''
         response = self.query(query)
         self.assertResponseNoErrors(response)
         content = json.loads(response.content)
-        customers = content['data']['allCustomers']
+        customers = [edge['node'] for edge in content['data']['allCustomers']['edges']]
         self.assertEqual(len(customers), 3)  # We created 3 customers in setUp
 
     def test_query_products(self):
@@ -576,17 +625,21 @@ class CRMFilterTests(GraphQLTestCase):
         query = '''
         query {
             allProducts {
-                id
-                name
-                price
-                stock
+                edges {
+                    node {
+                        id
+                        name
+                        price
+                        stock
+                    }
+                }
             }
         }
         '''
         response = self.query(query)
         self.assertResponseNoErrors(response)
         content = json.loads(response.content)
-        products = content['data']['allProducts']
+        products = [edge['node'] for edge in content['data']['allProducts']['edges']]
         self.assertEqual(len(products), 3)  # We created 3 products in setUp
 
     def test_query_orders(self):
@@ -594,14 +647,18 @@ class CRMFilterTests(GraphQLTestCase):
         query = '''
         query {
             allOrders {
-                id
-                totalAmount
-                customer {
-                    name
-                }
-                products {
-                    id
-                    name
+                edges {
+                    node {
+                        id
+                        totalAmount
+                        customer {
+                            name
+                        }
+                        products {
+                            id
+                            name
+                        }
+                    }
                 }
             }
         }
@@ -609,5 +666,5 @@ class CRMFilterTests(GraphQLTestCase):
         response = self.query(query)
         self.assertResponseNoErrors(response)
         content = json.loads(response.content)
-        orders = content['data']['allOrders']
+        orders = [edge['node'] for edge in content['data']['allOrders']['edges']]
         self.assertEqual(len(orders), 2)  # We created 2 orders in setUp
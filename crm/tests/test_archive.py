@@ -0,0 +1,138 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from crm.archive import archive_customers, archive_orders, inactive_filter
+from crm.models import (
+    Customer, Product, Order, OrderItem, ArchivedCustomer, ArchivedOrder, CrmStatistics, OrderDailyRollup,
+)
+from crm.rollups import backfill
+from crm.schema import schema
+from crm.statistics import rebuild_customer_counters, rebuild_statistics
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.pen = Product.objects.create(name="Pen", price=Decimal("2.00"), stock=100)
+        self.stale = Customer.objects.create(name="Stale", email="stale@example.com")
+        self.active = Customer.objects.create(name="Active", email="active@example.com")
+        self.orders = []
+        for customer, days in [(self.stale, 400), (self.stale, 500), (self.active, 450), (self.active, 3)]:
+            order = Order.objects.create(
+                customer=customer, total_amount=Decimal("2.00"), order_date=now - timedelta(days=days)
+            )
+            OrderItem.objects.create(order=order, product=self.pen, quantity=1)
+            self.orders.append(order)
+        self.cutoff = now - timedelta(days=365)
+
+    def test_customers_move_with_their_orders(self):
+        """Archived customers keep their ids and counters, and still count in the statistics"""
+        moved = archive_customers(Customer.objects.filter(inactive_filter(self.cutoff)), size=1)
+        self.assertEqual(moved, 1)
+        archived = ArchivedCustomer.objects.get()
+        self.assertEqual((archived.id, archived.order_count), (self.stale.id, 2))
+        self.assertEqual(
+            set(ArchivedOrder.objects.values_list('id', flat=True)),
+            {self.orders[0].id, self.orders[1].id},
+        )
+        self.assertFalse(Customer.objects.filter(pk=self.stale.pk).exists())
+        stats = CrmStatistics.current()
+        self.assertEqual((stats.customer_count, stats.order_count), (2, 4))
+
+    def test_old_orders_of_active_customers(self):
+        """Moving an old order keeps the customer live, recent and counting it"""
+        archive_orders(Order.objects.filter(customer=self.active, order_date__lt=self.cutoff))
+        self.active.refresh_from_db()
+        self.assertEqual(self.active.order_count, 2)
+        self.assertEqual(self.active.last_order_date, self.orders[3].order_date)
+        self.assertEqual(list(ArchivedOrder.objects.get().products.all()), [self.pen])
+
+    def test_archiving_leaves_counters_and_rollups_alone(self):
+        """Archived history stays in the statistics, lifetime values and daily rollups, also when rebuilt"""
+        def counters():
+            stats = CrmStatistics.current()
+            return (
+                (stats.customer_count, stats.order_count, stats.total_revenue),
+                list(Customer.objects.values_list('id', *Customer.COUNTER_FIELDS).order_by('id')),
+                list(OrderDailyRollup.objects.values_list('date', 'order_count', 'revenue', 'distinct_customers')),
+            )
+
+        before = counters()
+        call_command('archive_crm_data', stdout=StringIO())
+        self.assertEqual(ArchivedOrder.objects.count(), 3)
+        before[1].pop(0)  # The stale customer is archived with its counters
+        self.assertEqual(counters(), before)
+        rebuild_statistics()
+        rebuild_customer_counters()
+        backfill()
+        self.assertEqual(counters(), before)
+
+    def test_archived_orders_outlive_a_deleted_customer(self):
+        """Orders archived before cleanup_inactive_customers deletes their customer still resolve"""
+        call_command('archive_crm_data', '--inactive-days', '480', stdout=StringIO())
+        self.assertEqual(set(ArchivedOrder.objects.values_list('id', flat=True)), {self.orders[1].id})
+        call_command('cleanup_inactive_customers', stdout=StringIO())
+        self.assertFalse(Customer.objects.filter(pk=self.stale.pk).exists())
+
+        result = schema.execute('''
+            query($id: ID!) {
+                order(id: $id, includeArchived: true) { id customer { name } }
+                allOrders(includeArchived: true) { edges { node { id customer { name } } } }
+            }
+        ''', variable_values={'id': self.orders[1].id})
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data['order']['customer'], {'name': "Stale"})
+        nodes = {edge['node']['id']: edge['node'] for edge in result.data['allOrders']['edges']}
+        self.assertEqual(nodes[str(self.orders[1].id)]['customer'], {'name': "Stale"})
+
+    def test_include_archived_merges_both_tables(self):
+        """allOrders(includeArchived: true) pages over live and archived orders in order_date order"""
+        call_command('archive_crm_data', stdout=StringIO())
+        self.assertEqual(Order.objects.count(), 1)
+        query = '''
+        query Page($after: String, $include: Boolean) {
+            allOrders(first: 3, after: $after, includeArchived: $include) {
+                edges { node { id archived customer { name } products { name } } }
+                pageInfo { hasNextPage endCursor }
+            }
+        }
+        '''
+        live = schema.execute(query, variable_values={'include': False})
+        self.assertEqual(len(live.data['allOrders']['edges']), 1)
+
+        nodes, after = [], None
+        while True:
+            result = schema.execute(query, variable_values={'include': True, 'after': after})
+            self.assertIsNone(result.errors)
+            nodes.extend(edge['node'] for edge in result.data['allOrders']['edges'])
+            if not result.data['allOrders']['pageInfo']['hasNextPage']:
+                break
+            after = result.data['allOrders']['pageInfo']['endCursor']
+        expected = sorted(self.orders, key=lambda o: o.order_date)
+        self.assertEqual([node['id'] for node in nodes], [str(o.id) for o in expected])
+        self.assertEqual([node['archived'] for node in nodes], [True, True, True, False])
+        self.assertEqual(nodes[0]['customer']['name'], 'Stale')
+        self.assertEqual(nodes[0]['products'], [{'name': 'Pen'}])
+
+    def test_archived_filters_and_single_lookup(self):
+        """OrderFilter arguments apply to the archive, and order(id) can reach it"""
+        call_command('archive_crm_data', stdout=StringIO())
+        result = schema.execute('''{
+            allOrders(customerName: "stal", includeArchived: true) { edges { node { id } } }
+            hidden: order(id: %d) { id }
+            found: order(id: %d, includeArchived: true) { id archived }
+        }''' % (self.orders[0].id, self.orders[0].id))
+        self.assertEqual(len(result.data['allOrders']['edges']), 2)
+        self.assertIsNone(result.data['hidden'])
+        self.assertEqual(result.data['found'], {'id': str(self.orders[0].id), 'archived': True})
+
+    def test_command_dry_run_and_order_cutoff(self):
+        """--dry-run only counts; an order cutoff shorter than inactivity is refused"""
+        out = StringIO()
+        call_command('archive_crm_data', '--dry-run', stdout=out)
+        self.assertIn('Would archive 1 inactive customers and 1 old orders', out.getvalue())
+        self.assertEqual(ArchivedOrder.objects.count(), 0)
+        with self.assertRaisesMessage(Exception, '--order-days'):
+            call_command('archive_crm_data', '--order-days', '30', stdout=StringIO())
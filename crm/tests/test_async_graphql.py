@@ -0,0 +1,131 @@
+import json
+from decimal import Decimal
+from unittest.mock import patch
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.test import TestCase
+from crm.entity_cache import entity_cache
+from crm.models import Customer, Product, Order
+
+class AsyncGraphQLViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        entity_cache.clear()
+        self.products = [
+            Product.objects.create(name=f"Product {i}", price=Decimal("10.00"), stock=10)
+            for i in range(3)
+        ]
+        for i in range(4):
+            customer = Customer.objects.create(name=f"Customer {i}", email=f"c{i}@example.com")
+            for j in range(2):
+                order = Order.objects.create(customer=customer, total_amount=Decimal("20.00"))
+                order.products.add(*self.products[:j + 1])
+        self.customer = customer
+
+    async def post(self, query, path='/graphql/async/', **variables):
+        response = await self.async_client.post(
+            path, data=json.dumps({'query': query, 'variables': variables}), content_type='application/json'
+        )
+        return response.status_code, json.loads(response.content)
+
+    async def test_async_and_sync_views_agree(self):
+        """The async endpoint returns exactly what the sync one does"""
+        query = '''
+        query($id: ID!) {
+            allOrders(first: 5, orderBy: "-totalAmount") {
+                edges { node { id totalAmount customer { name } products { name } } }
+                pageInfo { hasNextPage endCursor }
+            }
+            allCustomers(first: 2) { edges { node { name orders { id } } } }
+            allProducts(lowStock: false) { edges { node { name price orders { id } } } }
+            customer(id: $id) { name email }
+            totalCustomers
+            totalRevenue
+        }
+        '''
+        sync_response = await sync_to_async(self.client.post)(
+            '/graphql/', data=json.dumps({'query': query, 'variables': {'id': self.customer.pk}}),
+            content_type='application/json',
+        )
+        status, body = await self.post(query, id=self.customer.pk)
+        self.assertEqual(status, 200)
+        self.assertNotIn('errors', body)
+        self.assertEqual(body, json.loads(sync_response.content))
+
+    def test_relations_batch_with_async_loaders(self):
+        """Each level of relations still costs one query on the async path"""
+        query = '''
+        query {
+            allCustomers {
+                edges { node { name orders { id customer { email } products { id } } } }
+            }
+        }
+        '''
+        # The root resolvers prefetch selected relations themselves; bypass that
+        # so the loaders are the only thing standing between them and N+1 queries.
+        with patch('crm.schema.optimize_queryset', lambda queryset, info, path=(): queryset):
+            with self.assertNumQueries(4):
+                status, body = async_to_sync(self.post)(query)
+        self.assertEqual(status, 200)
+        customers = [edge['node'] for edge in body['data']['allCustomers']['edges']]
+        self.assertEqual([len(customer['orders']) for customer in customers], [2] * 4)
+        self.assertEqual(
+            sorted(len(order['products']) for customer in customers for order in customer['orders']),
+            [1] * 4 + [2] * 4,
+        )
+
+    def test_differently_projected_selections_of_one_relation(self):
+        """Selections reading other columns of the same relation never load deferred fields"""
+        aliases = '''
+        query {
+            a: allOrders { edges { node { customer { email } } } }
+            b: allOrders { edges { node { customer { name } } } }
+        }
+        '''
+        levels = '''
+        query {
+            allCustomers { edges { node { orders { customer { email } } } } }
+            allOrders { edges { node { customer { name orders { id } } } } }
+        }
+        '''
+        with self.assertNumQueries(2):
+            status, body = async_to_sync(self.post)(aliases)
+        self.assertEqual(status, 200)
+        self.assertNotIn('errors', body)
+        for query in (aliases, levels):
+            sync_response = self.client.post(
+                '/graphql/', data=json.dumps({'query': query}), content_type='application/json',
+            )
+            status, body = async_to_sync(self.post)(query)
+            self.assertNotIn('errors', body)
+            self.assertEqual(body, json.loads(sync_response.content))
+
+    async def test_missing_entity_is_an_error(self):
+        """Lookups that miss surface DoesNotExist as a field error"""
+        status, body = await self.post('query($id: ID!) { order(id: $id) { id } }', id=999999)
+        self.assertEqual(status, 200)
+        self.assertIsNone(body['data']['order'])
+        self.assertIn('does not exist', body['errors'][0]['message'])
+
+    async def test_mutations_run_on_the_sync_path(self):
+        """Mutations keep their transaction handling and sync resolvers"""
+        status, body = await self.post('''
+            mutation($customer: ID!, $products: [ID]!) {
+                createOrder(input: {customerId: $customer, productIds: $products}) {
+                    order { totalAmount customer { name } products { name } }
+                }
+            }
+        ''', customer=self.customer.pk, products=[self.products[0].pk, self.products[1].pk])
+        self.assertEqual(status, 200)
+        self.assertNotIn('errors', body)
+        order = body['data']['createOrder']['order']
+        self.assertEqual((order['totalAmount'], order['customer']['name']), ("20.00", "Customer 3"))
+        self.assertEqual(await Order.objects.acount(), 9)
+
+    async def test_request_errors_are_reported(self):
+        """Invalid documents and methods fail the same way as on the sync view"""
+        status, body = await self.post('{ noSuchField }')
+        self.assertEqual(status, 400)
+        self.assertIn('noSuchField', body['errors'][0]['message'])
+        response = await self.async_client.put('/graphql/async/')
+        self.assertEqual(response.status_code, 405)
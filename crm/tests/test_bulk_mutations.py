@@ -0,0 +1,152 @@
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from crm.bulk import _insert_customers
+from crm.models import Customer, CrmStatistics, Order, Product
+from crm.schema import schema
+
+BULK_CUSTOMERS = '''
+mutation Bulk($input: [CustomerInput]!) {
+    bulkCreateCustomers(input: $input) {
+        customers { id email }
+        errors
+        rowErrors { index message }
+    }
+}
+'''
+
+BULK_ORDERS = '''
+mutation Bulk($input: [OrderInput]!) {
+    bulkCreateOrders(input: $input) {
+        orders { totalAmount customer { email } products { name } }
+        rowErrors { index message }
+    }
+}
+'''
+
+class BulkCreateCustomersTests(TestCase):
+    def setUp(self):
+        Customer.objects.create(name="Existing", email="taken@example.com")
+
+    def test_rows_are_checked_up_front(self):
+        """Bad phones, repeated and existing emails are reported per row without aborting the rest"""
+        rows = [
+            {'name': "A", 'email': "a@example.com", 'phone': "+1111111111"},
+            {'name': "B", 'email': "b@example.com", 'phone': "nope"},
+            {'name': "C", 'email': "a@example.com"},
+            {'name': "D", 'email': "taken@example.com"},
+            {'name': "E", 'email': "e@example.com", 'phone': "123-456-7890"},
+        ]
+        result = schema.execute(BULK_CUSTOMERS, variable_values={'input': rows})
+        self.assertIsNone(result.errors)
+        data = result.data['bulkCreateCustomers']
+        self.assertEqual([c['email'] for c in data['customers']], ["a@example.com", "e@example.com"])
+        self.assertTrue(all(c['id'] for c in data['customers']))
+        self.assertEqual([e['index'] for e in data['rowErrors']], [1, 2, 3])
+        self.assertEqual(data['errors'], [e['message'] for e in data['rowErrors']])
+        self.assertIn("Invalid phone number for B", data['errors'][0])
+        self.assertIn("same as row 0", data['errors'][1])
+        self.assertIn("Email already exists", data['errors'][2])
+        self.assertEqual(CrmStatistics.current().customer_count, 3)
+
+    @override_settings(CRM_BULK_BATCH_SIZE=50)
+    def test_queries_scale_with_chunks_not_rows(self):
+        """200 rows cost one duplicate check and one INSERT per chunk"""
+        rows = [{'name': f"N{i}", 'email': f"n{i}@example.com"} for i in range(200)]
+        with CaptureQueriesContext(connection) as ctx:
+            result = schema.execute(BULK_CUSTOMERS, variable_values={'input': rows})
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data['bulkCreateCustomers']['customers']), 200)
+        sql = [q['sql'] for q in ctx.captured_queries]
+        self.assertEqual(sum(s.startswith('SELECT "crm_customer"."email"') for s in sql), 4)
+        self.assertEqual(sum(s.startswith('INSERT INTO "crm_customer"') for s in sql), 4)
+        self.assertEqual(Customer.objects.count(), 201)
+
+    def test_concurrent_insert_only_drops_the_conflicting_row(self):
+        """An email stored after the pre-check fails only its own row"""
+        chunk = [
+            (0, Customer(name="Late", email="taken@example.com")),
+            (1, Customer(name="Fine", email="fine@example.com")),
+        ]
+        errors = []
+        created = _insert_customers(chunk, errors)
+        self.assertEqual([c.email for c in created], ["fine@example.com"])
+        self.assertEqual(errors, [(0, "Email already exists: taken@example.com")])
+
+class BulkCreateProductsAndOrdersTests(TestCase):
+    def setUp(self):
+        self.customers = [
+            Customer.objects.create(name=f"C{i}", email=f"c{i}@example.com") for i in range(3)
+        ]
+        self.products = [
+            Product.objects.create(name=f"P{i}", price=Decimal(f"{i + 1}.50"), stock=10) for i in range(3)
+        ]
+
+    def test_bulk_create_products_reports_invalid_rows(self):
+        """Valid products are inserted, bad prices and stock are reported by index"""
+        result = schema.execute('''
+        mutation {
+            bulkCreateProducts(input: [
+                {name: "Good", price: 3.25, stock: 4},
+                {name: "Free", price: 0},
+                {name: "Negative", price: 1, stock: -1}
+            ]) {
+                products { name price stock }
+                rowErrors { index message }
+            }
+        }
+        ''')
+        self.assertIsNone(result.errors)
+        data = result.data['bulkCreateProducts']
+        self.assertEqual(data['products'], [{'name': "Good", 'price': "3.25", 'stock': 4}])
+        self.assertEqual([e['index'] for e in data['rowErrors']], [1, 2])
+
+    def test_bulk_create_orders_per_item_results(self):
+        """Orders get totals computed in memory; unknown customers and products fail their row only"""
+        c, p = self.customers, self.products
+        rows = [
+            {'customerId': c[0].pk, 'productIds': [p[0].pk, p[1].pk]},
+            {'customerId': 999999, 'productIds': [p[0].pk]},
+            {'customerId': c[1].pk, 'productIds': [p[2].pk, 424242]},
+            {'customerId': c[1].pk, 'productIds': []},
+            {'customerId': c[2].pk, 'productIds': [p[2].pk], 'orderDate': "2024-01-02T03:04:05+00:00"},
+        ]
+        result = schema.execute(BULK_ORDERS, variable_values={'input': rows})
+        self.assertIsNone(result.errors)
+        data = result.data['bulkCreateOrders']
+        self.assertEqual([o['totalAmount'] for o in data['orders']], ["4.00", "3.50"])
+        self.assertEqual(data['orders'][0]['customer']['email'], "c0@example.com")
+        self.assertEqual([x['name'] for x in data['orders'][0]['products']], ["P0", "P1"])
+        self.assertEqual([e['index'] for e in data['rowErrors']], [1, 2, 3])
+        self.assertIn("424242", data['rowErrors'][1]['message'])
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(Order.objects.get(customer=c[2]).order_date.year, 2024)
+
+        stats = CrmStatistics.current()
+        self.assertEqual((stats.order_count, stats.total_revenue), (2, Decimal("7.50")))
+        self.customers[0].refresh_from_db()
+        self.assertEqual(self.customers[0].lifetime_value, Decimal("4.00"))
+
+    @override_settings(CRM_BULK_BATCH_SIZE=100)
+    def test_bulk_create_orders_query_count_is_flat(self):
+        """300 orders cost a fixed number of lookups plus one INSERT per chunk"""
+        rows = [
+            {'customerId': self.customers[i % 3].pk, 'productIds': [p.pk for p in self.products]}
+            for i in range(300)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            result = schema.execute(
+                'mutation($input: [OrderInput]!) { bulkCreateOrders(input: $input) { rowErrors { index } } }',
+                variable_values={'input': rows},
+            )
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data['bulkCreateOrders']['rowErrors'], [])
+        sql = [q['sql'] for q in ctx.captured_queries]
+        self.assertEqual(sum(s.startswith('INSERT INTO "crm_order" ') for s in sql), 3)
+        self.assertEqual(sum(s.startswith('INSERT INTO "crm_order_products"') for s in sql), 9)
+        lookups = [s for s in sql if s.startswith('SELECT') and ('FROM "crm_customer"' in s or 'FROM "crm_product"' in s)]
+        self.assertEqual(len(lookups), 2)
+        # Statistics row plus one counter UPDATE per distinct customer
+        self.assertEqual(sum(s.startswith('UPDATE "crm_c') for s in sql), 4)
+        self.assertEqual(Order.products.through.objects.count(), 900)
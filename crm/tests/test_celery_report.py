@@ -1,8 +1,9 @@
 import os
 from datetime import datetime
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from unittest.mock import patch, mock_open
-from crm.tasks import generate_crm_report
+from graphql import ExecutionResult, print_schema
+from crm.tasks import generate_crm_report, snapshot_schema
 from crm.models import Customer, Product, Order
 from decimal import Decimal
 from crm.schema import schema
@@ -42,6 +43,7 @@ class CeleryReportTests(TestCase):
         if os.path.exists(log_file):
             os.remove(log_file)
 
+    @override_settings(CRM_REPORT_TRANSPORT='http')
     @patch('gql.Client.execute')
     def test_generate_crm_report_success(self, mock_execute):
         """Test successful report generation"""
@@ -75,6 +77,7 @@ class CeleryReportTests(TestCase):
             # Verify return value
             self.assertIn("Report generated successfully", result)
 
+    @override_settings(CRM_REPORT_TRANSPORT='http')
     @patch('gql.Client.execute')
     def test_generate_crm_report_graphql_error(self, mock_execute):
         """Test report generation with GraphQL error"""
@@ -120,6 +123,7 @@ class CeleryReportTests(TestCase):
         self.assertEqual(data['totalOrders'], 1)
         self.assertEqual(float(data['totalRevenue']), 20.00)
 
+    @override_settings(CRM_REPORT_TRANSPORT='http')
     @patch('gql.Client.execute')
     def test_report_file_creation(self, mock_execute):
         """Test actual file creation and content"""
@@ -150,4 +154,35 @@ class CeleryReportTests(TestCase):
             content,
             r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} - Report: 1 customers, 1 orders, \$20.00 revenue\n',
             "Log file should contain correct report format"
-        ) 
\ No newline at end of file
+        ) 
+
+    @patch('gql.Client.execute', side_effect=AssertionError("HTTP client used"))
+    def test_in_process_report_skips_http(self, mock_execute):
+        """The default transport runs the query in the worker without a GraphQL client"""
+        mock_file = mock_open()
+        with patch('builtins.open', mock_file):
+            result = generate_crm_report()
+        self.assertIn("1 customers, 1 orders, $20.00 revenue", result)
+        mock_execute.assert_not_called()
+
+    @override_settings(CRM_REPORT_TRANSPORT='http')
+    @patch('gql.transport.requests.RequestsHTTPTransport.connect')
+    @patch('gql.transport.requests.RequestsHTTPTransport.execute')
+    def test_http_report_sends_only_the_report_query(self, mock_execute, mock_connect):
+        """HTTP mode validates against the bundled SDL instead of an introspection round trip"""
+        mock_execute.return_value = ExecutionResult(
+            data={'totalCustomers': 1, 'totalOrders': 1, 'totalRevenue': 20.0}
+        )
+        with patch('builtins.open', mock_open()):
+            generate_crm_report()
+        self.assertEqual(mock_execute.call_count, 1)
+        document = mock_execute.call_args[0][0]
+        self.assertNotIn('__schema', str(document.loc.source.body))
+
+    def test_schema_snapshot_is_current(self):
+        """crm/schema.graphql matches the live schema; regenerate it with manage.py graphql_schema"""
+        from alx_backend_graphql.schema import schema as project_schema
+        self.assertEqual(
+            print_schema(snapshot_schema()),
+            print_schema(project_schema.graphql_schema),
+        )
@@ -0,0 +1,61 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from crm.models import Customer, Order, CrmStatistics
+
+COMMAND = 'crm.management.commands.cleanup_inactive_customers'
+
+class CleanupInactiveCustomersTests(TestCase):
+    def setUp(self):
+        old = timezone.now() - timedelta(days=500)
+        recent = timezone.now() - timedelta(days=10)
+        for n in range(7):
+            customer = Customer.objects.create(name=f"Stale {n}", email=f"stale{n}@example.com")
+            Order.objects.create(customer=customer, total_amount=Decimal("1.00"), order_date=old)
+        for n in range(3):
+            Customer.objects.create(name=f"Never {n}", email=f"never{n}@example.com")
+        self.active = Customer.objects.create(name="Active", email="active@example.com")
+        Order.objects.create(customer=self.active, total_amount=Decimal("5.00"), order_date=recent)
+
+    def run_cleanup(self, *args):
+        out = StringIO()
+        with mock.patch(f'{COMMAND}.open', mock.mock_open(), create=True) as log:
+            call_command('cleanup_inactive_customers', *args, stdout=out)
+        return out.getvalue(), log
+
+    def test_dry_run_only_counts(self):
+        """--dry-run reports the inactive count and deletes nothing"""
+        output, log = self.run_cleanup('--dry-run')
+        self.assertIn('Would delete 10 inactive customers', output)
+        self.assertEqual(Customer.objects.count(), 11)
+        log.assert_not_called()
+
+    def test_deletes_inactive_customers_in_batches(self):
+        """Stale and order-less customers go, the active one and the statistics stay consistent"""
+        output, log = self.run_cleanup('--batch-size', '4')
+        self.assertEqual(list(Customer.objects.values_list('pk', flat=True)), [self.active.pk])
+        self.assertEqual(Order.objects.count(), 1)
+        stats = CrmStatistics.current()
+        self.assertEqual((stats.customer_count, stats.order_count), (1, 1))
+        self.assertIn('Deleted 4/10 customers', output)
+        self.assertIn('Deleted 10/10 customers', output)
+        self.assertIn('customers/s', output)
+        log().write.assert_called_once()
+        self.assertIn('Deleted 10 inactive customers', log().write.call_args[0][0])
+
+    def test_query_count_is_per_batch_not_per_customer(self):
+        """Ids are scanned once per batch, with no per-customer order lookups"""
+        with CaptureQueriesContext(connection) as ctx:
+            self.run_cleanup('--batch-size', '100')
+        scans = [q['sql'] for q in ctx.captured_queries
+                 if q['sql'].startswith('SELECT "crm_customer"."id" FROM "crm_customer"')]
+        # One batch of ids, then an empty page that ends the loop
+        self.assertEqual(len(scans), 2)
+        self.assertFalse(any('"crm_order"."order_date"' in q['sql'] and 'MAX(' in q['sql']
+                             for q in ctx.captured_queries))
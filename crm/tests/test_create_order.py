@@ -0,0 +1,69 @@
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from crm.models import Customer, Product, Order, OrderItem
+from crm.schema import schema
+
+CREATE_ORDER = '''
+mutation Create($customerId: ID!, $productIds: [ID]!) {
+    createOrder(input: {customerId: $customerId, productIds: $productIds}) {
+        order { id totalAmount orderDate products { name } }
+        message
+    }
+}
+'''
+
+class CreateOrderTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Buyer", email="buyer@example.com")
+        self.pen = Product.objects.create(name="Pen", price=Decimal("1.25"), stock=10)
+        self.pad = Product.objects.create(name="Pad", price=Decimal("4.00"), stock=10)
+
+    def create(self, product_ids):
+        return schema.execute(CREATE_ORDER, variable_values={
+            'customerId': self.customer.pk,
+            'productIds': product_ids,
+        })
+
+    def test_order_row_is_written_once(self):
+        """One INSERT for the order, one for its items and no follow-up UPDATE"""
+        with CaptureQueriesContext(connection) as ctx:
+            result = self.create([self.pen.pk, self.pad.pk])
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data['createOrder']['order']['totalAmount'], "5.25")
+        self.assertIsNotNone(result.data['createOrder']['order']['orderDate'])
+        sql = [q['sql'] for q in ctx.captured_queries]
+        self.assertEqual(sum(s.startswith('INSERT INTO "crm_order" ') for s in sql), 1)
+        self.assertEqual(sum(s.startswith('INSERT INTO "crm_order_products"') for s in sql), 1)
+        self.assertFalse(any(s.startswith('UPDATE "crm_order"') for s in sql))
+
+    def test_repeated_product_ids_become_quantities(self):
+        """A product listed twice is charged twice and stored as one line with quantity 2"""
+        result = self.create([self.pen.pk, self.pad.pk, self.pen.pk])
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data['createOrder']['order']['totalAmount'], "6.50")
+        order = Order.objects.get(pk=result.data['createOrder']['order']['id'])
+        self.assertEqual(
+            dict(OrderItem.objects.filter(order=order).values_list('product__name', 'quantity')),
+            {'Pen': 2, 'Pad': 1},
+        )
+        self.assertEqual(order.calculate_total(), Decimal("6.50"))
+
+    def test_unknown_products_are_named(self):
+        """Unknown and malformed ids are reported and nothing is written"""
+        result = self.create([self.pen.pk, 999999, "abc"])
+        self.assertIn('Products not found: 999999, abc', str(result.errors))
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_benchmark_command_reports_both_paths(self):
+        """benchmark_create_order prints statements and percentiles and leaves no rows behind"""
+        out = StringIO()
+        call_command('benchmark_create_order', '--iterations', '5', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('legacy'))
+        self.assertTrue(lines[1].startswith('optimized'))
+        self.assertIn('p99', lines[1])
+        self.assertEqual(Order.objects.count(), 0)
@@ -0,0 +1,114 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from crm.models import Customer, Order
+from crm.schema import schema
+from crm.statistics import rebuild_customer_counters
+
+class CustomerCounterTests(TestCase):
+    def setUp(self):
+        self.alice = Customer.objects.create(name="Alice", email="alice@example.com")
+        self.bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        self.now = timezone.now()
+
+    def assertCounters(self, customer, count, value, last_order_date):
+        customer.refresh_from_db()
+        self.assertEqual(customer.order_count, count)
+        self.assertEqual(customer.lifetime_value, Decimal(value))
+        self.assertEqual(customer.last_order_date, last_order_date)
+
+    def test_counters_follow_order_writes(self):
+        """Creating, updating, moving and deleting orders keeps the counters exact"""
+        older = self.now - timedelta(days=3)
+        first = Order.objects.create(customer=self.alice, total_amount=Decimal("10.00"), order_date=older)
+        second = Order.objects.create(customer=self.alice, total_amount=Decimal("5.50"), order_date=self.now)
+        self.assertCounters(self.alice, 2, "15.50", self.now)
+
+        first.total_amount = Decimal("12.00")
+        first.save()
+        self.assertCounters(self.alice, 2, "17.50", self.now)
+
+        second.customer = self.bob
+        second.save()
+        self.assertCounters(self.alice, 1, "12.00", older)
+        self.assertCounters(self.bob, 1, "5.50", self.now)
+
+        first.delete()
+        self.assertCounters(self.alice, 0, "0.00", None)
+
+    def test_bulk_create_updates_each_customer_once(self):
+        """bulk_create folds all new orders into one UPDATE per customer"""
+        orders = [
+            Order(customer=customer, total_amount=Decimal("2.00"), order_date=self.now - timedelta(hours=i))
+            for i in range(3) for customer in (self.alice, self.bob)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            Order.objects.bulk_create(orders)
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "crm_customer"')]
+        self.assertEqual(len(updates), 2)
+        self.assertCounters(self.alice, 3, "6.00", self.now)
+        self.assertCounters(self.bob, 3, "6.00", self.now)
+
+    def test_stale_instance_does_not_overwrite_counters(self):
+        """Saving a customer loaded before an order was placed keeps the counter"""
+        stale = Customer.objects.get(pk=self.alice.pk)
+        Order.objects.create(customer=self.alice, total_amount=Decimal("4.00"))
+        stale.name = "Alice Renamed"
+        stale.save()
+        self.assertCounters(self.alice, 1, "4.00", self.alice.orders.get().order_date)
+
+    def test_rebuild_matches_incremental_counters(self):
+        """rebuild_customer_counters recomputes what the signals maintain"""
+        Order.objects.create(customer=self.alice, total_amount=Decimal("3.00"), order_date=self.now)
+        Customer.objects.filter(pk=self.alice.pk).update(order_count=9, lifetime_value=Decimal("0"))
+        rebuild_customer_counters()
+        self.assertCounters(self.alice, 1, "3.00", self.now)
+        self.assertCounters(self.bob, 0, "0.00", None)
+
+    def test_filter_and_sort_on_counters(self):
+        """allCustomers filters and orders by the counter columns without joining orders"""
+        Order.objects.create(customer=self.alice, total_amount=Decimal("50.00"))
+        for _ in range(2):
+            Order.objects.create(customer=self.bob, total_amount=Decimal("5.00"))
+        with CaptureQueriesContext(connection) as ctx:
+            result = schema.execute('''
+            query {
+                allCustomers(orderCountGte: 1, orderBy: "-lifetimeValue") {
+                    edges { node { name orderCount lifetimeValue lastOrderDate } }
+                }
+            }
+            ''')
+        self.assertIsNone(result.errors)
+        nodes = [edge['node'] for edge in result.data['allCustomers']['edges']]
+        self.assertEqual([n['name'] for n in nodes], ["Alice", "Bob"])
+        self.assertEqual(nodes[1]['orderCount'], 2)
+        self.assertNotIn('"crm_order"', ctx.captured_queries[0]['sql'])
+
+    def test_keyset_pages_through_null_last_order_dates(self):
+        """Customers without orders sort first and every row is visited once"""
+        for i in range(3):
+            Customer.objects.create(name=f"Idle {i}", email=f"idle{i}@example.com")
+        Order.objects.create(customer=self.alice, total_amount=Decimal("1.00"))
+        Order.objects.create(customer=self.bob, total_amount=Decimal("1.00"))
+        for ordering in ('lastOrderDate', '-lastOrderDate'):
+            seen, after = [], None
+            while True:
+                result = schema.execute(
+                    'query($after: String, $order: String) { allCustomers(first: 2, after: $after, orderBy: $order) '
+                    '{ edges { node { name } } pageInfo { hasNextPage endCursor } } }',
+                    variable_values={'after': after, 'order': ordering},
+                )
+                self.assertIsNone(result.errors)
+                page = result.data['allCustomers']
+                seen.extend(edge['node']['name'] for edge in page['edges'])
+                if not page['pageInfo']['hasNextPage']:
+                    break
+                after = page['pageInfo']['endCursor']
+            self.assertEqual(len(seen), 5)
+            self.assertEqual(len(set(seen)), 5)
+            idle = [name.startswith("Idle") for name in seen]
+            expected = [True] * 3 + [False] * 2
+            self.assertEqual(idle, expected if ordering == 'lastOrderDate' else expected[::-1])
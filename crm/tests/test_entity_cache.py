@@ -0,0 +1,159 @@
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from crm.entity_cache import entity_cache
+from crm.models import Customer, Order, Product
+from crm.schema import schema
+from crm.statistics import rebuild_customer_counters
+
+class EntityCacheTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        self.product = Product.objects.create(name="Laptop", price=Decimal("999.99"), stock=5)
+        self.order = Order.objects.create(customer=self.customer, total_amount=Decimal("999.99"))
+        # As if the tombstones left by creating the rows had expired
+        cache.clear()
+        entity_cache.clear()
+
+    def lookup(self, model, pk):
+        with CaptureQueriesContext(connection) as queries:
+            try:
+                value = entity_cache.get(model, pk)
+            except model.DoesNotExist:
+                value = None
+        return value, len(queries)
+
+    def test_repeated_lookups_skip_the_database(self):
+        """Only the first lookup of a row queries; later ones hit the local tier"""
+        first, first_queries = self.lookup(Customer, self.customer.pk)
+        second, second_queries = self.lookup(Customer, str(self.customer.pk))
+        self.assertEqual(first.name, "Ada")
+        self.assertEqual(second.name, "Ada")
+        self.assertEqual(first_queries, 1)
+        self.assertEqual(second_queries, 0)
+        self.assertIsNot(first, second)
+        stats = entity_cache.stats()['crm.customer']
+        self.assertEqual((stats['misses'], stats['local_hits']), (1, 1))
+
+    def test_shared_tier_refills_the_local_tier(self):
+        """With the local tier empty the row comes from the Django cache"""
+        self.lookup(Product, self.product.pk)
+        entity_cache.local.clear()
+        product, queries = self.lookup(Product, self.product.pk)
+        self.assertEqual(product.name, "Laptop")
+        self.assertEqual(queries, 0)
+        self.assertEqual(entity_cache.stats()['crm.product']['shared_hits'], 1)
+
+    def test_missing_ids_are_cached(self):
+        """A lookup of a missing id raises DoesNotExist without a second query"""
+        self.assertEqual(self.lookup(Order, 999999), (None, 1))
+        entity_cache.local.clear()
+        self.assertEqual(self.lookup(Order, 999999), (None, 0))
+        self.assertEqual(entity_cache.stats()['crm.order']['negative_hits'], 1)
+
+    def test_save_invalidates_on_commit(self):
+        """A saved row bypasses the cache until commit and is refetched after it"""
+        self.lookup(Customer, self.customer.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.name = "Ada Lovelace"
+            self.customer.save()
+            inside, _ = self.lookup(Customer, self.customer.pk)
+            self.assertEqual(inside.name, "Ada Lovelace")
+        after, queries = self.lookup(Customer, self.customer.pk)
+        self.assertEqual(after.name, "Ada Lovelace")
+        self.assertEqual(queries, 1)
+        self.assertEqual(entity_cache.stats()['crm.customer']['bypasses'], 1)
+
+    def test_counter_updates_invalidate_the_customer(self):
+        """Orders move the cached customer counters through queryset.update()"""
+        self.lookup(Customer, self.customer.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(customer=self.customer, total_amount=Decimal("10.00"))
+        customer, _ = self.lookup(Customer, self.customer.pk)
+        self.assertEqual(customer.order_count, 2)
+
+    def test_created_rows_replace_negative_entries(self):
+        """bulk_create drops the cached 'missing' entry of the new id"""
+        next_id = self.product.pk + 1
+        self.lookup(Product, next_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.bulk_create([Product(id=next_id, name="Mouse", price=Decimal("25.00"))])
+        product, _ = self.lookup(Product, next_id)
+        self.assertEqual(product.name, "Mouse")
+
+    def test_delete_invalidates(self):
+        """A deleted row is reported missing instead of served from the cache"""
+        self.lookup(Order, self.order.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.delete()
+        self.assertEqual(self.lookup(Order, self.order.pk), (None, 1))
+
+    def test_invalidate_all_moves_to_a_new_generation(self):
+        """rebuild_customer_counters retires every cached customer"""
+        self.lookup(Customer, self.customer.pk)
+        Customer.objects.filter(pk=self.customer.pk).update(name="Renamed")
+        rebuild_customer_counters()
+        entity_cache.clear()
+        customer, queries = self.lookup(Customer, self.customer.pk)
+        self.assertEqual(customer.name, "Renamed")
+        self.assertEqual(queries, 1)
+
+    def test_rolled_back_writes_stop_bypassing(self):
+        """Rows dirtied by a transaction that rolled back are cached again"""
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.customer.save()
+            raise RuntimeError
+        # The tombstone left by the save has expired
+        cache.clear()
+        with mock.patch('crm.entity_cache.connection', SimpleNamespace(in_atomic_block=False)):
+            self.lookup(Customer, self.customer.pk)
+            self.lookup(Customer, self.customer.pk)
+        stats = entity_cache.stats()['crm.customer']
+        self.assertEqual((stats['bypasses'], stats['misses'], stats['local_hits']), (0, 1, 1))
+
+    def test_invalidation_wins_over_an_in_flight_fill(self):
+        """A write that commits while a miss is loading the row is not undone by the fill"""
+        old = Customer.objects.get(pk=self.customer.pk)
+        Customer.objects.filter(pk=self.customer.pk).update(name="Ada Lovelace")
+
+        def load(**kwargs):
+            # The writer's on_commit invalidation runs after the reader has read the old row
+            entity_cache._forget('crm.customer', [self.customer.pk])
+            return old
+
+        with mock.patch.object(Customer._default_manager, 'get', side_effect=load):
+            loaded, _ = self.lookup(Customer, self.customer.pk)
+        self.assertEqual(loaded.name, "Ada")
+        current, queries = self.lookup(Customer, self.customer.pk)
+        self.assertEqual((current.name, queries), ("Ada Lovelace", 1))
+        # Once the tombstone has expired the row is cached again
+        cache.clear()
+        self.lookup(Customer, self.customer.pk)
+        self.assertEqual(self.lookup(Customer, self.customer.pk)[1], 0)
+
+    def test_queries_resolve_through_the_cache(self):
+        """customer, product and order share the cache and expose its counters"""
+        query = '''
+            query($c: ID!, $p: ID!, $o: ID!) {
+                customer(id: $c) { name }
+                product(id: $p) { name }
+                order(id: $o) { totalAmount }
+            }
+        '''
+        variables = {'c': self.customer.pk, 'p': self.product.pk, 'o': self.order.pk}
+        schema.execute(query, variable_values=variables)
+        with CaptureQueriesContext(connection) as queries:
+            result = schema.execute(query, variable_values=variables)
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data['customer']['name'], "Ada")
+        self.assertEqual(result.data['product']['name'], "Laptop")
+        self.assertEqual(len(queries), 0)
+
+        result = schema.execute('{ entityCacheStats { model localHits misses } }')
+        self.assertIsNone(result.errors)
+        stats = {row['model']: row for row in result.data['entityCacheStats']}
+        self.assertEqual(stats['crm.order'], {'model': 'crm.order', 'localHits': 1, 'misses': 1})
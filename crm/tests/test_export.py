@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+from decimal import Decimal
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from crm.models import Customer, Order, Product
+
+@override_settings(CRM_EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    def setUp(self):
+        self.products = [
+            Product.objects.create(name=name, price=Decimal(price), stock=5)
+            for name, price in (("Laptop", "999.99"), ("Mouse", "25.00"), ("Desk", "150.00"))
+        ]
+        self.ada = Customer.objects.create(name="Ada Lovelace", email="ada@example.com")
+        grace = Customer.objects.create(name="Grace Hopper", email="grace@example.com")
+        self.orders = []
+        for i in range(5):
+            order = Order.objects.create(customer=self.ada, total_amount=Decimal("10.00") * (i + 1))
+            order.products.add(*self.products[:i % 3 + 1])
+            self.orders.append(order)
+        Order.objects.create(customer=grace, total_amount=Decimal("5.00"))
+
+    def test_orders_stream_as_ndjson(self):
+        """Filtered orders arrive one JSON object per line, products joined once per chunk"""
+        response = self.client.get('/export/orders.ndjson', {'customerName': 'lovelace'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertTrue(response.streaming)
+        # The order query, then one product query for each chunk of two orders
+        with self.assertNumQueries(4):
+            body = b''.join(response.streaming_content)
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [order.id for order in self.orders])
+        self.assertEqual(rows[2]['product_ids'], [product.id for product in self.products])
+        self.assertEqual((rows[0]['customer_name'], rows[0]['total_amount']), ("Ada Lovelace", "10.00"))
+
+    def test_orders_matching_several_products_are_exported_once(self):
+        response = self.client.get('/export/orders.ndjson', {'productName': 'o'})
+        ids = [json.loads(line)['id'] for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(ids, [order.id for order in self.orders])
+
+    def test_products_stream_as_csv(self):
+        response = self.client.get('/export/products.csv', {'orderBy': '-price', 'priceLte': '500'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="products.csv"')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([(row['name'], row['price']) for row in rows], [("Desk", "150.00"), ("Mouse", "25.00")])
+
+    def test_invalid_requests_are_rejected(self):
+        self.assertEqual(self.client.get('/export/customers.ndjson', {'createdAtGte': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.get('/export/invoices.csv').status_code, 404)
+        self.assertEqual(self.client.post('/export/orders.csv').status_code, 405)
+
+    def test_command_matches_the_endpoint(self):
+        """export_crm_data takes the same filters and writes the same rows"""
+        out = io.StringIO()
+        call_command('export_crm_data', 'customers', '--filter', 'name=grace', '--format', 'csv', stdout=out)
+        response = self.client.get('/export/customers.csv', {'name': 'grace'})
+        self.assertEqual(out.getvalue(), b''.join(response.streaming_content).decode())
+        self.assertIn('grace@example.com', out.getvalue())
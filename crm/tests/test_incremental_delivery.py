@@ -0,0 +1,112 @@
+import json
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from crm.models import Customer, Order, Product
+
+def parts(chunks):
+    """The JSON payloads of a multipart/mixed incremental response."""
+    body = b''.join(chunks)
+    assert body.endswith(b'\r\n-----\r\n'), body[-20:]
+    return [json.loads(part.split(b'\r\n\r\n', 1)[1]) for part in body[:-len(b'\r\n-----\r\n')].split(b'\r\n---\r\n')[1:]]
+
+class IncrementalDeliveryTests(TestCase):
+    def setUp(self):
+        self.products = [
+            Product.objects.create(name=f"Product {i}", price=Decimal("10.00"), stock=10) for i in range(3)
+        ]
+        self.customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        self.add_orders(3)
+
+    def add_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(customer=self.customer, total_amount=Decimal("30.00"))
+            order.products.add(*self.products)
+
+    def post(self, query, incremental=True, **variables):
+        headers = {'Accept': 'multipart/mixed; deferSpec=20220824, application/json'} if incremental else {}
+        return self.client.post(
+            '/graphql/', data=json.dumps({'query': query, 'variables': variables}),
+            content_type='application/json', headers=headers,
+        )
+
+    def test_deferred_fragments_follow_the_initial_result(self):
+        """Each deferred fragment arrives as its own payload, at the path of its object"""
+        query = '''
+        query {
+            allOrders(first: 3) {
+                edges { node { id ... on OrderType @defer(label: "products") { products { name } } } }
+            }
+        }
+        '''
+        response = self.post(query)
+        self.assertEqual(response['Content-Type'], 'multipart/mixed; boundary="-"; deferSpec=20220824')
+        payloads = parts(response.streaming_content)
+        initial, rest = payloads[0], payloads[1:]
+        self.assertTrue(initial['hasNext'])
+        self.assertEqual(initial['data']['allOrders']['edges'][0]['node'].keys(), {'id'})
+        self.assertEqual([payload['hasNext'] for payload in rest], [True, True, False])
+        first = rest[0]['incremental'][0]
+        self.assertEqual(first['path'], ['allOrders', 'edges', 0, 'node'])
+        self.assertEqual(first['label'], 'products')
+        self.assertEqual(first['data'], {'products': [{'name': f"Product {i}"} for i in range(3)]})
+
+    def test_streamed_edges_arrive_one_by_one(self):
+        """allCustomers edges past initialCount are streamed with their index in the path"""
+        Customer.objects.create(name="Grace", email="grace@example.com")
+        query = '{ allCustomers(orderBy: "name") { edges @stream(initialCount: 1) { node { name } } } }'
+        payloads = parts(self.post(query).streaming_content)
+        self.assertEqual(payloads[0]['data']['allCustomers']['edges'], [{'node': {'name': "Ada"}}])
+        self.assertEqual(payloads[1], {
+            'incremental': [{'items': [{'node': {'name': "Grace"}}], 'path': ['allCustomers', 'edges', 1]}],
+            'hasNext': False,
+        })
+
+    def test_streamed_products(self):
+        order = Order.objects.first()
+        query = 'query($id: ID!) { order(id: $id) { products @stream(initialCount: 2) { name } } }'
+        payloads = parts(self.post(query, id=order.pk).streaming_content)
+        self.assertEqual(len(payloads[0]['data']['order']['products']), 2)
+        self.assertEqual(payloads[1]['incremental'][0]['path'], ['order', 'products', 2])
+
+    def test_complete_results_without_multipart(self):
+        """Without multipart/mixed in Accept, or with nothing left to defer, the result is plain JSON"""
+        query = '''
+        query($defer: Boolean!) {
+            allOrders(first: 1) { edges { node { id ... @defer(if: $defer) { products { name } } } } }
+        }
+        '''
+        for incremental, defer in ((False, True), (True, False)):
+            response = self.post(query, incremental=incremental, defer=defer)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            node = json.loads(response.content)['data']['allOrders']['edges'][0]['node']
+            self.assertEqual(len(node['products']), 3)
+
+    def test_time_to_first_byte_stays_flat(self):
+        """The work done before the first part is sent does not grow with the page size"""
+        query = '''
+        query($first: Int) {
+            allOrders(first: $first) {
+                edges @stream(initialCount: 2) {
+                    node { id totalAmount ... @defer { customer { name } products { name price } } }
+                }
+            }
+        }
+        '''
+        before_first_byte = []
+        for count in (5, 50):
+            self.add_orders(count - Order.objects.count())
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post(query, first=count)
+                chunks = iter(response.streaming_content)
+                first_part = next(chunks)
+            before_first_byte.append((len(queries), len(first_part)))
+            with CaptureQueriesContext(connection) as queries:
+                payloads = parts([first_part, *chunks])
+            # The remaining orders, then each order's deferred fragment
+            self.assertEqual(len(payloads), 1 + (count - 2) + count)
+            self.assertFalse(payloads[-1]['hasNext'])
+            # Every deferred fragment is served by the same batched product query
+            self.assertEqual(len(queries), 1)
+        self.assertEqual(before_first_byte[0], before_first_byte[1])
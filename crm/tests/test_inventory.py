@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from crm.bulk import create_order
+from crm.inventory import OutOfStockError, reserve_stock
+from crm.models import Customer, Product, Order, CrmStatistics
+from crm.schema import schema
+
+logger = logging.getLogger(__name__)
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Shopper", email="shopper@example.com")
+        self.ink = Product.objects.create(name="Ink", price=Decimal("3.00"), stock=2)
+        self.paper = Product.objects.create(name="Paper", price=Decimal("1.00"), stock=5)
+
+    def test_create_order_decrements_stock(self):
+        """Each unit ordered, including repeated ids, is taken from stock"""
+        create_order(self.customer.pk, [self.ink.pk, self.ink.pk, self.paper.pk])
+        self.ink.refresh_from_db()
+        self.paper.refresh_from_db()
+        self.assertEqual((self.ink.stock, self.paper.stock), (0, 4))
+
+    def test_shortage_rolls_back_every_reservation(self):
+        """A short product undoes decrements already made for other products"""
+        with self.assertRaises(OutOfStockError):
+            reserve_stock({self.paper.pk: 1, self.ink.pk: 3})
+        self.ink.refresh_from_db()
+        self.paper.refresh_from_db()
+        self.assertEqual((self.ink.stock, self.paper.stock), (2, 5))
+
+    def test_mutation_reports_out_of_stock(self):
+        """createOrder names the product and writes neither the order nor the decrement"""
+        result = schema.execute('''
+        mutation Create($customerId: ID!, $productIds: [ID]!) {
+            createOrder(input: {customerId: $customerId, productIds: $productIds}) { order { id } }
+        }
+        ''', variable_values={
+            'customerId': self.customer.pk,
+            'productIds': [self.paper.pk, self.ink.pk, self.ink.pk, self.ink.pk],
+        })
+        self.assertIn('Insufficient stock for Ink: requested 3', str(result.errors))
+        self.assertEqual(Order.objects.count(), 0)
+        self.paper.refresh_from_db()
+        self.assertEqual(self.paper.stock, 5)
+        self.assertEqual(CrmStatistics.current().order_count, 0)
+
+class StockReservationStressTests(TransactionTestCase):
+    THREADS = 8
+    ORDERS_PER_THREAD = 15
+
+    def test_concurrent_orders_never_oversell(self):
+        """Concurrent buyers of the same products sell exactly the available stock"""
+        customer = Customer.objects.create(name="Crowd", email="crowd@example.com")
+        hot = Product.objects.create(name="Hot", price=Decimal("2.00"), stock=40)
+        warm = Product.objects.create(name="Warm", price=Decimal("1.00"), stock=1000)
+        outcomes = {'ok': 0, 'out_of_stock': 0}
+        failures = []
+        lock = threading.Lock()
+        start = threading.Barrier(self.THREADS)
+
+        def buyer(n):
+            # Alternate the product order so lock ordering is exercised
+            product_ids = [hot.pk, warm.pk] if n % 2 else [warm.pk, hot.pk]
+            try:
+                start.wait()
+                for _ in range(self.ORDERS_PER_THREAD):
+                    try:
+                        create_order(customer.pk, product_ids)
+                        outcome = 'ok'
+                    except OutOfStockError:
+                        outcome = 'out_of_stock'
+                    with lock:
+                        outcomes[outcome] += 1
+            except Exception as e:
+                failures.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buyer, args=(n,)) for n in range(self.THREADS)]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        attempts = self.THREADS * self.ORDERS_PER_THREAD
+        logger.info("%d order attempts in %.2fs (%.0f/s) under contention", attempts, elapsed, attempts / elapsed)
+        self.assertEqual(failures, [])
+        self.assertEqual(outcomes, {'ok': 40, 'out_of_stock': attempts - 40})
+        hot.refresh_from_db()
+        warm.refresh_from_db()
+        self.assertEqual((hot.stock, warm.stock), (0, 960))
+        self.assertEqual(Order.objects.count(), 40)
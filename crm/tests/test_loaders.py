@@ -0,0 +1,92 @@
+from decimal import Decimal
+from unittest.mock import patch
+from django.test import TestCase, RequestFactory
+from crm.models import Customer, Product, Order
+from crm.schema import schema
+
+# The root resolvers prefetch selected relations themselves; bypass that so the
+# loaders are the only thing standing between the resolvers and N+1 queries.
+@patch('crm.schema.optimize_queryset', lambda queryset, info, path=(): queryset)
+class RelationLoaderTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.products = [
+            Product.objects.create(name=f"Product {i}", price=Decimal("10.00"), stock=10)
+            for i in range(3)
+        ]
+        for i in range(5):
+            customer = Customer.objects.create(name=f"Customer {i}", email=f"c{i}@example.com")
+            for j in range(2):
+                order = Order.objects.create(customer=customer, total_amount=Decimal("20.00"))
+                order.products.add(*self.products[:j + 1])
+
+    def execute(self, query):
+        return schema.execute(query, context_value=self.factory.post('/graphql/'))
+
+    def test_all_orders_batches_customer_and_products(self):
+        """One query for the orders plus one per relation, regardless of row count"""
+        query = '''
+        query {
+            allOrders {
+                edges {
+                    node {
+                        id
+                        customer { email }
+                        products { name }
+                    }
+                }
+            }
+        }
+        '''
+        with self.assertNumQueries(3):
+            result = self.execute(query)
+        self.assertIsNone(result.errors)
+        orders = [edge['node'] for edge in result.data['allOrders']['edges']]
+        self.assertEqual(len(orders), 10)
+        self.assertEqual(sorted(len(o['products']) for o in orders), [1] * 5 + [2] * 5)
+        self.assertTrue(all(o['customer']['email'].endswith('@example.com') for o in orders))
+
+    def test_nested_levels_batch_once_per_level(self):
+        """Customers -> orders -> products runs one query per execution level"""
+        query = '''
+        query {
+            allCustomers {
+                edges {
+                    node {
+                        name
+                        orders {
+                            id
+                            products { id }
+                        }
+                    }
+                }
+            }
+        }
+        '''
+        with self.assertNumQueries(3):
+            result = self.execute(query)
+        self.assertIsNone(result.errors)
+        customers = [edge['node'] for edge in result.data['allCustomers']['edges']]
+        self.assertEqual(len(customers), 5)
+        self.assertTrue(all(len(c['orders']) == 2 for c in customers))
+
+    def test_loaders_are_scoped_to_the_request(self):
+        """A second request does not see relations cached by the first"""
+        query = '''
+        query {
+            allOrders { edges { node { customer { name } } } }
+        }
+        '''
+        self.execute(query)
+        Customer.objects.filter(name="Customer 0").update(name="Renamed")
+        result = self.execute(query)
+        names = {e['node']['customer']['name'] for e in result.data['allOrders']['edges']}
+        self.assertIn("Renamed", names)
+
+    def test_without_context_still_resolves(self):
+        """Relations resolve correctly when no request context is supplied"""
+        result = schema.execute(
+            'query { allOrders { edges { node { customer { name } products { name } } } } }'
+        )
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data['allOrders']['edges']), 10)
@@ -0,0 +1,121 @@
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from crm.models import Customer, Product, Order
+from crm.schema import schema
+
+class QueryOptimizerTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        products = [
+            Product.objects.create(name=f"Product {i}", price=Decimal("5.00"), stock=3)
+            for i in range(3)
+        ]
+        for i in range(4):
+            customer = Customer.objects.create(
+                name=f"Customer {i}", email=f"opt{i}@example.com", phone="+1234567890"
+            )
+            for j in range(3):
+                order = Order.objects.create(customer=customer, total_amount=Decimal("15.00"))
+                order.products.add(*products)
+
+    def execute(self, query, **kwargs):
+        return schema.execute(query, context_value=self.factory.post('/graphql/'), **kwargs)
+
+    def test_orders_with_customer_and_products(self):
+        """Customer is joined and products prefetched: two statements in total"""
+        query = '''
+        query {
+            allOrders {
+                edges {
+                    node {
+                        totalAmount
+                        customer { email }
+                        products { name price }
+                    }
+                }
+            }
+        }
+        '''
+        with CaptureQueriesContext(connection) as ctx:
+            result = self.execute(query)
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data['allOrders']['edges']), 12)
+        self.assertEqual(len(ctx.captured_queries), 2)
+        order_sql = ctx.captured_queries[0]['sql']
+        self.assertIn('INNER JOIN "crm_customer"', order_sql)
+        self.assertNotIn('"crm_customer"."phone"', order_sql)
+        self.assertNotIn('"crm_order"."created_at"', order_sql)
+
+    def test_only_selected_columns_are_read(self):
+        """A scalar-only selection projects just those columns"""
+        with CaptureQueriesContext(connection) as ctx:
+            result = self.execute('query { allCustomers { edges { node { name } } } }')
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        sql = ctx.captured_queries[0]['sql']
+        self.assertIn('"crm_customer"."name"', sql)
+        self.assertNotIn('"crm_customer"."email"', sql)
+        self.assertNotIn('"crm_customer"."phone"', sql)
+
+    def test_fragments_and_nested_prefetch(self):
+        """Fragment spreads and inline fragments are followed into nested Prefetch querysets"""
+        query = '''
+        query {
+            allCustomers {
+                edges {
+                    node { ...CustomerBits }
+                }
+            }
+        }
+        fragment CustomerBits on CustomerType {
+            name
+            orders {
+                ... on OrderType {
+                    totalAmount
+                    products { name }
+                }
+            }
+        }
+        '''
+        with self.assertNumQueries(3):
+            result = self.execute(query)
+        self.assertIsNone(result.errors)
+        customers = [edge['node'] for edge in result.data['allCustomers']['edges']]
+        self.assertEqual(len(customers), 4)
+        self.assertTrue(all(len(c['orders']) == 3 for c in customers))
+        self.assertTrue(all(len(o['products']) == 3 for c in customers for o in c['orders']))
+
+    def test_skip_directive_drops_relation(self):
+        """Relations excluded by @skip are not prefetched"""
+        query = '''
+        query Orders($noProducts: Boolean!) {
+            allOrders {
+                edges {
+                    node {
+                        id
+                        products @skip(if: $noProducts) { name }
+                    }
+                }
+            }
+        }
+        '''
+        with self.assertNumQueries(1):
+            result = self.execute(query, variable_values={'noProducts': True})
+        self.assertIsNone(result.errors)
+        self.assertNotIn('products', result.data['allOrders']['edges'][0]['node'])
+
+    def test_aliases_projecting_a_relation_differently(self):
+        """Each alias is served the columns its own selection read, not another alias's"""
+        query = '''
+        query {
+            a: allOrders { edges { node { customer { email } } } }
+            b: allOrders { edges { node { customer { name } } } }
+        }
+        '''
+        with self.assertNumQueries(2):
+            result = self.execute(query)
+        self.assertIsNone(result.errors)
+        self.assertEqual({e['node']['customer']['name'] for e in result.data['b']['edges']},
+                         {f"Customer {i}" for i in range(4)})
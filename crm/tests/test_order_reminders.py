@@ -1,5 +1,6 @@
 import os
 import sys
+import threading
 import tempfile
 from django.test import TestCase
 from unittest.mock import patch, MagicMock, mock_open
@@ -42,7 +43,7 @@ class OrderRemindersTests(TestCase):
         """Test that the script queries GraphQL and logs to the specified file"""
         # Mock the GraphQL response
         mock_execute.return_value = {
-            'orders': {
+            'allOrders': {
                 'edges': [
                     {
                         'node': {
@@ -53,7 +54,8 @@ class OrderRemindersTests(TestCase):
                             }
                         }
                     }
-                ]
+                ],
+                'pageInfo': {'hasNextPage': False, 'endCursor': None}
             }
         }
         
@@ -76,4 +78,113 @@ class OrderRemindersTests(TestCase):
             handle = mock_file()
             self.assertTrue(any('Order 1 - Customer: test@example.com' in call[0][0] 
                               for call in handle.write.call_args_list),
-                          "Log file should contain order and customer information") 
\ No newline at end of file
+                          "Log file should contain order and customer information") 
+
+class SchemaClient:
+    """Stands in for the gql client by executing documents against the project schema."""
+
+    def __init__(self):
+        from alx_backend_graphql.schema import schema
+        self.schema = schema
+        self.calls = 0
+
+    def execute(self, document, variable_values=None):
+        from graphql import print_ast
+        self.calls += 1
+        result = self.schema.execute(print_ast(document), variable_values=variable_values)
+        assert result.errors is None, result.errors
+        return result.data
+
+
+class SyntheticClient:
+    """Serves `pages` pages of generated orders spread over `customers` emails."""
+
+    def __init__(self, pages, page_size, customers):
+        self.pages = pages
+        self.page_size = page_size
+        self.customers = customers
+
+    def execute(self, document, variable_values=None):
+        page = int(variable_values['after'] or 0)
+        edges = [
+            {'node': {
+                'id': str(page * self.page_size + i),
+                'orderDate': '2024-01-01T00:00:00+00:00',
+                'customer': {'email': f"c{(page * self.page_size + i) % self.customers}@example.com"},
+            }}
+            for i in range(self.page_size)
+        ]
+        return {'allOrders': {
+            'edges': edges,
+            'pageInfo': {'hasNextPage': page + 1 < self.pages, 'endCursor': str(page + 1)},
+        }}
+
+
+class CountingSender:
+    def __init__(self):
+        self.emails = set()
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def open(self):
+        pass
+
+    def send(self, reminders):
+        with self._lock:
+            self.batches += 1
+            self.emails.update(reminder.email for reminder in reminders)
+
+    def close(self, metrics):
+        self.metrics = metrics
+
+
+class ReminderPipelineTests(TestCase):
+    def test_pages_dedupe_and_send_through_django_mail(self):
+        """Every page is fetched, each customer gets one email via the locmem backend"""
+        from decimal import Decimal
+        from django.core import mail
+        from django.utils import timezone
+        from crm.models import Customer, Order
+
+        now = timezone.now()
+        for i in range(3):
+            customer = Customer.objects.create(name=f"R{i}", email=f"r{i}@example.com")
+            for j in range(i + 2):
+                Order.objects.create(customer=customer, total_amount=Decimal("1.00"),
+                                     order_date=now - datetime.timedelta(days=j))
+        Order.objects.create(customer=customer, total_amount=Decimal("1.00"),
+                             order_date=now - datetime.timedelta(days=30))
+
+        client = SchemaClient()
+        sender = send_order_reminders.DjangoMailSender()
+        with patch('builtins.print'):
+            success = send_order_reminders.process_orders(
+                client=client, sender=sender, since=now - datetime.timedelta(days=7),
+                page_size=2, batch_size=2, workers=2,
+            )
+        self.assertTrue(success)
+        self.assertEqual(client.calls, 5)  # 9 recent orders, 2 per page
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["r0@example.com", "r1@example.com", "r2@example.com"])
+
+    def test_memory_stays_bounded(self):
+        """20k streamed orders use memory proportional to a page, not the result set"""
+        import tracemalloc
+
+        sender = CountingSender()
+        tracemalloc.start()
+        try:
+            with patch('builtins.print'):
+                success = send_order_reminders.process_orders(
+                    client=SyntheticClient(pages=40, page_size=500, customers=50),
+                    sender=sender, page_size=500, batch_size=20, workers=4,
+                )
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertTrue(success)
+        self.assertEqual(len(sender.emails), 50)
+        counts = sender.metrics.counts
+        self.assertEqual((counts['orders'], counts['duplicates'], counts['reminders']), (20000, 19950, 50))
+        self.assertEqual(counts['pages'], 40)
+        self.assertLess(peak, 5 * 1024 * 1024)
+        self.assertGreater(sender.metrics.seconds['fetch'], 0)
@@ -0,0 +1,132 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from crm.models import Customer, Product, Order, OrderItem
+from crm.schema import schema
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Pager", email="pager@example.com")
+        now = timezone.now()
+        self.orders = []
+        for i in range(9):
+            # Pairs of orders share an order_date so the id tie-breaker matters
+            self.orders.append(Order.objects.create(
+                customer=self.customer,
+                total_amount=Decimal(i),
+                order_date=now - timedelta(days=i // 2),
+            ))
+        for i, price in enumerate(["5.00", "1.00", "3.00", "1.00", "2.00"]):
+            Product.objects.create(name=f"Item {i}", price=Decimal(price), stock=i)
+
+    def walk(self, field, args):
+        query = f'''
+        query Page($after: String) {{
+            {field}({args}, after: $after) {{
+                edges {{ cursor node {{ id }} }}
+                pageInfo {{ hasNextPage hasPreviousPage endCursor }}
+            }}
+        }}
+        '''
+        ids, after, pages = [], None, 0
+        while True:
+            result = schema.execute(query, variable_values={'after': after})
+            self.assertIsNone(result.errors)
+            connection_data = result.data[field]
+            ids.extend(edge['node']['id'] for edge in connection_data['edges'])
+            pages += 1
+            self.assertEqual(connection_data['pageInfo']['hasPreviousPage'], after is not None)
+            if not connection_data['pageInfo']['hasNextPage']:
+                return ids, pages
+            after = connection_data['pageInfo']['endCursor']
+
+    def test_forward_pages_follow_order_date_then_id(self):
+        """Walking allOrders page by page yields every order once in keyset order"""
+        ids, pages = self.walk('allOrders', 'first: 2')
+        expected = sorted(self.orders, key=lambda o: (o.order_date, o.id))
+        self.assertEqual(ids, [str(o.id) for o in expected])
+        self.assertEqual(pages, 5)
+
+    def test_ordering_filter_drives_the_keyset(self):
+        """orderBy from ProductFilter is honoured, with id breaking price ties"""
+        query = '''
+        query Page($after: String) {
+            allProducts(first: 2, orderBy: "-price", after: $after) {
+                edges { node { name price } }
+                pageInfo { hasNextPage endCursor }
+            }
+        }
+        '''
+        names, after = [], None
+        while True:
+            result = schema.execute(query, variable_values={'after': after})
+            self.assertIsNone(result.errors)
+            names.extend(edge['node']['name'] for edge in result.data['allProducts']['edges'])
+            if not result.data['allProducts']['pageInfo']['hasNextPage']:
+                break
+            after = result.data['allProducts']['pageInfo']['endCursor']
+        self.assertEqual(names, ["Item 0", "Item 2", "Item 4", "Item 3", "Item 1"])
+
+    def test_last_and_before_page_backwards(self):
+        """last/before returns the rows immediately preceding the cursor"""
+        first_page = schema.execute('query { allOrders(first: 5) { edges { cursor node { id } } } }')
+        edges = first_page.data['allOrders']['edges']
+        result = schema.execute(
+            'query($before: String) { allOrders(last: 2, before: $before) '
+            '{ edges { node { id } } pageInfo { hasPreviousPage hasNextPage } } }',
+            variable_values={'before': edges[4]['cursor']},
+        )
+        self.assertIsNone(result.errors)
+        self.assertEqual(
+            [edge['node']['id'] for edge in result.data['allOrders']['edges']],
+            [edges[2]['node']['id'], edges[3]['node']['id']],
+        )
+        self.assertTrue(result.data['allOrders']['pageInfo']['hasPreviousPage'])
+        self.assertTrue(result.data['allOrders']['pageInfo']['hasNextPage'])
+
+    def test_deep_page_seeks_instead_of_offset(self):
+        """A page after a cursor uses a WHERE seek and a fixed LIMIT, never OFFSET"""
+        first_page = schema.execute('query { allOrders(first: 6) { pageInfo { endCursor } } }')
+        cursor = first_page.data['allOrders']['pageInfo']['endCursor']
+        with CaptureQueriesContext(connection) as ctx:
+            schema.execute(
+                'query($after: String) { allOrders(first: 2, after: $after) { edges { node { id } } } }',
+                variable_values={'after': cursor},
+            )
+        sql = ctx.captured_queries[0]['sql']
+        self.assertIn('WHERE', sql)
+        self.assertIn('LIMIT 3', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_filters_apply_before_pagination(self):
+        """Filter arguments narrow the connection"""
+        result = schema.execute('query { allOrders(totalAmountGte: 7) { edges { node { totalAmount } } } }')
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data['allOrders']['edges']), 2)
+
+    def test_orders_with_several_matching_products_appear_once(self):
+        """productName/productId keep page sizes and cursors when an order holds two matches"""
+        products = list(Product.objects.order_by('pk')[:2])
+        for order in self.orders:
+            for product in products:
+                OrderItem.objects.create(order=order, product=product)
+        for args in ('first: 2, productName: "Item"', f'first: 2, productId: {products[0].pk}'):
+            with self.subTest(args=args):
+                ids, pages = self.walk('allOrders', args)
+                self.assertEqual(sorted(ids), sorted(str(order.id) for order in self.orders))
+                self.assertEqual(pages, 5)
+
+    def test_first_limit_is_enforced(self):
+        """Requests above the connection limit are rejected"""
+        result = schema.execute('query { allOrders(first: 1000) { edges { node { id } } } }')
+        self.assertIsNotNone(result.errors)
+        self.assertIn('exceeds the `first` limit', str(result.errors))
+
+    def test_invalid_cursor_is_rejected(self):
+        """Tampered cursors produce an error instead of a wrong page"""
+        result = schema.execute('query { allCustomers(after: "bm90LWEtY3Vyc29y") { edges { node { id } } } }')
+        self.assertIsNotNone(result.errors)
+        self.assertIn('Invalid cursor', str(result.errors))
@@ -0,0 +1,68 @@
+from io import StringIO
+from types import SimpleNamespace
+from django.core.management import call_command
+from django.test import TestCase
+from crm.bulk import bulk_create_customers
+from crm.filters import CustomerFilter, filter_queryset
+from crm.models import Customer, normalize_phone
+from crm.schema import schema
+
+class PhoneNormalizationTests(TestCase):
+    def setUp(self):
+        self.plus = Customer.objects.create(name="Plus", email="plus@example.com", phone="+1234567890")
+        self.dashed = Customer.objects.create(name="Dashed", email="dashed@example.com", phone="123-456-7890")
+        self.other = Customer.objects.create(name="Other", email="other@example.com", phone="+1987654321")
+        Customer.objects.create(name="None", email="none@example.com")
+
+    def matches(self, pattern):
+        queryset = filter_queryset(CustomerFilter, Customer.objects.all(), {'phonePattern': pattern})
+        return set(queryset.values_list('name', flat=True))
+
+    def test_normalize_phone(self):
+        self.assertEqual(normalize_phone("+1234567890"), "1234567890")
+        self.assertEqual(normalize_phone("123-456-7890"), "1234567890")
+        self.assertIsNone(normalize_phone(""))
+        self.assertIsNone(normalize_phone(None))
+
+    def test_equivalent_formats_match_the_same_prefix(self):
+        """A prefix in either format finds numbers stored in both formats"""
+        self.assertEqual(self.matches("123-45"), {"Plus", "Dashed"})
+        self.assertEqual(self.matches("+12345"), {"Plus", "Dashed"})
+        self.assertEqual(self.matches("1"), {"Plus", "Dashed", "Other"})
+        self.assertEqual(self.matches("19"), {"Other"})
+        self.assertEqual(self.matches("+1234567890"), {"Plus", "Dashed"})
+        self.assertEqual(self.matches("+2"), set())
+
+    def test_prefix_filter_is_an_index_range(self):
+        """phonePattern compiles to a range on the indexed column"""
+        queryset = filter_queryset(CustomerFilter, Customer.objects.all(), {'phonePattern': "+1234"})
+        self.assertNotIn('LIKE', str(queryset.query))
+        self.assertIn('crm_customer_phone_norm_idx (phone_normalized>? AND phone_normalized<?)', queryset.explain())
+
+    def test_every_write_path_fills_the_column(self):
+        """save(), update_fields saves and bulk creates keep phone_normalized current"""
+        self.plus.phone = "555-123-4567"
+        self.plus.save(update_fields=['phone'])
+        self.plus.refresh_from_db()
+        self.assertEqual(self.plus.phone_normalized, "5551234567")
+        created, errors = bulk_create_customers([
+            SimpleNamespace(name="Bulk", email="bulk@example.com", phone="+15550001111"),
+        ])
+        self.assertEqual(errors, [])
+        self.assertEqual(Customer.objects.get(email="bulk@example.com").phone_normalized, "15550001111")
+
+    def test_backfill_command(self):
+        """backfill_phone_normalized repairs rows written around save()"""
+        Customer.objects.filter(pk=self.dashed.pk).update(phone="999-000-1111")
+        out = StringIO()
+        call_command('backfill_phone_normalized', '--batch-size', '2', stdout=out)
+        self.assertIn('Checked 4 customers, updated 1', out.getvalue())
+        self.assertEqual(self.matches("999"), {"Dashed"})
+
+    def test_phone_pattern_argument(self):
+        """allCustomers(phonePattern:) goes through the normalized column"""
+        result = schema.execute('{ allCustomers(phonePattern: "123-4") { edges { node { name } } } }')
+        self.assertIsNone(result.errors)
+        self.assertEqual(
+            {edge['node']['name'] for edge in result.data['allCustomers']['edges']}, {"Plus", "Dashed"}
+        )
@@ -0,0 +1,126 @@
+import re
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from crm.models import Customer, Product, Order, OrderItem
+from crm.schema import schema
+
+# Any SCAN reads the whole table or index, whatever index it walks, except
+# the MATCH of an FTS5 search table, which is a virtual table
+SCAN = re.compile(r'^SCAN (?!\w+ VIRTUAL TABLE )')
+# A query with only an orderBy may walk a covering index in that order
+ORDERED_WALK = re.compile(r'^SCAN \w+ USING COVERING INDEX ')
+# Sorting the whole result instead of walking an index in order
+SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+ORDER_FILTERS = [
+    # Matches the fixture, so the nested loaders run too
+    'orderDateGte: "2000-01-01T00:00:00Z"',
+    'totalAmountGte: 10',
+    'totalAmountLte: 10',
+    'totalAmountGte: 5, totalAmountLte: 10',
+    'orderDateGte: "2024-01-01T00:00:00Z"',
+    'orderDateLte: "2024-01-01T00:00:00Z"',
+    'orderDateGte: "2024-01-01T00:00:00Z", orderDateLte: "2024-02-01T00:00:00Z"',
+    'orderDateGte: "2024-01-01T00:00:00Z", totalAmountGte: 10',
+    'productId: 1',
+    'customerName: "plan"',
+    'productName: "plan"',
+    'totalAmountGte: 10, orderBy: "-totalAmount"',
+]
+ORDER_ORDERINGS = ['orderBy: "orderDate"', 'orderBy: "-orderDate"',
+                   'orderBy: "totalAmount"', 'orderBy: "-totalAmount"']
+# Sorted across the join, so it may sort the orders it walked
+ORDER_JOIN_ORDERINGS = ['orderBy: "customerName"']
+
+CUSTOMER_FILTERS = [
+    'createdAtGte: "2000-01-01T00:00:00Z"',
+    'createdAtGte: "2024-01-01T00:00:00Z"',
+    'createdAtLte: "2024-01-01T00:00:00Z"',
+    'orderCountGte: 2',
+    'orderCountLte: 2',
+    'lifetimeValueGte: 100',
+    'lastOrderDateLte: "2024-01-01T00:00:00Z"',
+    'name: "plan"',
+    'email: "plan"',
+    'phonePattern: "+1555"',
+    'orderCountGte: 2, orderBy: "-orderCount"',
+]
+CUSTOMER_ORDERINGS = ['orderBy: "name"', 'orderBy: "-email"', 'orderBy: "orderCount"',
+                      'orderBy: "-lifetimeValue"', 'orderBy: "lastOrderDate"', 'orderBy: "-createdAt"']
+
+PRODUCT_FILTERS = [
+    'priceGte: 10',
+    'priceLte: 10',
+    'stockGte: 5',
+    'stockLte: 5',
+    'lowStock: true',
+    'name: "plan"',
+    'priceGte: 5, orderBy: "-price"',
+]
+PRODUCT_ORDERINGS = ['orderBy: "name"', 'orderBy: "-price"', 'orderBy: "stock"']
+
+class QueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN QUERY PLAN on every SELECT a list query issues, including
+    the loader queries for nested relations. Filtered queries must SEARCH
+    an index; a SCAN, even of an index, reads every row. orderBy-only
+    queries may walk a covering index, and must do so instead of sorting.
+    The substring filters (name, email, customerName, productName) go
+    through the trigram search index.
+    """
+
+    def setUp(self):
+        customer = Customer.objects.create(name="Planner", email="planner@example.com")
+        product = Product.objects.create(name="Plan", price=Decimal("20.00"), stock=2)
+        order = Order.objects.create(customer=customer, total_amount=Decimal("20.00"))
+        OrderItem.objects.create(order=order, product=product)
+
+    def plans(self, query):
+        with CaptureQueriesContext(connection) as ctx:
+            result = schema.execute(query)
+        self.assertIsNone(result.errors, query)
+        plans = []
+        with connection.cursor() as cursor:
+            for captured in ctx.captured_queries:
+                if not captured['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + captured['sql'])
+                plans.append((captured['sql'], [row[-1] for row in cursor.fetchall()]))
+        return plans
+
+    def assertIndexed(self, field, args, selection, ordering_only=False, sorted_by_index=False):
+        for arg in args:
+            with self.subTest(field=field, args=arg):
+                query = f'{{ {field}(first: 10, {arg}) {{ edges {{ node {{ {selection} }} }} }} }}'
+                for sql, details in self.plans(query):
+                    scans = [d for d in details if SCAN.match(d) and not (ordering_only and ORDERED_WALK.match(d))]
+                    self.assertEqual(scans, [], sql)
+                    if sorted_by_index:
+                        self.assertNotIn(SORT, details, sql)
+
+    def test_order_filters(self):
+        """OrderFilter arguments and the customer/products loaders use indexes"""
+        self.assertIndexed('allOrders', ORDER_FILTERS, 'id customer { name } products { name }')
+
+    def test_order_orderings(self):
+        """allOrders orderings walk an index in keyset order"""
+        self.assertIndexed('allOrders', ORDER_ORDERINGS, 'id', ordering_only=True, sorted_by_index=True)
+        self.assertIndexed('allOrders', ORDER_JOIN_ORDERINGS, 'id customer { name }', ordering_only=True)
+
+    def test_customer_filters(self):
+        """CustomerFilter arguments and the customer orders loader use indexes"""
+        self.assertIndexed('allCustomers', CUSTOMER_FILTERS, 'id orders { id }')
+
+    def test_customer_orderings(self):
+        """allCustomers orderings walk an index in keyset order"""
+        self.assertIndexed('allCustomers', CUSTOMER_ORDERINGS, 'id', ordering_only=True, sorted_by_index=True)
+
+    def test_product_filters(self):
+        """ProductFilter arguments use indexes"""
+        self.assertIndexed('allProducts', PRODUCT_FILTERS, 'id')
+
+    def test_product_orderings(self):
+        """allProducts orderings walk an index in keyset order"""
+        self.assertIndexed('allProducts', PRODUCT_ORDERINGS, 'id', ordering_only=True, sorted_by_index=True)
@@ -0,0 +1,85 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from crm.archive import archive_orders
+from crm.models import Customer, Order, CrmReportSnapshot
+from crm.reports import generate_snapshot
+from crm.schema import schema
+
+class CrmReportSnapshotTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Report", email="report@example.com")
+        Order.objects.create(customer=self.customer, total_amount=Decimal("10.00"))
+
+    def later(self, minutes):
+        return timezone.now() + timedelta(minutes=minutes)
+
+    def test_snapshots_store_deltas_and_running_totals(self):
+        """Each snapshot counts only rows created since the previous watermark"""
+        first = generate_snapshot(until=self.later(1))
+        self.assertEqual((first.new_customers, first.new_orders, first.new_revenue), (1, 1, Decimal("10.00")))
+        self.assertIsNone(first.period_start)
+
+        other = Customer.objects.create(name="Second", email="second@example.com")
+        order = Order.objects.create(customer=other, total_amount=Decimal("2.50"))
+        # Move the new rows past the first watermark
+        Order.objects.filter(pk=order.pk).update(created_at=self.later(2))
+        Customer.objects.filter(pk=other.pk).update(created_at=self.later(2))
+
+        second = generate_snapshot(until=self.later(3))
+        self.assertEqual(second.period_start, first.period_end)
+        self.assertEqual((second.new_customers, second.new_orders, second.new_revenue), (1, 1, Decimal("2.50")))
+        self.assertEqual((second.total_customers, second.total_orders, second.total_revenue), (2, 2, Decimal("12.50")))
+
+    def test_totals_drop_deleted_rows(self):
+        """Totals are the rows kept at the watermark, not the sum of every period's new rows"""
+        generate_snapshot(until=self.later(1))
+        other = Customer.objects.create(name="Gone", email="gone@example.com")
+        Order.objects.create(customer=other, total_amount=Decimal("4.00"))
+        archive_orders(Order.objects.filter(customer=self.customer))
+        other.delete()
+        # Created after the next watermark, so left out of its totals
+        late = Order.objects.create(customer=self.customer, total_amount=Decimal("1.00"))
+        Order.objects.filter(pk=late.pk).update(created_at=self.later(5))
+
+        snapshot = generate_snapshot(until=self.later(2))
+        self.assertEqual((snapshot.new_customers, snapshot.new_orders), (0, 0))
+        # The archived order still counts
+        self.assertEqual(
+            (snapshot.total_customers, snapshot.total_orders, snapshot.total_revenue), (1, 1, Decimal("10.00"))
+        )
+
+    def test_only_new_rows_are_read(self):
+        """The aggregates are bounded below by the previous watermark"""
+        generate_snapshot(until=self.later(1))
+        with CaptureQueriesContext(connection) as ctx:
+            generate_snapshot(until=self.later(2))
+        selects = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT COUNT')]
+        self.assertEqual(len(selects), 2)
+        for sql in selects:
+            self.assertIn('"created_at" >', sql)
+
+    def test_watermark_never_moves_backwards(self):
+        """A run with nothing newer than the last watermark returns the existing snapshot"""
+        first = generate_snapshot(until=self.later(5))
+        self.assertEqual(generate_snapshot(until=self.later(1)), first)
+        self.assertEqual(CrmReportSnapshot.objects.count(), 1)
+
+    def test_crm_reports_query_filters_by_range(self):
+        """crmReports returns stored snapshots whose watermark is within from/to"""
+        generate_snapshot(until=self.later(10))
+        generate_snapshot(until=self.later(20))
+        generate_snapshot(until=self.later(30))
+        result = schema.execute(
+            'query($from: DateTime, $to: DateTime) { crmReports(from: $from, to: $to) '
+            '{ periodEnd newOrders totalOrders totalRevenue } }',
+            variable_values={'from': self.later(15).isoformat(), 'to': self.later(35).isoformat()},
+        )
+        self.assertIsNone(result.errors)
+        reports = result.data['crmReports']
+        self.assertEqual(len(reports), 2)
+        self.assertEqual([r['newOrders'] for r in reports], [0, 0])
+        self.assertEqual(reports[-1]['totalRevenue'], 10.0)
@@ -0,0 +1,83 @@
+import datetime
+import gzip
+import json
+import zlib
+from decimal import Decimal
+from django.test import SimpleTestCase, TestCase, override_settings
+from alx_backend_graphql.encoders import encode_json, encode_orjson, get_encoder
+from alx_backend_graphql.views import negotiate_encoding
+from crm.models import Customer, Order, Product
+
+class EncoderTests(SimpleTestCase):
+    data = {
+        'total': Decimal('1999.90'),
+        'at': datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc),
+        'names': ['Zoë', None, 1.5],
+    }
+
+    def test_encoders_agree(self):
+        """json and orjson produce the same document, Decimals keeping their digits"""
+        for pretty in (False, True):
+            self.assertEqual(
+                json.loads(encode_orjson(self.data, pretty=pretty)),
+                json.loads(encode_json(self.data, pretty=pretty)),
+            )
+        self.assertEqual(json.loads(encode_orjson(self.data))['total'], '1999.90')
+        self.assertIsInstance(encode_orjson(self.data), bytes)
+
+    def test_encoder_is_chosen_by_setting(self):
+        with override_settings(GRAPHQL_JSON_ENCODER='json'):
+            self.assertIs(get_encoder(), encode_json)
+        with override_settings(GRAPHQL_JSON_ENCODER='alx_backend_graphql.encoders.encode_orjson'):
+            self.assertIs(get_encoder(), encode_orjson)
+
+    def test_negotiation(self):
+        self.assertEqual(negotiate_encoding('gzip, deflate, br'), 'gzip')
+        self.assertEqual(negotiate_encoding('gzip;q=0.5, deflate'), 'deflate')
+        self.assertEqual(negotiate_encoding('br, *;q=0.1'), 'gzip')
+        self.assertIsNone(negotiate_encoding('gzip;q=0, identity'))
+        self.assertIsNone(negotiate_encoding(''))
+
+
+@override_settings(GRAPHQL_COMPRESS_MIN_SIZE=1024)
+class CompressedResponseTests(TestCase):
+    query = '{ allOrders { edges { node { id totalAmount orderDate products { price } } } } }'
+
+    def setUp(self):
+        product = Product.objects.create(name="Laptop", price=Decimal("999.99"), stock=5)
+        customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        for _ in range(30):
+            Order.objects.create(customer=customer, total_amount=Decimal("999.99")).products.add(product)
+
+    def post(self, query=None, path='/graphql/', **headers):
+        return self.client.post(
+            path, data=json.dumps({'query': query or self.query}), content_type='application/json', headers=headers,
+        )
+
+    def test_large_responses_are_compressed(self):
+        """gzip and deflate bodies decode to the uncompressed response"""
+        plain = self.post()
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        for coding, decompress in (('gzip', gzip.decompress), ('deflate', zlib.decompress)):
+            response = self.post(**{'Accept-Encoding': coding})
+            self.assertEqual(response['Content-Encoding'], coding)
+            self.assertLess(len(response.content), len(plain.content))
+            self.assertEqual(decompress(response.content), plain.content)
+        node = json.loads(plain.content)['data']['allOrders']['edges'][0]['node']
+        self.assertEqual((node['totalAmount'], node['products']), ("999.99", [{'price': "999.99"}]))
+
+    def test_async_view_compresses(self):
+        response = self.post(path='/graphql/async/', **{'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), json.loads(self.post().content))
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.post('{ totalOrders }', **{'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(json.loads(response.content), {'data': {'totalOrders': 30}})
+
+    def test_stdlib_encoder_gives_the_same_body(self):
+        with override_settings(GRAPHQL_JSON_ENCODER='json'):
+            stdlib = self.post()
+        self.assertEqual(stdlib.content, self.post().content)
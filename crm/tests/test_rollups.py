@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from crm.models import Customer, Order, OrderDailyRollup
+from crm.rollups import compute_day
+from crm.schema import schema
+
+def at(year, month, day, hour=12):
+    return timezone.make_aware(datetime(year, month, day, hour))
+
+class OrderDailyRollupTests(TestCase):
+    def setUp(self):
+        self.ann = Customer.objects.create(name="Ann", email="ann@example.com")
+        self.ben = Customer.objects.create(name="Ben", email="ben@example.com")
+
+    def rollup(self, day):
+        row = OrderDailyRollup.objects.get(date=day)
+        return (row.order_count, row.revenue, row.distinct_customers)
+
+    def test_rollups_follow_order_writes(self):
+        """Creates, moves and deletes keep each day's row equal to a fresh aggregate"""
+        first = Order.objects.create(customer=self.ann, total_amount=Decimal("10.00"), order_date=at(2024, 3, 1))
+        Order.objects.create(customer=self.ann, total_amount=Decimal("5.00"), order_date=at(2024, 3, 1, 18))
+        Order.objects.create(customer=self.ben, total_amount=Decimal("1.00"), order_date=at(2024, 3, 1))
+        march_1 = at(2024, 3, 1).date()
+        self.assertEqual(self.rollup(march_1), (3, Decimal("16.00"), 2))
+
+        first.order_date = at(2024, 3, 2)
+        first.save()
+        self.assertEqual(self.rollup(march_1), (2, Decimal("6.00"), 2))
+        self.assertEqual(self.rollup(at(2024, 3, 2).date()), (1, Decimal("10.00"), 1))
+
+        Customer.objects.filter(pk=self.ben.pk).delete()
+        self.assertEqual(self.rollup(march_1), (1, Decimal("5.00"), 1))
+
+    def test_bulk_create_updates_each_day_once(self):
+        """Bulk inserts fold into one delta per day"""
+        Order.objects.bulk_create([
+            Order(customer=customer, total_amount=Decimal("2.00"), order_date=at(2024, 1, day))
+            for day in (1, 1, 2) for customer in (self.ann, self.ben)
+        ])
+        self.assertEqual(self.rollup(at(2024, 1, 1).date()), (4, Decimal("8.00"), 2))
+        self.assertEqual(self.rollup(at(2024, 1, 2).date()), (2, Decimal("4.00"), 2))
+
+    def test_backfill_command_repairs_rollups(self):
+        """backfill_order_rollups rebuilds rows from the orders table"""
+        Order.objects.create(customer=self.ann, total_amount=Decimal("7.00"), order_date=at(2024, 5, 5))
+        day = at(2024, 5, 5).date()
+        OrderDailyRollup.objects.filter(date=day).update(order_count=99)
+        OrderDailyRollup.objects.create(date=at(2024, 5, 6).date(), order_count=3)
+
+        out = StringIO()
+        call_command('backfill_order_rollups', '--from', '2024-05-01', '--to', '2024-05-31', stdout=out)
+        self.assertIn('Rebuilt 1 daily rollups', out.getvalue())
+        self.assertEqual(self.rollup(day), (1, Decimal("7.00"), 1))
+        self.assertFalse(OrderDailyRollup.objects.filter(date=at(2024, 5, 6).date()).exists())
+        self.assertEqual(compute_day(day)['order_count'], 1)
+
+    def test_time_series_buckets(self):
+        """ordersTimeSeries sums daily rows into week and month buckets without touching orders"""
+        for offset in range(60):
+            Order.objects.create(
+                customer=self.ann, total_amount=Decimal("1.00"),
+                order_date=at(2024, 1, 1) + timedelta(days=offset),
+            )
+        query = '''
+        query($granularity: TimeSeriesGranularity, $from: Date, $to: Date) {
+            ordersTimeSeries(granularity: $granularity, from: $from, to: $to) {
+                periodStart orderCount revenue distinctCustomers
+            }
+        }
+        '''
+        with self.assertNumQueries(1):
+            result = schema.execute(query, variable_values={'granularity': 'MONTH'})
+        self.assertIsNone(result.errors)
+        self.assertEqual(
+            [(b['periodStart'], b['orderCount']) for b in result.data['ordersTimeSeries']],
+            [('2024-01-01', 31), ('2024-02-01', 29)],
+        )
+        self.assertIsNone(result.data['ordersTimeSeries'][0]['distinctCustomers'])
+
+        result = schema.execute(query, variable_values={
+            'granularity': 'WEEK', 'from': '2024-01-01', 'to': '2024-01-14',
+        })
+        self.assertEqual([b['orderCount'] for b in result.data['ordersTimeSeries']], [7, 7])
+
+        result = schema.execute(query, variable_values={'from': '2024-02-28', 'to': '2024-02-29'})
+        self.assertEqual(
+            result.data['ordersTimeSeries'],
+            [
+                {'periodStart': '2024-02-28', 'orderCount': 1, 'revenue': 1.0, 'distinctCustomers': 1},
+                {'periodStart': '2024-02-29', 'orderCount': 1, 'revenue': 1.0, 'distinctCustomers': 1},
+            ],
+        )
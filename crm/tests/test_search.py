@@ -0,0 +1,115 @@
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from crm.filters import CustomerFilter, OrderFilter, ProductFilter, filter_queryset
+from crm.models import Customer, Product, Order, OrderItem
+from crm.schema import schema
+from crm.search import missing
+
+class TrigramSearchTests(TestCase):
+    def setUp(self):
+        self.ada = Customer.objects.create(name="Ada Lovelace", email="ada@engine.org")
+        self.alan = Customer.objects.create(name="Alan Turing", email="alan@bletchley.uk")
+        self.engine = Product.objects.create(name="Analytical Engine", price=Decimal("100.00"))
+        self.bombe = Product.objects.create(name="Bombe", price=Decimal("50.00"))
+        order = Order.objects.create(customer=self.ada, total_amount=Decimal("100.00"))
+        OrderItem.objects.create(order=order, product=self.engine)
+
+    def names(self, filterset, model, **args):
+        return sorted(filter_queryset(filterset, model.objects.all(), args).values_list('pk', flat=True))
+
+    def test_filters_match_icontains(self):
+        """Index-backed name filters return exactly what icontains returns"""
+        cases = [
+            (CustomerFilter, Customer, {'name': 'LOVE'}),
+            (CustomerFilter, Customer, {'email': 'bletch'}),
+            (CustomerFilter, Customer, {'name': 'zzz'}),
+            (ProductFilter, Product, {'name': 'engine'}),
+            (OrderFilter, Order, {'customer_name': 'ada lo'}),
+            (OrderFilter, Order, {'product_name': 'ytical'}),
+        ]
+        for filterset, model, args in cases:
+            with self.subTest(args=args):
+                indexed = self.names(filterset, model, **args)
+                with override_settings(CRM_SEARCH_BACKEND='like'):
+                    like = self.names(filterset, model, **args)
+                self.assertEqual(indexed, like)
+        self.assertEqual(self.names(CustomerFilter, Customer, name='LOVE'), [self.ada.pk])
+
+    def test_many_valued_lookups_return_each_row_once(self):
+        """An order with two matching products is returned once, indexed or not"""
+        order = Order.objects.create(customer=self.alan, total_amount=Decimal("150.00"))
+        OrderItem.objects.create(order=order, product=self.engine)
+        OrderItem.objects.create(order=order, product=Product.objects.create(name="Engine Room", price=Decimal("1.00")))
+        for term in ('engine', 'en'):
+            with self.subTest(term=term):
+                pks = list(filter_queryset(OrderFilter, Order.objects.all(), {'product_name': term})
+                           .values_list('pk', flat=True))
+                self.assertEqual(sorted(pks), sorted(set(pks)))
+                self.assertIn(order.pk, pks)
+                self.assertEqual(pks.count(order.pk), 1)
+
+    def test_filters_use_the_index(self):
+        """Long terms query the FTS table; short ones fall back to LIKE"""
+        with CaptureQueriesContext(connection) as ctx:
+            list(filter_queryset(CustomerFilter, Customer.objects.all(), {'name': 'ring'}))
+            list(filter_queryset(CustomerFilter, Customer.objects.all(), {'name': 'al'}))
+        self.assertIn('crm_customer_search', ctx.captured_queries[0]['sql'])
+        self.assertIn('LIKE', ctx.captured_queries[1]['sql'])
+
+    def test_index_follows_writes(self):
+        """Triggers keep the index in step with inserts, updates, bulk writes and deletes"""
+        Customer.objects.filter(pk=self.alan.pk).update(name="Alan Mathison Turing")
+        Customer.objects.bulk_create([Customer(name="Grace Hopper", email="grace@navy.mil")])
+        self.ada.delete()
+        self.assertEqual(
+            sorted(filter_queryset(CustomerFilter, Customer.objects.all(), {'name': 'athis'}).values_list('name', flat=True)),
+            ["Alan Mathison Turing"],
+        )
+        self.assertTrue(filter_queryset(CustomerFilter, Customer.objects.all(), {'name': 'hopp'}).exists())
+        self.assertFalse(filter_queryset(CustomerFilter, Customer.objects.all(), {'name': 'lovel'}).exists())
+
+    def test_migrate_reinstalls_dropped_triggers(self):
+        """post_migrate restores triggers lost with a remade table and rebuilds the stale index"""
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER crm_customer_search_update")
+        Customer.objects.filter(pk=self.alan.pk).update(name="Alan Mathison Turing")
+        athis = filter_queryset(CustomerFilter, Customer.objects.all(), {'name': 'athis'})
+        self.assertFalse(athis.exists())
+        self.assertEqual(missing(), {'crm_customer_search_update'})
+
+        emit_post_migrate_signal(0, False, connection.alias)
+        self.assertEqual(missing(), set())
+        self.assertTrue(athis.exists())
+
+    def test_search_query(self):
+        """search returns customers and products, optionally restricted by type"""
+        result = schema.execute('''{
+            all: search(term: "eng") { __typename ... on CustomerType { name } ... on ProductType { name } }
+            products: search(term: "engine", types: [PRODUCT]) { ... on ProductType { name } }
+        }''')
+        self.assertIsNone(result.errors)
+        self.assertEqual(
+            sorted((hit['__typename'], hit['name']) for hit in result.data['all']),
+            [('CustomerType', 'Ada Lovelace'), ('ProductType', 'Analytical Engine')],
+        )
+        self.assertEqual(result.data['products'], [{'name': 'Analytical Engine'}])
+
+    def test_terms_are_literal(self):
+        """FTS5 operators and quotes in the term are matched literally"""
+        Customer.objects.create(name='Bob "OR" Smith', email="bob@example.com")
+        self.assertEqual(self.names(CustomerFilter, Customer, name='"OR" S'), [Customer.objects.get(email="bob@example.com").pk])
+        self.assertEqual(self.names(CustomerFilter, Customer, name='ada OR alan'), [])
+
+    def test_benchmark_command(self):
+        """benchmark_search reports both backends and leaves no rows behind"""
+        out = StringIO()
+        call_command('benchmark_search', '--rows', '200', '--iterations', '2', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 8)
+        self.assertTrue(lines[1].startswith('trigram rare first page'))
+        self.assertEqual(Customer.objects.count(), 2)
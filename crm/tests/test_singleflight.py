@@ -0,0 +1,99 @@
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from crm import statistics
+from crm.models import Customer, CrmStatistics, Order
+from crm.schema import schema
+from crm.singleflight import SingleFlight, guarded
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_callers_share_one_call(self):
+        """Callers arriving while a call runs get its result without calling fn"""
+        group = SingleFlight()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return 42
+
+        threads = [threading.Thread(target=lambda: results.append(group.do('key', compute))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while group.shared < 3:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(calls), results), (1, [42] * 4))
+        self.assertEqual(group.do('key', lambda: 43), 43)
+
+    def test_errors_reach_every_caller_and_are_not_kept(self):
+        """A failed call raises in its callers; the next call runs again"""
+        group = SingleFlight()
+        with self.assertRaises(ValueError):
+            group.do('key', mock.Mock(side_effect=ValueError))
+        self.assertEqual(group.do('key', lambda: 'ok'), 'ok')
+
+
+@override_settings(CRM_SINGLE_FLIGHT_TIMEOUT=1, CRM_SINGLE_FLIGHT_POLL=0.01)
+class GuardedTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_existing_value_skips_compute(self):
+        compute = mock.Mock()
+        self.assertEqual(guarded('total', compute, peek=lambda: 5), 5)
+        compute.assert_not_called()
+
+    def test_lock_holder_in_another_process_is_awaited(self):
+        """While another process holds the lock, its result is picked up by polling"""
+        cache.add('crm:singleflight:total', 'other-process')
+        peek = mock.Mock(side_effect=[None, None, 7])
+        compute = mock.Mock()
+        self.assertEqual(guarded('total', compute, peek), 7)
+        compute.assert_not_called()
+
+    def test_stuck_lock_holder_is_given_up_on(self):
+        """Past CRM_SINGLE_FLIGHT_TIMEOUT the waiting caller computes the value itself"""
+        cache.add('crm:singleflight:total', 'other-process')
+        with override_settings(CRM_SINGLE_FLIGHT_TIMEOUT=0):
+            self.assertEqual(guarded('total', lambda: 9, peek=lambda: None), 9)
+
+    def test_lock_is_released(self):
+        guarded('total', lambda: 1, peek=lambda: None)
+        self.assertIsNone(cache.get('crm:singleflight:total'))
+
+
+class StatisticsRebuildTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        customer = Customer.objects.create(name="Stats", email="stats@example.com")
+        Order.objects.create(customer=customer, total_amount=Decimal("20.00"))
+        CrmStatistics.objects.all().delete()
+
+    def test_missing_row_is_rebuilt_once_per_request(self):
+        """totalCustomers, totalOrders and totalRevenue aggregate the tables once"""
+        with mock.patch('crm.statistics.compute_statistics', wraps=statistics.compute_statistics) as compute:
+            result = schema.execute('{ totalCustomers totalOrders totalRevenue }')
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data, {'totalCustomers': 1, 'totalOrders': 1, 'totalRevenue': 20.0})
+        self.assertEqual(compute.call_count, 1)
+
+    @override_settings(CRM_SINGLE_FLIGHT_POLL=0.01)
+    def test_rebuild_waits_for_another_process(self):
+        """A rebuild running elsewhere is awaited instead of repeated"""
+        cache.add('crm:singleflight:crm-statistics-rebuild', 'other-process')
+        row = CrmStatistics(pk=CrmStatistics.SINGLETON_ID, customer_count=3)
+        with mock.patch('crm.statistics.rebuild_statistics') as rebuild, \
+                mock.patch.object(CrmStatistics.objects, 'filter') as filter_rows:
+            filter_rows.return_value.first.side_effect = [None, row]
+            self.assertIs(CrmStatistics.current(), row)
+        rebuild.assert_not_called()
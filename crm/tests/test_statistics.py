@@ -0,0 +1,112 @@
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from crm.models import Customer, Product, Order, CrmStatistics
+from crm.schema import schema
+from crm.statistics import stats_batch
+
+class CrmStatisticsTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Stats", email="stats@example.com")
+        self.product = Product.objects.create(name="Widget", price=Decimal("12.50"), stock=5)
+
+    def assertStatistics(self, customers, orders, revenue):
+        stats = CrmStatistics.current()
+        self.assertEqual(stats.customer_count, customers)
+        self.assertEqual(stats.order_count, orders)
+        self.assertEqual(stats.total_revenue, Decimal(revenue))
+
+    def test_signals_track_creates_updates_and_deletes(self):
+        """Single-row writes adjust the totals incrementally"""
+        order = Order.objects.create(customer=self.customer, total_amount=Decimal("10.00"))
+        self.assertStatistics(1, 1, "10.00")
+
+        order.total_amount = Decimal("25.00")
+        order.save()
+        self.assertStatistics(1, 1, "25.00")
+
+        order.delete()
+        self.assertStatistics(1, 0, "0.00")
+
+    def test_cascade_delete_is_folded_into_one_update(self):
+        """Deleting customers with orders writes the statistics row once"""
+        for i in range(3):
+            Order.objects.create(customer=self.customer, total_amount=Decimal("5.00"))
+        self.assertStatistics(1, 3, "15.00")
+
+        with CaptureQueriesContext(connection) as ctx:
+            Customer.objects.filter(pk=self.customer.pk).delete()
+        updates = [q for q in ctx.captured_queries if 'UPDATE "crm_crmstatistics"' in q['sql']]
+        self.assertEqual(len(updates), 1)
+        self.assertStatistics(0, 0, "0.00")
+
+    def test_failed_batches_record_nothing(self):
+        """A stats_batch block that raises leaves the totals and customer counters as they were"""
+        Order.objects.create(customer=self.customer, total_amount=Decimal("10.00"))
+        counters = lambda: Customer.objects.values_list(*Customer.COUNTER_FIELDS).get(pk=self.customer.pk)
+        before = counters()
+
+        # Rolled back before the batch exits
+        with self.assertRaises(RuntimeError), stats_batch():
+            with transaction.atomic():
+                Order.objects.create(customer=self.customer, total_amount=Decimal("5.00"))
+                raise RuntimeError
+        # A database error breaks the atomic block the batch would flush in
+        with self.assertRaises(IntegrityError), transaction.atomic(), stats_batch():
+            Order.objects.create(customer=self.customer, total_amount=Decimal("5.00"))
+            Customer.objects.create(name="Duplicate", email="stats@example.com")
+        self.assertStatistics(1, 1, "10.00")
+        self.assertEqual(counters(), before)
+
+        # A failure caught inside an outer batch drops only its own changes
+        with stats_batch():
+            try:
+                with transaction.atomic(), stats_batch():
+                    Order.objects.create(customer=self.customer, total_amount=Decimal("5.00"))
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            Order.objects.create(customer=self.customer, total_amount=Decimal("2.00"))
+        self.assertStatistics(1, 2, "12.00")
+        self.customer.refresh_from_db()
+        self.assertEqual((self.customer.order_count, self.customer.lifetime_value), (2, Decimal("12.00")))
+
+    def test_bulk_create_is_counted(self):
+        """bulk_create bypasses model signals but still updates the totals"""
+        Customer.objects.bulk_create([
+            Customer(name=f"Bulk {i}", email=f"bulk{i}@example.com") for i in range(4)
+        ])
+        Order.objects.bulk_create([
+            Order(customer=self.customer, total_amount=Decimal("2.25")) for _ in range(4)
+        ])
+        self.assertStatistics(5, 4, "9.00")
+
+    def test_resolvers_read_the_statistics_row(self):
+        """The total fields are served from the materialized row"""
+        Order.objects.create(customer=self.customer, total_amount=Decimal("20.00"))
+        with self.assertNumQueries(3):
+            result = schema.execute('query { totalCustomers totalOrders totalRevenue }')
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data, {'totalCustomers': 1, 'totalOrders': 1, 'totalRevenue': 20.0})
+
+    def test_reconcile_command_reports_and_fixes_drift(self):
+        """Writes that bypass the ORM hooks are caught by reconciliation"""
+        order = Order.objects.create(customer=self.customer, total_amount=Decimal("8.00"))
+        Order.objects.filter(pk=order.pk).update(total_amount=Decimal("11.00"))
+
+        out = StringIO()
+        call_command('reconcile_crm_statistics', '--dry-run', stdout=out)
+        self.assertIn('Drift in total_revenue: stored 8.00, actual 11.00', out.getvalue())
+        self.assertStatistics(1, 1, "8.00")
+
+        out = StringIO()
+        call_command('reconcile_crm_statistics', stdout=out)
+        self.assertIn('Drift in total_revenue', out.getvalue())
+        self.assertStatistics(1, 1, "11.00")
+
+        out = StringIO()
+        call_command('reconcile_crm_statistics', stdout=out)
+        self.assertIn('No drift detected', out.getvalue())
@@ -1,3 +1,22 @@
-from django.shortcuts import render
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 
-# Create your views here.
+from .export import EXPORTS, FORMATS, export_queryset, stream_export
+
+
+@require_GET
+def export(request, kind, fmt):
+    """
+    Stream customers, products or orders as NDJSON or CSV. Query parameters
+    are the filter arguments of the matching GraphQL list field.
+    """
+    if kind not in EXPORTS or fmt not in FORMATS:
+        raise Http404(f"No {fmt} export of {kind}")
+    try:
+        queryset = export_queryset(kind, request.GET.dict(), request=request)
+    except ValidationError as e:
+        return JsonResponse({'errors': [{'message': message} for message in e.messages]}, status=400)
+    response = StreamingHttpResponse(stream_export(queryset, kind, fmt), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response